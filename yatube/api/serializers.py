@@ -0,0 +1,127 @@
+"""Представление объектов в ответах API.
+
+Каждое поле знает, какие колонки и связи ему нужны, поэтому запрос
+строится под выбранные в ``?fields=`` поля: ``select_related`` только
+нужных связей и ``only`` только нужных колонок.
+"""
+from operator import attrgetter
+
+from posts.counters import get_user_counters
+
+
+class FieldsError(ValueError):
+    pass
+
+
+class Field:
+    def __init__(self, get, columns=(), related=()):
+        self.get = get
+        self.columns = columns
+        self.related = related
+
+
+def attribute(name):
+    return Field(attrgetter(name), (name,))
+
+
+def date(name):
+    def get(obj):
+        value = getattr(obj, name)
+        return value.isoformat() if value else None
+    return Field(get, (name,))
+
+
+def username(relation):
+    return Field(
+        lambda obj: getattr(obj, relation).username,
+        (f'{relation}__username',), (relation,))
+
+
+def counter(name):
+    return Field(
+        lambda user: getattr(get_user_counters(user), name),
+        (f'counters__{name}',), ('counters',))
+
+
+class Serializer:
+    fields = {}
+    # Колонки, нужные всегда: первичный ключ и ключ сортировки курсора.
+    required_columns = ('id',)
+
+    def __init__(self, requested=None):
+        if not requested:
+            self.selected = list(self.fields)
+            return
+        self.selected = [name.strip() for name in requested.split(',')
+                         if name.strip()]
+        unknown = [name for name in self.selected if name not in self.fields]
+        if unknown or not self.selected:
+            raise FieldsError(
+                f'Неизвестные поля: {", ".join(unknown)}. '
+                f'Доступны: {", ".join(self.fields)}.')
+
+    @property
+    def related(self):
+        return sorted({relation for name in self.selected
+                       for relation in self.fields[name].related})
+
+    @property
+    def columns(self):
+        columns = dict.fromkeys(self.required_columns)
+        for name in self.selected:
+            columns.update(dict.fromkeys(self.fields[name].columns))
+        return list(columns)
+
+    def apply(self, queryset):
+        return queryset.select_related(*self.related).only(*self.columns)
+
+    def to_dict(self, obj):
+        return {name: self.fields[name].get(obj) for name in self.selected}
+
+
+class PostSerializer(Serializer):
+    fields = {
+        'id': attribute('id'),
+        'text': attribute('text'),
+        'pub_date': date('pub_date'),
+        'author': username('author'),
+        'group': Field(
+            lambda post: post.group.slug if post.group_id else None,
+            ('group__slug',), ('group',)),
+        'image': Field(
+            lambda post: post.image.url if post.image else None,
+            ('image',)),
+        'comments_count': attribute('comments_count'),
+    }
+    required_columns = ('id', 'pub_date')
+
+
+class CommentSerializer(Serializer):
+    fields = {
+        'id': attribute('id'),
+        'post': Field(attrgetter('post_id'), ('post',)),
+        'author': username('author'),
+        'text': attribute('text'),
+        'created': date('created'),
+    }
+    required_columns = ('id', 'created')
+
+
+class GroupSerializer(Serializer):
+    fields = {
+        'id': attribute('id'),
+        'title': attribute('title'),
+        'slug': attribute('slug'),
+        'description': attribute('description'),
+    }
+
+
+class ProfileSerializer(Serializer):
+    fields = {
+        'username': attribute('username'),
+        'first_name': attribute('first_name'),
+        'last_name': attribute('last_name'),
+        'posts_count': counter('posts_count'),
+        'followers_count': counter('followers_count'),
+        'following_count': counter('following_count'),
+    }
@@ -0,0 +1,187 @@
+import json
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.testing import capture_on_commit_callbacks
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}')
+            for number in range(5)]
+        cls.post = cls.posts[-1]
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def get_json(self, url, client=None, **params):
+        response = (client or self.client).get(url, params)
+        content = (b''.join(response.streaming_content)
+                   if response.streaming else response.content)
+        return response, json.loads(content)
+
+    def test_post_list_pages_by_cursor(self):
+        url = reverse('api:post_list')
+        response, data = self.get_json(url, limit=2)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            [post['id'] for post in data['results']],
+            [self.posts[4].id, self.posts[3].id])
+        self.assertIsNone(data['previous'])
+        _, data = self.get_json(data['next'])
+        self.assertEqual(
+            [post['id'] for post in data['results']],
+            [self.posts[2].id, self.posts[1].id])
+        _, data = self.get_json(data['previous'])
+        self.assertEqual(
+            [post['id'] for post in data['results']],
+            [self.posts[4].id, self.posts[3].id])
+
+    def test_fields_limit_output_and_columns(self):
+        url = reverse('api:post_list')
+        with CaptureQueriesContext(connection) as queries:
+            _, data = self.get_json(url, fields='id,author')
+        self.assertEqual(
+            data['results'][0], {'id': self.post.id, 'author': 'author'})
+        sql = queries.captured_queries[-1]['sql']
+        self.assertNotIn('"posts_post"."text"', sql)
+        self.assertNotIn('posts_group', sql)
+
+    def test_unknown_field_is_bad_request(self):
+        response, data = self.get_json(
+            reverse('api:post_list'), fields='id,password')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('password', data['detail'])
+
+    def test_batch_by_ids(self):
+        ids = [self.posts[0].id, self.posts[2].id]
+        _, data = self.get_json(
+            reverse('api:post_list'), ids=','.join(map(str, ids)),
+            fields='id,text')
+        self.assertEqual(data['results'], [
+            {'id': ids[0], 'text': 'Пост 0'},
+            {'id': ids[1], 'text': 'Пост 2'}])
+        response, _ = self.get_json(reverse('api:post_list'), ids='1,x')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        url = reverse('api:post_list')
+        with CaptureQueriesContext(connection) as small:
+            self.get_json(url, limit=1)
+        with CaptureQueriesContext(connection) as large:
+            self.get_json(url, limit=5)
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(len(large), 1)
+
+    def test_detail_endpoints(self):
+        cases = {
+            reverse('api:post_detail', kwargs={'post_id': self.post.id}): {
+                'group': 'group', 'comments_count': 1},
+            reverse('api:group_detail', kwargs={'slug': 'group'}): {
+                'title': 'Группа'},
+            reverse('api:profile', kwargs={'username': 'author'}): {
+                'posts_count': 5, 'followers_count': 0},
+        }
+        for url, expected in cases.items():
+            with self.subTest(url=url):
+                response, data = self.get_json(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(
+                    {name: data[name] for name in expected}, expected)
+
+    def test_missing_object_is_json_404(self):
+        response, data = self.get_json(
+            reverse('api:group_detail', kwargs={'slug': 'missing'}))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertIn('detail', data)
+
+    def test_comment_list(self):
+        _, data = self.get_json(
+            reverse('api:comment_list', kwargs={'post_id': self.post.id}))
+        self.assertEqual(
+            [(comment['post'], comment['author'])
+             for comment in data['results']],
+            [(self.post.id, 'reader')])
+
+    def test_follow_feed(self):
+        url = reverse('api:follow_feed')
+        response, _ = self.get_json(url)
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        with capture_on_commit_callbacks(execute=True):
+            Follow.objects.create(user=self.reader, author=self.author)
+        _, data = self.get_json(
+            url, client=self.reader_client, fields='id', limit=3)
+        self.assertEqual(
+            [post['id'] for post in data['results']],
+            [post.id for post in reversed(self.posts[2:])])
+
+    def test_follow_state(self):
+        url = reverse('api:follow_state')
+        response, _ = self.get_json(url)
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        Follow.objects.create(user=self.reader, author=self.author)
+        _, data = self.get_json(
+            url, client=self.reader_client,
+            ids=f'{self.author.id},{self.reader.id}')
+        self.assertEqual(
+            data, {str(self.author.id): True, str(self.reader.id): False})
+        response, _ = self.get_json(
+            url, client=self.reader_client, ids='x')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_only_safe_methods(self):
+        response = self.reader_client.post(reverse('api:post_list'))
+        self.assertEqual(
+            response.status_code, HTTPStatus.METHOD_NOT_ALLOWED)
+
+    def test_export_permissions(self):
+        url = reverse(
+            'api:export', kwargs={'kind': 'posts', 'file_format': 'ndjson'})
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        staff_client = Client()
+        staff_client.force_login(staff)
+        cases = (
+            (self.client, {}, HTTPStatus.UNAUTHORIZED),
+            (self.reader_client, {}, HTTPStatus.FORBIDDEN),
+            (self.reader_client, {'user': 'author'}, HTTPStatus.FORBIDDEN),
+            (self.reader_client, {'user': 'reader'}, HTTPStatus.OK),
+            (staff_client, {}, HTTPStatus.OK),
+            (staff_client, {'user': 'missing'}, HTTPStatus.NOT_FOUND),
+        )
+        for client, params, status in cases:
+            with self.subTest(params=params, status=status):
+                response = client.get(url, params)
+                self.assertEqual(response.status_code, status)
+
+    def test_export_streams_rows(self):
+        self.client.force_login(self.author)
+        response = self.client.get(
+            reverse('api:export',
+                    kwargs={'kind': 'posts', 'file_format': 'csv'}),
+            {'user': 'author'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,author,group,text,pub_date,image')
+        self.assertEqual(len(lines), len(self.posts) + 1)
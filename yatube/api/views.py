@@ -0,0 +1,207 @@
+import json
+from functools import wraps
+
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_safe
+
+from core.paginators import CursorPaginator, FEED_ORDERING
+from posts import export as exports, follows, timelines
+from posts.models import Comment, Group, Post
+from .serializers import (
+    CommentSerializer, FieldsError, GroupSerializer, PostSerializer,
+    ProfileSerializer)
+
+User = get_user_model()
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MAX_IDS = 100
+STREAM_CHUNK_SIZE = 100
+COMMENT_ORDERING = ('-created', '-id')
+GROUP_ORDERING = ('id',)
+
+
+class RequestError(ValueError):
+    pass
+
+
+def error(message, status=400):
+    return JsonResponse({'detail': message}, status=status)
+
+
+def get_limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise RequestError('limit должен быть числом.')
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def get_ids(request):
+    try:
+        ids = [int(value) for value in request.GET['ids'].split(',')
+               if value.strip()]
+    except ValueError:
+        raise RequestError('ids — список чисел через запятую.')
+    if len(ids) > MAX_IDS:
+        raise RequestError(f'Не больше {MAX_IDS} ids за запрос.')
+    return ids
+
+
+def page_url(request, **params):
+    query = request.GET.copy()
+    for name in ('after', 'before'):
+        query.pop(name, None)
+    query.update(params)
+    return f'{request.path}?{query.urlencode()}'
+
+
+def stream(objects, serializer, **meta):
+    """Отдаёт ``{...meta, "results": [...]}`` по одному объекту, не
+    собирая весь ответ в памяти."""
+    yield '{' + ''.join(
+        f'{json.dumps(name)}: {json.dumps(value)}, '
+        for name, value in meta.items()) + '"results": ['
+    for index, obj in enumerate(objects):
+        if index:
+            yield ', '
+        yield json.dumps(
+            serializer.to_dict(obj), cls=DjangoJSONEncoder,
+            ensure_ascii=False)
+    yield ']}'
+
+
+def json_stream(chunks):
+    return StreamingHttpResponse(chunks, content_type='application/json')
+
+
+def paginated(request, paginator, serializer):
+    page = paginator.cursor_page(
+        after=request.GET.get('after'), before=request.GET.get('before'))
+    return json_stream(stream(
+        page.object_list, serializer,
+        next=page_url(request, after=page.next_cursor)
+        if page.next_cursor else None,
+        previous=page_url(request, before=page.previous_cursor)
+        if page.previous_cursor else None))
+
+
+def api_view(serializer_class):
+    """Разбирает ``?fields=`` и превращает ошибки запроса в ответ 400."""
+    def decorator(view):
+        @require_safe
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                serializer = serializer_class(request.GET.get('fields'))
+                return view(request, serializer, *args, **kwargs)
+            except (FieldsError, RequestError) as exception:
+                return error(str(exception))
+        return wrapper
+    return decorator
+
+
+def listing(request, serializer, queryset, ordering):
+    """Список с курсорами или пакет объектов по ``?ids=``."""
+    queryset = serializer.apply(queryset)
+    if 'ids' in request.GET:
+        objects = queryset.filter(pk__in=get_ids(request)).order_by('pk')
+        return json_stream(stream(
+            objects.iterator(chunk_size=STREAM_CHUNK_SIZE), serializer))
+    return paginated(
+        request, CursorPaginator(queryset, get_limit(request), ordering),
+        serializer)
+
+
+def detail(serializer, queryset, **lookup):
+    obj = serializer.apply(queryset).filter(**lookup).first()
+    if obj is None:
+        return error('Не найдено.', status=404)
+    return JsonResponse(
+        serializer.to_dict(obj), json_dumps_params={'ensure_ascii': False})
+
+
+@api_view(PostSerializer)
+def post_list(request, serializer):
+    posts = Post.objects.all()
+    if 'group' in request.GET:
+        posts = posts.filter(group__slug=request.GET['group'])
+    if 'author' in request.GET:
+        posts = posts.filter(author__username=request.GET['author'])
+    return listing(request, serializer, posts, FEED_ORDERING)
+
+
+@api_view(PostSerializer)
+def post_detail(request, serializer, post_id):
+    return detail(serializer, Post.objects, pk=post_id)
+
+
+@api_view(CommentSerializer)
+def comment_list(request, serializer, post_id):
+    comments = Comment.objects.filter(post_id=post_id)
+    return listing(request, serializer, comments, COMMENT_ORDERING)
+
+
+@api_view(GroupSerializer)
+def group_list(request, serializer):
+    return listing(request, serializer, Group.objects.all(), GROUP_ORDERING)
+
+
+@api_view(GroupSerializer)
+def group_detail(request, serializer, slug):
+    return detail(serializer, Group.objects, slug=slug)
+
+
+@api_view(ProfileSerializer)
+def profile(request, serializer, username):
+    return detail(serializer, User.objects, username=username)
+
+
+@api_view(PostSerializer)
+def follow_feed(request, serializer):
+    if not request.user.is_authenticated:
+        return error('Нужна авторизация.', status=401)
+    paginator = timelines.get_feed_paginator(
+        request.user, get_limit(request), serializer.related,
+        serializer.columns)
+    return paginated(request, paginator, serializer)
+
+
+@require_safe
+def follow_state(request):
+    """Подписан ли читатель на авторов из ``?ids=``: ``{"id": true}``."""
+    if not request.user.is_authenticated:
+        return error('Нужна авторизация.', status=401)
+    try:
+        author_ids = get_ids(request) if 'ids' in request.GET else []
+    except RequestError as exception:
+        return error(str(exception))
+    states = follows.follow_states(request.user, author_ids)
+    return JsonResponse(
+        {str(author_id): state for author_id, state in states.items()})
+
+
+@require_safe
+def export(request, kind, file_format):
+    """Выгрузка целиком (только для персонала) или записей одного
+    пользователя по ``?user=`` (сам пользователь или персонал)."""
+    if kind not in exports.KINDS or file_format not in exports.FORMATS:
+        return error('Не найдено.', status=404)
+    if not request.user.is_authenticated:
+        return error('Нужна авторизация.', status=401)
+    username = request.GET.get('user')
+    user = None
+    if username:
+        user = User.objects.filter(username=username).first()
+        if user is None:
+            return error('Не найдено.', status=404)
+    if not request.user.is_staff and user != request.user:
+        return error('Недостаточно прав.', status=403)
+    response = StreamingHttpResponse(
+        exports.export(kind, file_format, user),
+        content_type=exports.FORMATS[file_format])
+    name = f'{username or "yatube"}-{kind}.{file_format}'
+    response['Content-Disposition'] = f'attachment; filename="{name}"'
+    return response
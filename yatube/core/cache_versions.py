@@ -0,0 +1,49 @@
+"""Версии областей кэша.
+
+Версия области (например, ``group:3``) входит в ключ закэшированного
+фрагмента или ответа. Изменение данных увеличивает версию, и старые
+записи просто перестают читаться, поэтому кэш можно держать долго.
+"""
+import time
+
+from django.core.cache import cache
+
+from .db_routers import pin_readers
+
+KEY_PREFIX = 'cache-version'
+
+
+def _key(scope):
+    return f'{KEY_PREFIX}:{scope}'
+
+
+def _initial_version():
+    # Если версия вытеснена из кэша, новая не должна совпасть с одной из
+    # прежних, иначе снова станут видны устаревшие записи.
+    return int(time.time() * 1000)
+
+
+def get_versions(*scopes):
+    keys = {_key(scope): scope for scope in scopes}
+    stored = cache.get_many(keys)
+    missing = [key for key in keys if key not in stored]
+    if missing:
+        for key in missing:
+            cache.add(key, _initial_version(), None)
+        stored.update(cache.get_many(missing))
+    return [stored[_key(scope)] for scope in scopes]
+
+
+def get_version_key(*scopes):
+    return '.'.join(str(version) for version in get_versions(*scopes))
+
+
+def bump(*scopes):
+    # Сначала чтения уходят в основную базу, потом меняется версия: под
+    # новой версией не должно оказаться данных с отстающей реплики.
+    pin_readers()
+    for scope in scopes:
+        try:
+            cache.incr(_key(scope))
+        except ValueError:
+            cache.set(_key(scope), _initial_version(), None)
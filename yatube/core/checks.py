@@ -0,0 +1,50 @@
+"""Проверка боевого профиля при запуске процесса.
+
+С PRODUCTION = True ``CoreConfig.ready`` вызывает ``debug_settings`` и
+не даёт процессу запуститься, если остались отладочные настройки.
+"""
+from django.conf import settings
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+CACHED_LOADER = 'django.template.loaders.cached.Loader'
+
+
+def is_cached(loaders):
+    return bool(loaders) and all(
+        isinstance(loader, (list, tuple)) and loader[0] == CACHED_LOADER
+        for loader in loaders)
+
+
+def debug_settings():
+    """Список отладочных настроек, с которыми нельзя работать в бою."""
+    problems = []
+    if settings.DEBUG:
+        problems.append('DEBUG включён: Django копит все SQL-запросы')
+    if not settings.ALLOWED_HOSTS or '*' in settings.ALLOWED_HOSTS:
+        problems.append(
+            'ALLOWED_HOSTS пуст или разрешает любой хост '
+            '(DJANGO_ALLOWED_HOSTS)')
+    for engine in settings.TEMPLATES:
+        options = engine.get('OPTIONS', {})
+        if options.get('debug', settings.DEBUG):
+            problems.append(f'{engine["BACKEND"]}: отладка шаблонов')
+        if not is_cached(options.get('loaders')):
+            problems.append(
+                f'{engine["BACKEND"]}: шаблоны не кэшируются '
+                f'(нужен {CACHED_LOADER})')
+    backend = import_string(settings.CACHES['default']['BACKEND'])
+    if issubclass(backend, (LocMemCache, DummyCache)):
+        problems.append('кэш по умолчанию не общий для процессов')
+    return problems
+
+
+def check_production():
+    if not settings.PRODUCTION:
+        return
+    problems = debug_settings()
+    if problems:
+        raise ImproperlyConfigured(
+            'Отладочные настройки в боевом профиле: ' + '; '.join(problems))
@@ -0,0 +1,101 @@
+"""Чтение с реплик, запись в основную базу.
+
+Чтения уходят на случайную реплику из DATABASE_REPLICAS, запись — в
+``default``. Реплика может отставать, поэтому пользователь, который
+только что что-то записал, REPLICA_STICKY_SECONDS секунд читает из
+основной базы: срок хранится в его сессии. Столько же после любого
+изменения данных (``pin_readers`` из ``cache_versions.bump``) из основной
+базы читают все: иначе запрос с отстающей реплики сохранил бы старые
+строки в кэш фрагментов или страниц под уже новой версией. Так же в
+основную базу идут все запросы небезопасных методов, чтения после записи
+в том же потоке, запросы внутри транзакции, модели приложений из
+PRIMARY_ONLY_APPS (сессии нужны раньше, чем известно, к какой базе
+прилип пользователь) и всё, что выполняется вне запросов: команды и
+фоновые потоки.
+"""
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+PRIMARY = 'default'
+STICKY_SESSION_KEY = '_read_primary_until'
+PINNED_UNTIL_KEY = 'replicas:read-primary-until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_local = threading.local()
+
+
+def is_pinned():
+    # После записи поток читает из основной базы до конца запроса, а вне
+    # запросов (команды, фоновые задачи) — всегда: ``pinned`` задаёт
+    # только ReplicaStickinessMiddleware.
+    return (getattr(_local, 'pinned', True)
+            or getattr(_local, 'wrote', False))
+
+
+def pin_readers():
+    """Отправляет чтения всех пользователей в основную базу на
+    REPLICA_STICKY_SECONDS секунд."""
+    if settings.DATABASE_REPLICAS:
+        cache.set(PINNED_UNTIL_KEY,
+                  time.time() + settings.REPLICA_STICKY_SECONDS,
+                  settings.REPLICA_STICKY_SECONDS)
+
+
+def readers_pinned():
+    return cache.get(PINNED_UNTIL_KEY, 0) > time.time()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (not replicas or is_pinned()
+                or model._meta.app_label in settings.PRIMARY_ONLY_APPS
+                or connections[PRIMARY].in_atomic_block):
+            return PRIMARY
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label not in settings.PRIMARY_ONLY_APPS:
+            _local.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        return obj1._state.db in databases and obj2._state.db in databases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики — копии основной базы, их схему не трогаем.
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaStickinessMiddleware:
+    """Ставится сразу после SessionMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            # Без реплик читать сессию заранее и продлевать срок незачем.
+            return self.get_response(request)
+        session = request.session
+        outer = is_pinned(), getattr(_local, 'wrote', False)
+        _local.wrote = False
+        _local.pinned = (
+            request.method not in SAFE_METHODS
+            or session.get(STICKY_SESSION_KEY, 0) > time.time()
+            or readers_pinned())
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = _local.wrote
+            _local.pinned, _local.wrote = outer
+        if wrote:
+            session[STICKY_SESSION_KEY] = (
+                time.time() + settings.REPLICA_STICKY_SECONDS)
+        return response
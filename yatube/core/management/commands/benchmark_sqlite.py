@@ -0,0 +1,129 @@
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+from django.test.utils import override_settings
+
+from core.db_routers import PRIMARY
+from core.sqlite import is_locked
+from posts.management.commands.benchmark_views import percentile
+from posts.models import Comment, Post
+from .copy_replicas import copy_database
+
+ALIAS = 'sqlite_benchmark'
+
+
+class Worker(threading.Thread):
+    """Повторяет операцию до конца замера и считает успехи и ошибки."""
+
+    def __init__(self, operation, deadline):
+        super().__init__(daemon=True)
+        self.operation = operation
+        self.deadline = deadline
+        self.times = []
+        self.locked = 0
+
+    def run(self):
+        try:
+            while time.monotonic() < self.deadline:
+                start = time.perf_counter()
+                try:
+                    self.operation()
+                except OperationalError as error:
+                    if not is_locked(error):
+                        raise
+                    self.locked += 1
+                    continue
+                self.times.append(time.perf_counter() - start)
+        finally:
+            connections[ALIAS].close()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность читателей и писателей '
+            'SQLite с настройками Django по умолчанию и с SQLITE_PRAGMAS '
+            'на копии текущей базы')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument(
+            '--duration', type=float, default=5,
+            help='Длительность каждого замера в секундах')
+
+    def read(self):
+        list(Post.objects.using(ALIAS).select_related(
+            'author', 'group').order_by('-pub_date')[:10])
+
+    def write(self):
+        # Как add_comment: чтение поста, вставка и обновление счётчика в
+        # одной транзакции; без сигналов, чтобы не трогать основную базу.
+        with transaction.atomic(using=ALIAS):
+            post = Post.objects.using(ALIAS).only('id').get(
+                pk=random.choice(self.post_ids))
+            Comment.objects.using(ALIAS).bulk_create([Comment(
+                post_id=post.id, author_id=self.author_id,
+                text='Нагрузочный комментарий')])
+            Post.objects.using(ALIAS).filter(pk=post.id).update(
+                comments_count=F('comments_count') + 1)
+
+    def run_phase(self, path, pragmas, options):
+        connections.databases[ALIAS] = {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': path}
+        deadline = time.monotonic() + options['duration']
+        with override_settings(SQLITE_PRAGMAS=pragmas):
+            workers = (
+                [Worker(self.read, deadline)
+                 for _ in range(options['readers'])],
+                [Worker(self.write, deadline)
+                 for _ in range(options['writers'])])
+            for worker in (*workers[0], *workers[1]):
+                worker.start()
+            for worker in (*workers[0], *workers[1]):
+                worker.join()
+        del connections.databases[ALIAS]
+        return [self.summarize(group, options['duration'])
+                for group in workers]
+
+    def summarize(self, workers, duration):
+        times = [took for worker in workers for took in worker.times]
+        return {
+            'ops': len(times) / duration,
+            'p95': percentile(times, 0.95) * 1000 if times else 0,
+            'locked': sum(worker.locked for worker in workers),
+        }
+
+    def handle(self, *args, **options):
+        posts = Post.objects.using(PRIMARY)
+        self.post_ids = list(posts.values_list('pk', flat=True)[:1000])
+        if not self.post_ids:
+            raise CommandError('Нет постов: сначала выполните seed_dataset')
+        self.author_id = posts.values_list(
+            'author_id', flat=True).first()
+        directory = tempfile.mkdtemp()
+        try:
+            source = os.path.join(directory, 'source.sqlite3')
+            copy_database(PRIMARY, source)
+            phases = (
+                ('по умолчанию', {'journal_mode': 'DELETE'}),
+                ('SQLITE_PRAGMAS', settings.SQLITE_PRAGMAS),
+            )
+            for number, (title, pragmas) in enumerate(phases):
+                path = os.path.join(directory, f'{number}.sqlite3')
+                shutil.copyfile(source, path)
+                reads, writes = self.run_phase(path, pragmas, options)
+                self.stdout.write(
+                    f'{title}: чтений {reads["ops"]:.0f}/с '
+                    f'(p95 {reads["p95"]:.1f} мс, блокировок '
+                    f'{reads["locked"]}), записей {writes["ops"]:.0f}/с '
+                    f'(p95 {writes["p95"]:.1f} мс, блокировок '
+                    f'{writes["locked"]})')
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
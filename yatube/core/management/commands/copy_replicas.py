@@ -0,0 +1,37 @@
+import os
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.db_routers import PRIMARY
+
+
+def copy_database(source, path):
+    """Согласованная копия SQLite через backup API, без остановки записи."""
+    connection = connections[source]
+    connection.ensure_connection()
+    target = sqlite3.connect(f'{path}.tmp')
+    try:
+        connection.connection.backup(target)
+    finally:
+        target.close()
+    os.replace(f'{path}.tmp', path)
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную SQLite-базу в файлы реплик из '
+            'DATABASE_REPLICAS, чтобы проверить чтение с реплик локально')
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError(
+                'Реплики не настроены: задайте DATABASE_REPLICA_FILES')
+        for alias in settings.DATABASE_REPLICAS:
+            database = connections.databases[alias]
+            if database['ENGINE'] != 'django.db.backends.sqlite3':
+                raise CommandError(f'{alias}: копируются только SQLite')
+            connections[alias].close()
+            copy_database(PRIMARY, database['NAME'])
+            self.stdout.write(f'{alias}: {database["NAME"]}')
@@ -0,0 +1,67 @@
+import json
+import os
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ('Сводка журнала медленных запросов по отпечаткам SQL: '
+            'сколько раз, суммарное и худшее время, представления и '
+            'места вызова')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default=None,
+            help='Журнал; по умолчанию SLOW_QUERY_LOG_FILE с архивами')
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument(
+            '--sort', choices=('total', 'count', 'max'), default='total')
+
+    def get_paths(self, path):
+        if path:
+            return [path]
+        path = settings.SLOW_QUERY_LOG_FILE
+        backups = (f'{path}.{number}' for number in range(
+            settings.SLOW_QUERY_LOG_BACKUPS, 0, -1))
+        return [name for name in (*backups, path) if os.path.exists(name)]
+
+    def read(self, paths):
+        for path in paths:
+            with open(path, encoding='utf-8') as log:
+                for line in log:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+
+    def handle(self, *args, **options):
+        paths = self.get_paths(options['path'])
+        if not paths:
+            raise CommandError('Журнал медленных запросов пуст')
+        groups = defaultdict(lambda: {
+            'count': 0, 'total': 0.0, 'max': 0.0, 'sql': '',
+            'views': Counter(), 'sites': Counter()})
+        for entry in self.read(paths):
+            group = groups[entry['fingerprint']]
+            group['count'] += 1
+            group['total'] += entry['duration_ms']
+            group['max'] = max(group['max'], entry['duration_ms'])
+            group['sql'] = entry['sql']
+            group['views'][entry['view']] += 1
+            group['sites'][entry['template'] or entry['code']] += 1
+        ranked = sorted(groups.items(), key=lambda item: item[1][
+            options['sort']], reverse=True)
+        for fingerprint, group in ranked[:options['limit']]:
+            self.stdout.write(self.style.SQL_KEYWORD(
+                f'{fingerprint}: {group["count"]} раз, всего '
+                f'{group["total"]:.1f} мс, в среднем '
+                f'{group["total"] / group["count"]:.1f} мс, худший '
+                f'{group["max"]:.1f} мс'))
+            self.stdout.write(f'  {group["sql"][:300]}')
+            for title, counter in (('представления', group['views']),
+                                   ('места', group['sites'])):
+                self.stdout.write(f'  {title}: ' + ', '.join(
+                    f'{name} ({count})'
+                    for name, count in counter.most_common(3)))
@@ -0,0 +1,472 @@
+"""Метрики запросов в текстовом формате Prometheus.
+
+``MetricsMiddleware`` на каждый запрос собирает время ответа, число и
+время SQL-запросов, время рендеринга шаблонов, попадания в кэш и размер
+ответа и складывает их в счётчики процесса с меткой ``view`` — именем
+URL вроде ``posts:index``. Это несколько сложений под блокировкой, без
+ввода-вывода.
+
+Если задан METRICS_DIR (одна папка на хост), каждый процесс раз в
+METRICS_FLUSH_INTERVAL секунд записывает свои счётчики в файл
+``<pid>.<nonce>.json`` в этой папке, а ``/metrics`` суммирует файлы всех
+процессов. Случайная часть имени не даёт процессу, получившему pid
+завершившегося, затереть его итоги. Счётчики завершившихся процессов
+остаются в сумме, как и положено счётчикам: процесс, собирающий метрики,
+переносит их в свой файл и удаляет файл завершившегося, так что сумма не
+уменьшается, а файлы не копятся.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import MemcachedCache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+from django.urls import Resolver404, resolve
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576)
+BUCKETS = {
+    'yatube_request_duration_seconds': DURATION_BUCKETS,
+    'yatube_response_size_bytes': SIZE_BUCKETS,
+}
+
+HELP = {
+    'yatube_requests_total': ('counter', 'Запросы по коду ответа'),
+    'yatube_request_duration_seconds': ('histogram', 'Время ответа'),
+    'yatube_response_size_bytes': ('histogram', 'Размер ответа'),
+    'yatube_db_queries_total': ('counter', 'SQL-запросы'),
+    'yatube_db_query_seconds_total': ('counter', 'Время SQL-запросов'),
+    'yatube_template_render_seconds_total': (
+        'counter', 'Время рендеринга шаблонов'),
+    'yatube_cache_requests_total': (
+        'counter', 'Чтения ключей кэша: hit или miss'),
+    'yatube_response_cache_total': (
+        'counter', 'Ответы из кэша страниц: hit или miss'),
+}
+
+logger = logging.getLogger('yatube.metrics')
+
+_local = threading.local()
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.template_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+def current_stats():
+    """Статистика текущего запроса или ``None`` вне запроса."""
+    return getattr(_local, 'stats', None)
+
+
+class Registry:
+    """Счётчики и гистограммы процесса.
+
+    Значения хранятся как ``{(имя, метки): число}``, гистограммы — как
+    ``{(имя, метки): [по корзинам..., сумма, количество]}``; метки —
+    кортеж пар, чтобы служить ключом словаря.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.pid = None
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counters = defaultdict(float)
+            self.histograms = {}
+            # Файлы завершившихся процессов, чьи счётчики уже в этих.
+            self.absorbed = set()
+            self.flushed = time.monotonic()
+
+    def file_name(self):
+        pid = os.getpid()
+        if self.pid != pid:
+            # Новый процесс, в том числе после fork, пишет в новый файл.
+            self.pid = pid
+            self.name = f'{pid}.{uuid.uuid4().hex[:12]}.json'
+        return self.name
+
+    def inc(self, name, labels, value=1):
+        self.counters[(name, labels)] += value
+
+    def observe(self, name, labels, value):
+        buckets = BUCKETS[name]
+        key = (name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = [0] * (len(buckets) + 3)
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                histogram[index] += 1
+                break
+        else:
+            histogram[len(buckets)] += 1
+        histogram[-2] += value
+        histogram[-1] += 1
+
+    def record(self, view, method, status, duration, size, stats,
+               response_cache):
+        labels = (('view', view),)
+        with self.lock:
+            self.inc('yatube_requests_total', labels + (
+                ('method', method), ('status', str(status))))
+            self.observe(
+                'yatube_request_duration_seconds', labels, duration)
+            if size is not None:
+                self.observe('yatube_response_size_bytes', labels, size)
+            self.inc('yatube_db_queries_total', labels, stats.queries)
+            self.inc('yatube_db_query_seconds_total', labels,
+                     stats.query_seconds)
+            self.inc('yatube_template_render_seconds_total', labels,
+                     stats.template_seconds)
+            for result, count in (('hit', stats.cache_hits),
+                                  ('miss', stats.cache_misses)):
+                if count:
+                    self.inc('yatube_cache_requests_total',
+                             labels + (('result', result),), count)
+            if response_cache:
+                self.inc('yatube_response_cache_total',
+                         labels + (('result', response_cache.lower()),))
+        self.maybe_flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[name, dict(labels), value] for (
+                    name, labels), value in self.counters.items()],
+                'histograms': [[name, dict(labels), list(values)] for (
+                    name, labels), values in self.histograms.items()],
+                'absorbed': sorted(self.absorbed),
+            }
+
+    def add(self, snapshot):
+        """Прибавляет к счётчикам процесса снимок другого процесса."""
+        with self.lock:
+            for name, labels, value in snapshot['counters']:
+                self.inc(name, tuple(labels.items()), value)
+            for name, labels, values in snapshot['histograms']:
+                key = (name, tuple(labels.items()))
+                histogram = self.histograms.setdefault(key, [0] * len(values))
+                for index, value in enumerate(values):
+                    histogram[index] += value
+            self.absorbed.update(snapshot.get('absorbed', ()))
+
+    def flush(self):
+        """Записывает счётчики процесса в METRICS_DIR.
+
+        Пишет один поток за раз: если запись уже идёт, остальные её не
+        ждут. Ошибки ввода-вывода пишутся в журнал и не доходят до
+        запроса.
+        """
+        if not self.flush_lock.acquire(blocking=False):
+            return
+        try:
+            self.flushed = time.monotonic()
+            directory = settings.METRICS_DIR
+            os.makedirs(directory, exist_ok=True)
+            name = self.file_name()
+            descriptor, temporary = tempfile.mkstemp(
+                dir=directory, prefix=f'{name}.', suffix='.tmp')
+            try:
+                with os.fdopen(descriptor, 'w') as output:
+                    json.dump(self.snapshot(), output)
+                os.replace(temporary, os.path.join(directory, name))
+            except BaseException:
+                os.unlink(temporary)
+                raise
+        except OSError:
+            logger.exception('Не удалось записать метрики в %s',
+                             settings.METRICS_DIR)
+        finally:
+            self.flush_lock.release()
+
+    def maybe_flush(self):
+        if settings.METRICS_DIR and (
+                time.monotonic() - self.flushed
+                >= settings.METRICS_FLUSH_INTERVAL):
+            self.flush()
+
+    def read_snapshots(self, directory):
+        """Снимки из папки по именам файлов, без уже перенесённых в
+        другие снимки. Если файл пропал между чтением списка и открытием
+        (его перенёс другой процесс), список читается заново."""
+        for _ in range(3):
+            snapshots, vanished = {}, False
+            for name in os.listdir(directory):
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    with open(os.path.join(directory, name)) as data:
+                        snapshots[name] = json.load(data)
+                except FileNotFoundError:
+                    vanished = True
+                except (OSError, ValueError):
+                    continue
+            if not vanished:
+                break
+        absorbed = {name for snapshot in snapshots.values()
+                    for name in snapshot.get('absorbed', ())}
+        return {name: snapshot for name, snapshot in snapshots.items()
+                if name not in absorbed}
+
+    def absorb_finished(self, directory, names):
+        """Переносит счётчики завершившихся процессов в свой файл.
+
+        Файл сначала переименовывается — это удаётся только одному
+        процессу; новое имя попадает в ``absorbed`` снимка, и после
+        записи своего файла переименованный удаляется.
+        """
+        claimed = []
+        for name in names:
+            if name == self.file_name() or process_alive(name):
+                continue
+            path = os.path.join(directory, name)
+            target = f'{path[:-len(".json")]}.absorbed.json'
+            try:
+                os.rename(path, target)
+                with open(target) as data:
+                    snapshot = json.load(data)
+            except (OSError, ValueError):
+                continue
+            self.add(snapshot)
+            with self.lock:
+                self.absorbed.add(os.path.basename(target))
+            claimed.append(target)
+        if not claimed:
+            return
+        self.flush()
+        for target in claimed:
+            try:
+                os.unlink(target)
+            except OSError:
+                continue
+
+    def collect(self):
+        """Снимки всех процессов: из METRICS_DIR или только этого."""
+        if not settings.METRICS_DIR:
+            return [self.snapshot()]
+        self.flush()
+        directory = settings.METRICS_DIR
+        self.absorb_finished(directory, self.read_snapshots(directory))
+        with self.lock:
+            # Удалённые файлы больше не нужно исключать из суммы.
+            self.absorbed = {
+                name for name in self.absorbed
+                if os.path.exists(os.path.join(directory, name))}
+        return list(self.read_snapshots(directory).values())
+
+
+def process_alive(name):
+    """Жив ли процесс, записавший файл ``<pid>.….json``. Если это
+    неизвестно, считается живым, и его файл не трогают."""
+    try:
+        pid = int(name.split('.', 1)[0])
+    except ValueError:
+        return True
+    if os.name != 'posix' or pid <= 0:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+registry = Registry()
+
+
+def merge(snapshots):
+    counters, histograms = defaultdict(float), {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            counters[(name, tuple(labels.items()))] += value
+        for name, labels, values in snapshot['histograms']:
+            key = (name, tuple(labels.items()))
+            if key in histograms:
+                histograms[key] = [
+                    total + value
+                    for total, value in zip(histograms[key], values)]
+            else:
+                histograms[key] = list(values)
+    return counters, histograms
+
+
+def format_labels(labels):
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('"', r'\"')
+         .replace('\n', r'\n'))
+        for name, value in labels)
+    return '{' + ','.join(
+        f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def format_number(value):
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+def render(snapshots):
+    """Текст в формате экспозиции Prometheus 0.0.4."""
+    counters, histograms = merge(snapshots)
+    by_name = defaultdict(list)
+    for (name, labels), value in counters.items():
+        by_name[name].append((labels, value))
+    for (name, labels), values in histograms.items():
+        by_name[name].append((labels, values))
+    lines = []
+    for name in sorted(by_name):
+        kind, description = HELP[name]
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(by_name[name]):
+            if kind == 'counter':
+                lines.append(
+                    f'{name}{format_labels(labels)} {format_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS[name] + ('+Inf',), value[:-2]):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket'
+                    f'{format_labels(labels + (("le", str(bound)),))} '
+                    f'{format_number(cumulative)}')
+            lines.append(
+                f'{name}_sum{format_labels(labels)} '
+                f'{format_number(value[-2])}')
+            lines.append(
+                f'{name}_count{format_labels(labels)} '
+                f'{format_number(value[-1])}')
+    return '\n'.join(lines) + '\n'
+
+
+def get_view_name(request):
+    match = request.resolver_match
+    if match is None:
+        # Ответ из кэша страниц отдаётся до разрешения URL.
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return 'unresolved'
+    return match.view_name
+
+
+def time_query(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats = current_stats()
+        if stats is not None:
+            stats.queries += 1
+            stats.query_seconds += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+    """Стоит первой, чтобы учитывать и ответы из кэша страниц."""
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _local.stats = stats = RequestStats()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(time_query))
+                response = self.get_response(request)
+        finally:
+            _local.stats = None
+        duration = time.perf_counter() - start
+        size = None if response.streaming else len(response.content)
+        registry.record(
+            get_view_name(request), request.method, response.status_code,
+            duration, size, stats, response.get('X-Cache'))
+        return response
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = current_stats()
+        if stats is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_seconds += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Шаблонизатор Django, который учитывает время рендеринга."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+class MeteredCacheMixin:
+    """Считает попадания и промахи чтений кэша текущего запроса."""
+
+    def get(self, key, default=None, version=None):
+        missing = object()
+        value = super().get(key, missing, version)
+        self._count(hits=int(value is not missing),
+                    misses=int(value is missing))
+        return default if value is missing else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        # Базовый get_many читает ключи через get: без этого они
+        # посчитались бы дважды.
+        stats, _local.stats = current_stats(), None
+        try:
+            found = super().get_many(keys, version)
+        finally:
+            _local.stats = stats
+        self._count(hits=len(found), misses=len(keys) - len(found))
+        return found
+
+    def _count(self, hits, misses):
+        stats = current_stats()
+        if stats is not None:
+            stats.cache_hits += hits
+            stats.cache_misses += misses
+
+
+class MeteredLocMemCache(MeteredCacheMixin, LocMemCache):
+    pass
+
+
+class MeteredFileBasedCache(MeteredCacheMixin, FileBasedCache):
+    pass
+
+
+class MeteredMemcachedCache(MeteredCacheMixin, MemcachedCache):
+    pass
@@ -0,0 +1,74 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from . import cache_versions
+
+RESPONSE_SCOPE = 'responses'
+
+
+def bump_response_generation():
+    """Делает недействительными все закэшированные страницы."""
+    cache_versions.bump(RESPONSE_SCOPE)
+
+
+class AnonymousResponseCacheMiddleware:
+    """Кэширует целые ответы для анонимных GET-запросов.
+
+    Стоит выше сессий и аутентификации: запрос без cookie сессии и
+    сообщений отдаётся из кэша, не доходя до них, ORM и шаблонов.
+    Кэшируются только ответы представлений из RESPONSE_CACHE_VIEWS,
+    без cookie и без CSRF-токена. Ключ строится из полного URL и
+    поколения, которое увеличивается при изменении контента.
+    """
+    header = 'X-Cache'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def is_cacheable_request(self, request):
+        return (
+            getattr(settings, 'RESPONSE_CACHE_ENABLED', False)
+            and request.method in ('GET', 'HEAD')
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES
+            and 'messages' not in request.COOKIES)
+
+    def is_cacheable_response(self, request, response):
+        match = request.resolver_match
+        return (
+            match is not None
+            and match.view_name in settings.RESPONSE_CACHE_VIEWS
+            and response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and not request.META.get('CSRF_COOKIE_USED'))
+
+    def get_cache_key(self, request):
+        url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+        generation = cache_versions.get_version_key(RESPONSE_SCOPE)
+        return f'response:{generation}:{request.method}:{url}'
+
+    def __call__(self, request):
+        if not self.is_cacheable_request(request):
+            return self.get_response(request)
+        key = self.get_cache_key(request)
+        response = cache.get(key)
+        if response is not None:
+            # Представление с условным GET здесь не выполняется, поэтому
+            # If-None-Match и If-Modified-Since проверяются по валидаторам
+            # сохранённого ответа.
+            response = get_conditional_response(
+                request, etag=response.get('ETag'),
+                last_modified=parse_http_date_safe(
+                    response.get('Last-Modified')),
+                response=response)
+            response[self.header] = 'HIT'
+            return response
+        response = self.get_response(request)
+        if self.is_cacheable_response(request, response):
+            cache.set(key, response, settings.RESPONSE_CACHE_TTL)
+        response[self.header] = 'MISS'
+        return response
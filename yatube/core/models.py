@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import connections, models, router
+from django.db.models.sql import InsertQuery
 
 
 class CreatedModel(models.Model):
@@ -9,3 +10,53 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class StoredFile(models.Model):
+    """Файл в хранилище с адресацией по содержимому и число ссылок
+    на него: одинаковые загрузки хранятся одним файлом."""
+    name = models.CharField(
+        'Имя файла',
+        max_length=255,
+        primary_key=True
+    )
+    references = models.PositiveIntegerField('Ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Файл в хранилище'
+        verbose_name_plural = 'Файлы в хранилище'
+
+    def __str__(self):
+        return self.name
+
+
+def bulk_insert(model, objects, batch_size=None, ignore_conflicts=False):
+    """Вставляет объекты как ``bulk_create``, но значения полей берутся
+    из объектов как есть: ``auto_now_add`` не подменяет заданные даты.
+
+    Сигналы не вызываются, id новых строк объектам не присваиваются.
+    Возвращает число действительно вставленных строк: с
+    ``ignore_conflicts`` конфликтующие строки не считаются.
+    """
+    using = router.db_for_write(model)
+    connection = connections[using]
+    opts = model._meta
+    with_pk = [obj for obj in objects if obj.pk is not None]
+    without_pk = [obj for obj in objects if obj.pk is None]
+    inserted = 0
+    for group, fields in (
+            (with_pk, opts.concrete_fields),
+            (without_pk, [field for field in opts.concrete_fields
+                          if not isinstance(field, models.AutoField)])):
+        if not group:
+            continue
+        size = batch_size or max(
+            connection.ops.bulk_batch_size(fields, group), 1)
+        for start in range(0, len(group), size):
+            query = InsertQuery(model, ignore_conflicts=ignore_conflicts)
+            query.insert_values(fields, group[start:start + size], raw=True)
+            with connection.cursor() as cursor:
+                for sql, params in query.get_compiler(using).as_sql():
+                    cursor.execute(sql, params)
+                    inserted += cursor.rowcount
+    return inserted
@@ -0,0 +1,217 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from . import cache_versions
+
+FEED_ORDERING = ('-pub_date', '-id')
+ELLIPSIS = '…'
+
+
+def _count_scope(model):
+    return f'count:{model._meta.label_lower}'
+
+
+def invalidate_counts(model):
+    """Сбрасывает закэшированные количества для всех выборок модели."""
+    cache_versions.bump(_count_scope(model))
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, который не считает ``COUNT(*)`` на каждый запрос.
+
+    Количество кэшируется по SQL выборки на ``count_ttl`` секунд и
+    сбрасывается через ``invalidate_counts``. С ``estimate=True`` для
+    выборки по всей таблице вместо полного подсчёта берётся ``MAX(pk)``.
+    После удалений оценка завышена; неполная или пустая страница
+    показывает, где выборка на самом деле кончается, и количество
+    уточняется.
+    """
+    ELLIPSIS = ELLIPSIS
+    count_ttl = 60 * 5
+
+    def __init__(self, object_list, per_page, orphans=0,
+                 allow_empty_first_page=True, estimate=False):
+        super().__init__(object_list, per_page, orphans,
+                         allow_empty_first_page)
+        self.estimate = estimate
+
+    def _count_cache_key(self):
+        model = self.object_list.model
+        version = cache_versions.get_version_key(_count_scope(model))
+        signature = hashlib.md5(
+            str(self.object_list.query).encode()).hexdigest()
+        return (f'paginator:count:{model._meta.label_lower}:{version}:'
+                f'{signature}')
+
+    def estimated_count(self):
+        """Оценка числа строк для выборки без условий, иначе ``None``.
+
+        ``MAX(pk)`` не меньше числа строк, а завышение исправляет
+        ``_clamp_estimate``. Статистика ``sqlite_stat1`` не подходит: её
+        обновляет только ANALYZE, и заниженная оценка прятала бы посты.
+        """
+        queryset = self.object_list
+        if queryset.query.where or queryset.query.distinct:
+            return None
+        return queryset.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, 'query'):
+            return super().count
+        key = self._count_cache_key()
+        count = cache.get(key)
+        if count is None:
+            count = self.estimated_count() if self.estimate else None
+            if count is None:
+                count = super().count
+            cache.set(key, count, self.count_ttl)
+        return count
+
+    def _set_count(self, count):
+        self.__dict__['count'] = count
+        self.__dict__.pop('num_pages', None)
+        if hasattr(self.object_list, 'query'):
+            cache.set(self._count_cache_key(), count, self.count_ttl)
+
+    def page(self, number):
+        page = super().page(number)
+        if self.estimate:
+            page = self._clamp_estimate(page)
+        return page
+
+    def get_page(self, number):
+        try:
+            return super().get_page(number)
+        except EmptyPage:
+            # Оценка оказалась завышенной; количество уже уточнено.
+            return self.page(self.num_pages)
+
+    def _clamp_estimate(self, page):
+        """Страница без пустых хвостовых страниц: неполная страница —
+        последняя, по ней известно точное количество."""
+        objects = list(page.object_list)
+        if len(objects) >= self.per_page:
+            return page
+        bottom = (page.number - 1) * self.per_page
+        if objects or not bottom:
+            self._set_count(bottom + len(objects))
+        else:
+            self._set_count(self.object_list.count())
+            raise EmptyPage('На этой странице нет записей')
+        page.object_list = objects
+        page.page_window = list(self.get_page_window(page.number))
+        return page
+
+    def _get_page(self, *args, **kwargs):
+        page = super()._get_page(*args, **kwargs)
+        page.page_window = list(self.get_page_window(page.number))
+        return page
+
+    def get_page_window(self, number, on_each_side=2, on_ends=1):
+        """Номера страниц вокруг текущей и по краям, пропуски — ELLIPSIS."""
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2 + 1:
+            yield from self.page_range
+            return
+        if number > 1 + on_each_side + on_ends + 1:
+            yield from range(1, on_ends + 1)
+            yield ELLIPSIS
+            start = number - on_each_side
+        else:
+            start = 1
+        if number < self.num_pages - on_each_side - on_ends - 1:
+            yield from range(start, number + on_each_side + 1)
+            yield ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1,
+                             self.num_pages + 1)
+        else:
+            yield from range(start, self.num_pages + 1)
+
+
+class CursorPaginator(CachedCountPaginator):
+    """Keyset-пагинатор: страница выбирается по значениям ключа сортировки
+    последней (или первой) записи, а не по OFFSET, поэтому стоимость
+    запроса не зависит от глубины страницы.
+
+    Возвращает обычный ``Page``; ссылки на соседние страницы лежат
+    в атрибутах ``next_cursor`` и ``previous_cursor``. Методы ``Page``,
+    завязанные на номер страницы, для курсорных страниц не используются.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, ordering=FEED_ORDERING):
+        super().__init__(object_list.order_by(*ordering), per_page)
+        self.ordering = tuple(ordering)
+        self.fields = tuple(field.lstrip('-') for field in self.ordering)
+
+    def encode_cursor(self, obj):
+        model_fields = self.object_list.model._meta
+        values = [
+            model_fields.get_field(name).value_to_string(obj)
+            for name in self.fields]
+        return urlsafe_base64_encode(json.dumps(values).encode())
+
+    def decode_cursor(self, cursor):
+        """Возвращает значения ключа или ``None`` для битого курсора."""
+        if not cursor:
+            return None
+        model_fields = self.object_list.model._meta
+        try:
+            values = json.loads(urlsafe_base64_decode(cursor).decode())
+            if len(values) != len(self.fields):
+                return None
+            return [
+                model_fields.get_field(name).to_python(value)
+                for name, value in zip(self.fields, values)]
+        except (ValueError, TypeError, UnicodeDecodeError):
+            return None
+
+    def _seek(self, values, backwards):
+        """Условие «строго после ключа» в порядке выдачи (или до него)."""
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != backwards
+            lookup = 'lt' if descending else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def _reversed_ordering(self):
+        return tuple(
+            field[1:] if field.startswith('-') else f'-{field}'
+            for field in self.ordering)
+
+    def cursor_page(self, after=None, before=None):
+        after_key = self.decode_cursor(after)
+        before_key = None if after_key else self.decode_cursor(before)
+        queryset = self.object_list
+        if before_key:
+            queryset = queryset.filter(
+                self._seek(before_key, backwards=True)
+            ).order_by(*self._reversed_ordering())
+        elif after_key:
+            queryset = queryset.filter(self._seek(after_key, False))
+        items = list(queryset[:self.per_page + 1])
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if before_key:
+            items.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, after_key is not None
+        page = Page(items, 1, self)
+        page.next_cursor = (
+            self.encode_cursor(items[-1]) if has_next and items else None)
+        page.previous_cursor = (
+            self.encode_cursor(items[0]) if has_previous and items else None)
+        return page
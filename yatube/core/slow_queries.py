@@ -0,0 +1,145 @@
+"""Журнал медленных SQL-запросов.
+
+Включается SLOW_QUERY_LOG_ENABLED. ``SlowQueryMiddleware`` ставит на все
+соединения обёртку ``execute_wrapper``; запрос дольше
+SLOW_QUERY_THRESHOLD_MS пишется строкой JSON во вращаемый файл
+SLOW_QUERY_LOG_FILE: длительность, отпечаток SQL без значений, имя URL
+и место вызова — строка проекта и, если запрос выполнил шаблон, строка
+шаблона. Стек разбирается только для медленных запросов.
+
+Сводку по отпечаткам печатает команда ``slow_queries``.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from contextlib import ExitStack, contextmanager
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Node
+from django.utils import timezone
+
+logger = logging.getLogger('yatube.slow_queries')
+
+MAX_SQL_LENGTH = 2000
+STRINGS = re.compile(r"'(?:[^']|'')*'")
+NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDERS = re.compile(r'%s|\?')
+LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+SPACES = re.compile(r'\s+')
+SKIPPED_FILES = (__file__, os.path.join('core', 'metrics.py'))
+
+
+def fingerprint(sql):
+    """SQL без значений: литералы и параметры — ``?``, списки — ``(...)``.
+    Запросы, отличающиеся только значениями, дают один отпечаток."""
+    sql = STRINGS.sub('?', sql)
+    sql = NUMBERS.sub('?', sql)
+    sql = PLACEHOLDERS.sub('?', sql)
+    sql = LISTS.sub('(...)', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+def fingerprint_hash(text):
+    return hashlib.md5(text.encode()).hexdigest()[:12]
+
+
+def is_project_file(filename):
+    return (filename.startswith(str(settings.BASE_DIR))
+            and 'site-packages' not in filename
+            and not filename.endswith(SKIPPED_FILES))
+
+
+def find_call_site(frame):
+    """Ближайшая строка кода проекта и ближайший узел шаблона."""
+    code = template = None
+    while frame is not None and not (code and template):
+        filename = frame.f_code.co_filename
+        if code is None and is_project_file(filename):
+            code = (f'{os.path.relpath(filename, settings.BASE_DIR)}:'
+                    f'{frame.f_lineno} in {frame.f_code.co_name}')
+        node = frame.f_locals.get('self')
+        # type(), а не isinstance: isinstance вычислил бы ленивый объект
+        # вроде request.user и выполнил бы новый запрос.
+        if template is None and issubclass(type(node), Node):
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                template = (f'{origin.template_name or origin.name}:'
+                            f'{token.lineno}')
+        frame = frame.f_back
+    return code, template
+
+
+def get_logger():
+    if not logger.handlers:
+        path = settings.SLOW_QUERY_LOG_FILE
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = RotatingFileHandler(
+            path, maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES,
+            backupCount=settings.SLOW_QUERY_LOG_BACKUPS, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+class SlowQueryWrapper:
+    def __init__(self, get_view_name):
+        self.get_view_name = get_view_name
+        self.threshold = settings.SLOW_QUERY_THRESHOLD_MS / 1000
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            if duration >= self.threshold:
+                self.log(sql, duration, context)
+
+    def log(self, sql, duration, context):
+        code, template = find_call_site(sys._getframe(2))
+        text = fingerprint(sql)
+        get_logger().info(json.dumps({
+            'time': timezone.now().isoformat(),
+            'duration_ms': round(duration * 1000, 3),
+            'database': context['connection'].alias,
+            'fingerprint': fingerprint_hash(text),
+            'sql': text[:MAX_SQL_LENGTH],
+            'view': self.get_view_name(),
+            'code': code,
+            'template': template,
+        }, ensure_ascii=False))
+
+
+@contextmanager
+def capture(get_view_name=lambda: None):
+    """Пишет в журнал медленные запросы всех соединений внутри блока."""
+    wrapper = SlowQueryWrapper(get_view_name)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(wrapper))
+        yield
+
+
+class SlowQueryMiddleware:
+    def __init__(self, get_response):
+        if not settings.SLOW_QUERY_LOG_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        def get_view_name():
+            match = request.resolver_match
+            return match.view_name if match else request.path
+
+        with capture(get_view_name):
+            return self.get_response(request)
@@ -0,0 +1,61 @@
+"""Настройка SQLite и повтор записи при блокировке.
+
+При каждом новом соединении с SQLite выполняются PRAGMA из
+SQLITE_PRAGMAS: WAL позволяет читать во время записи, busy_timeout
+заставляет ждать блокировку, а не падать сразу, synchronous=NORMAL в
+режиме WAL не теряет согласованность и намного дешевле FULL.
+
+Но и с WAL транзакция, которая начала с чтения, не может дождаться
+записи другой транзакции: SQLite сразу отвечает «database is locked».
+Поэтому представления, которые пишут, выполняются в транзакции целиком
+и при такой ошибке повторяются с растущей паузой. Производные данные
+(раскладка по лентам) пишутся после коммита отдельной транзакцией, чтобы
+не держать блокировку записи, пока выполняется представление.
+"""
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+LOCKED_MESSAGES = ('database is locked', 'database table is locked')
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def is_locked(error):
+    return any(message in str(error) for message in LOCKED_MESSAGES)
+
+
+def retry_on_locked(view):
+    """Выполняет представление (или другую запись вне транзакции) в
+    транзакции и повторяет его до SQLITE_WRITE_ATTEMPTS раз, если база
+    заблокирована."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if connection.in_atomic_block:
+            # Внешняя транзакция уже испорчена ошибкой, повтор не поможет.
+            return view(*args, **kwargs)
+        delay = settings.SQLITE_RETRY_DELAY
+        for attempt in range(1, settings.SQLITE_WRITE_ATTEMPTS + 1):
+            try:
+                with transaction.atomic():
+                    return view(*args, **kwargs)
+            except OperationalError as error:
+                if (not is_locked(error)
+                        or attempt == settings.SQLITE_WRITE_ATTEMPTS):
+                    raise
+            # Случайная доля паузы, чтобы повторы разошлись во времени.
+            time.sleep(delay * random.uniform(0.5, 1))
+            delay = min(delay * 2, settings.SQLITE_RETRY_MAX_DELAY)
+    return wrapper
@@ -0,0 +1,285 @@
+"""Статика с хэшами в именах, заранее сжатая.
+
+``collectstatic`` с хранилищем ``CompressedManifestStaticFilesStorage``:
+
+* вырезает из CSS из STATIC_PURGE_CSS правила, классы которых не
+  встречаются в шаблонах проекта и в STATIC_PURGE_SAFELIST;
+* называет файлы хэшем содержимого, как ManifestStaticFilesStorage;
+* кладёт рядом с файлами из STATIC_COMPRESS_EXTENSIONS сжатые копии
+  ``.gz`` и, если установлен пакет brotli, ``.br``.
+
+``PrecompressedStaticMiddleware`` отдаёт файлы из STATIC_ROOT: сжатую
+копию, если клиент её принимает, а файлы с хэшем — с бессрочным
+кэшированием.
+"""
+import gzip
+import mimetypes
+import os
+import re
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage, staticfiles_storage)
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from .views import IMMUTABLE_CACHE_CONTROL
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+TOKENS = re.compile(r'[\w-]+')
+CLASSES = re.compile(r'\.(-?[_a-zA-Z][\w-]*)')
+ATTRIBUTES = re.compile(r'\[[^\]]*\]')
+NEGATIONS = re.compile(r':not\([^()]*\)')
+QUALITY = re.compile(r'q\s*=\s*([01](?:\.\d*)?)')
+NESTED_AT_RULES = ('@media', '@supports')
+
+
+def used_tokens():
+    """Все слова из шаблонов проекта: имена классов среди них."""
+    directories = [
+        directory for engine in settings.TEMPLATES
+        for directory in engine.get('DIRS', [])]
+    directories += [
+        os.path.join(config.path, 'templates')
+        for config in apps.get_app_configs()
+        if config.path.startswith(str(settings.BASE_DIR))]
+    tokens = set(settings.STATIC_PURGE_SAFELIST)
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if name.endswith(('.html', '.txt')):
+                    with open(os.path.join(root, name),
+                              encoding='utf-8') as template:
+                        tokens.update(TOKENS.findall(template.read()))
+    return tokens
+
+
+def skip_comment(css, index):
+    """Индекс сразу после комментария, который начинается в ``index``."""
+    end = css.find('*/', index + 2)
+    return len(css) if end < 0 else end + 2
+
+
+def skip_string(css, index):
+    """Индекс сразу после строки в кавычках, которая начинается в
+    ``index``."""
+    quote = css[index]
+    end = index + 1
+    while end < len(css) and css[end] != quote:
+        end += 2 if css[end] == '\\' else 1
+    return end + 1
+
+
+def parse_css(css):
+    """Правила верхнего уровня: ``(заголовок, тело)``; у инструкций вроде
+    ``@charset`` и у комментариев тело ``None``."""
+    items = []
+    start = depth = 0
+    prelude_end = None
+    index = 0
+    while index < len(css):
+        char = css[index]
+        if css.startswith('/*', index):
+            end = skip_comment(css, index)
+            if depth == 0 and not css[start:index].strip():
+                items.append((css[index:end], None))
+                start = end
+            index = end
+            continue
+        if char in '"\'':
+            index = skip_string(css, index)
+            continue
+        if char == ';' and depth == 0:
+            items.append((css[start:index + 1].strip(), None))
+            start = index + 1
+        elif char == '{':
+            if depth == 0:
+                prelude_end = index
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                items.append((css[start:prelude_end].strip(),
+                              css[prelude_end + 1:index]))
+                start = index + 1
+        index += 1
+    return items
+
+
+def split_selectors(prelude):
+    selectors, depth, start = [], 0, 0
+    for index, char in enumerate(prelude):
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            selectors.append(prelude[start:index])
+            start = index + 1
+    selectors.append(prelude[start:])
+    return [selector.strip() for selector in selectors]
+
+
+def is_used(selector, tokens):
+    # Классы в [атрибутах] и :not() не обязаны быть на странице.
+    selector = NEGATIONS.sub('', ATTRIBUTES.sub('', selector))
+    return all(name in tokens for name in CLASSES.findall(selector))
+
+
+def purge_css(css, tokens):
+    """CSS без правил, все селекторы которых ссылаются на классы не из
+    ``tokens``. Комментарии, кроме лицензионных ``/*!``, удаляются."""
+    output = []
+    for prelude, body in parse_css(css):
+        if body is None:
+            if not prelude.startswith('/*') or prelude.startswith('/*!'):
+                output.append(prelude)
+        elif prelude.startswith(NESTED_AT_RULES):
+            inner = purge_css(body, tokens)
+            if inner:
+                output.append(f'{prelude}{{{inner}}}')
+        elif prelude.startswith('@'):
+            output.append(f'{prelude}{{{body}}}')
+        else:
+            selectors = [
+                selector for selector in split_selectors(prelude)
+                if is_used(selector, tokens)]
+            if selectors:
+                output.append(f'{",".join(selectors)}{{{body}}}')
+    return ''.join(output)
+
+
+def gzip_compress(data):
+    # mtime=0: одинаковые файлы дают одинаковые архивы. У gzip.compress
+    # параметр mtime появился только в Python 3.8.
+    output = BytesIO()
+    with gzip.GzipFile(fileobj=output, mode='wb', compresslevel=9,
+                       mtime=0) as archive:
+        archive.write(data)
+    return output.getvalue()
+
+
+COMPRESSORS = [('.gz', gzip_compress)]
+if brotli is not None:
+    COMPRESSORS.append(
+        ('.br', lambda data: brotli.compress(data, quality=11)))
+
+
+def compress_file(path):
+    """Сжатые копии файла; копия, которая не меньше файла, не пишется."""
+    with open(path, 'rb') as source:
+        data = source.read()
+    for suffix, compress in COMPRESSORS:
+        compressed = compress(data)
+        if len(compressed) < len(data):
+            with open(path + suffix, 'wb') as output:
+                output.write(compressed)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            self.purge(paths)
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            if name.endswith(tuple(settings.STATIC_COMPRESS_EXTENSIONS)):
+                compress_file(self.path(name))
+
+    def purge(self, paths):
+        tokens = None
+        for name in settings.STATIC_PURGE_CSS:
+            if name not in paths:
+                continue
+            tokens = tokens or used_tokens()
+            storage, path = paths[name]
+            with storage.open(path) as source:
+                css = source.read().decode('utf-8')
+            if self.exists(name):
+                self.delete(name)
+            self._save(name, ContentFile(purge_css(css, tokens).encode()))
+            # Хэш и сжатые копии строятся уже по очищенному файлу.
+            paths[name] = (self, name)
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding, кроме отвергнутых через q=0."""
+    encodings = set()
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        quality = QUALITY.search(params)
+        if quality and float(quality.group(1)) == 0:
+            continue
+        encodings.add(coding.strip().lower())
+    return encodings
+
+
+class PrecompressedStaticMiddleware:
+    """Отдаёт статику из STATIC_ROOT без Django-представлений. Ставится
+    сразу после SecurityMiddleware; включается STATIC_SERVE_ENABLED."""
+    encodings = (('br', '.br'), ('gzip', '.gz'))
+
+    def __init__(self, get_response):
+        if not settings.STATIC_SERVE_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.hashed_names = None
+
+    def __call__(self, request):
+        if (request.method in ('GET', 'HEAD')
+                and request.path_info.startswith(settings.STATIC_URL)):
+            response = self.serve(
+                request, request.path_info[len(settings.STATIC_URL):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def is_hashed(self, name):
+        if self.hashed_names is None:
+            self.hashed_names = set(
+                getattr(staticfiles_storage, 'hashed_files', {}).values())
+        return name in self.hashed_names
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+        immutable = self.is_hashed(name)
+        stat = os.stat(path)
+        if not immutable and not was_modified_since(
+                request.META.get('HTTP_IF_MODIFIED_SINCE'),
+                stat.st_mtime, stat.st_size):
+            return HttpResponseNotModified()
+        content_type = (mimetypes.guess_type(path)[0]
+                        or 'application/octet-stream')
+        accepted = accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        encoding = None
+        for coding, suffix in self.encodings:
+            if coding in accepted and os.path.isfile(path + suffix):
+                path, encoding = path + suffix, coding
+                break
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response['Vary'] = 'Accept-Encoding'
+        if encoding:
+            response['Content-Encoding'] = encoding
+        if immutable:
+            response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response['Last-Modified'] = http_date(stat.st_mtime)
+            response['Cache-Control'] = 'no-cache'
+        return response
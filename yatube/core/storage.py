@@ -0,0 +1,127 @@
+"""Хранилище медиафайлов с адресацией по содержимому.
+
+Файл называется по SHA-256 своего содержимого и раскладывается по
+вложенным каталогам из первых символов хэша:
+``posts/3f/a2/3fa2….jpg``. Содержимое по такому адресу никогда не
+меняется, поэтому URL можно отдавать с бессрочным кэшированием.
+Одинаковые загрузки хранятся одним файлом; число ссылок на него ведёт
+модель ``StoredFile``, и физически файл удаляется вместе с последней
+ссылкой.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import StoredFile
+
+INCOMING_DIR = '.incoming'
+SHARD_DEPTH = 2
+SHARD_WIDTH = 2
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        # Имя всё равно заменяется хэшем в _save, а совпадение имён
+        # означает совпадение содержимого.
+        return name
+
+    def content_name(self, name, digest):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        shards = [digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH]
+                  for i in range(SHARD_DEPTH)]
+        return '/'.join(
+            part for part in (directory, *shards, digest + extension)
+            if part)
+
+    def receive(self, content):
+        """Пишет содержимое во временный файл, одновременно считая хэш."""
+        incoming = self.path(INCOMING_DIR)
+        os.makedirs(incoming, exist_ok=True)
+        digest = hashlib.sha256()
+        descriptor, temporary = tempfile.mkstemp(dir=incoming)
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+        except BaseException:
+            os.remove(temporary)
+            raise
+        return temporary, digest.hexdigest()
+
+    def place(self, temporary, name):
+        """Кладёт принятый файл по адресу содержимого, если его там нет."""
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            return
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        os.chmod(temporary, self.file_permissions_mode or 0o644)
+        # Одинаковое содержимое: при гонке файл просто заменится таким же.
+        os.replace(temporary, full_path)
+
+    def _save(self, name, content):
+        temporary, digest = self.receive(content)
+        name = self.content_name(name, digest)
+        try:
+            # Сначала ссылка, потом файл: запись ссылки держит блокировку
+            # базы до коммита, поэтому delete_unreferenced либо увидит
+            # ссылку, либо удалит файл раньше, и он будет положен заново.
+            with transaction.atomic():
+                self.add_reference(name)
+                self.place(temporary, name)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        return name
+
+    def add_reference(self, name):
+        updated = StoredFile.objects.filter(name=name).update(
+            references=F('references') + 1)
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                StoredFile.objects.create(name=name, references=1)
+        except IntegrityError:
+            StoredFile.objects.filter(name=name).update(
+                references=F('references') + 1)
+
+    def release(self, name):
+        """Снимает одну ссылку на файл из ``StoredFile``.
+
+        С последней ссылкой файл удаляется, но после коммита и только
+        если за это время его не загрузили снова. Файлы без записи
+        (загруженные до появления этого хранилища) не трогает.
+        """
+        updated = StoredFile.objects.filter(
+            name=name, references__gt=1
+        ).update(references=F('references') - 1)
+        if updated:
+            return
+        deleted, _ = StoredFile.objects.filter(name=name).delete()
+        if deleted:
+            transaction.on_commit(lambda: self.delete_unreferenced(name))
+
+    def delete_unreferenced(self, name):
+        # Проверка ссылки — запись: она берёт блокировку базы, и файл
+        # удаляется под ней, пока параллельная загрузка того же
+        # содержимого не может записать ссылку и решить, что файл есть.
+        with transaction.atomic():
+            referenced = StoredFile.objects.filter(name=name).update(
+                references=F('references'))
+            if not referenced:
+                super().delete(name)
+
+    def delete(self, name):
+        if StoredFile.objects.filter(name=name).exists():
+            self.release(name)
+        else:
+            super().delete(name)
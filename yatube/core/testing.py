@@ -0,0 +1,31 @@
+"""Помощники для тестов.
+
+В Django 2.2 ``TestCase`` выполняет каждый тест в транзакции, которая
+откатывается, поэтому коллбэки ``transaction.on_commit`` в тестах не
+вызываются никогда. ``capture_on_commit_callbacks`` — перенос
+``TestCase.captureOnCommitCallbacks`` из Django 3.2.
+"""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+@contextmanager
+def capture_on_commit_callbacks(using=DEFAULT_DB_ALIAS, execute=False):
+    """Собирает коллбэки ``on_commit``, зарегистрированные внутри блока;
+    с ``execute=True`` выполняет их на выходе, как при коммите."""
+    callbacks = []
+    start = len(connections[using].run_on_commit)
+    try:
+        yield callbacks
+    finally:
+        # Выполненные коллбэки могут зарегистрировать новые.
+        while True:
+            count = len(connections[using].run_on_commit)
+            for _, func in connections[using].run_on_commit[start:]:
+                callbacks.append(func)
+                if execute:
+                    func()
+            if count == len(connections[using].run_on_commit):
+                break
+            start = count
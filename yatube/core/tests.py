@@ -1,6 +1,42 @@
+import gzip
+import importlib
+import json
+import os
+import shutil
+import tempfile
+import threading
 from http import HTTPStatus
+from io import StringIO
+from unittest import mock
 
-from django.test import TestCase, Client
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.db import (
+    OperationalError, connection, connections, router, transaction)
+from django.template import Context, Template
+from django.test import (
+    Client, RequestFactory, TestCase, TransactionTestCase, override_settings)
+from django.urls import reverse
+
+from posts.models import Comment, Post
+from . import metrics, slow_queries
+from .checks import check_production, debug_settings
+from .db_routers import PINNED_UNTIL_KEY, PRIMARY, STICKY_SESSION_KEY
+from .models import StoredFile
+from .paginators import CachedCountPaginator, ELLIPSIS
+from .sqlite import retry_on_locked
+from .staticfiles import accepted_encodings, purge_css
+from .storage import ContentAddressedStorage
+from .testing import capture_on_commit_callbacks
+from .views import IMMUTABLE_CACHE_CONTROL, serve_media
+
+User = get_user_model()
+STATIC_ROOT = tempfile.mkdtemp()
 
 
 class ViewTestClass(TestCase):
@@ -11,3 +47,632 @@ class ViewTestClass(TestCase):
         response = self.guest_client.get('/nonexist-page/')
         self.assertTemplateUsed(response, 'core/404.html')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class CachedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tester')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Пост {i}') for i in range(30))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_count_is_cached_until_posts_change(self):
+        self.assertEqual(CachedCountPaginator(Post.objects.all(), 10).count,
+                         30)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                CachedCountPaginator(Post.objects.all(), 10).count, 30)
+        with capture_on_commit_callbacks(execute=True):
+            Post.objects.create(author=self.user, text='Новый пост')
+        self.assertEqual(CachedCountPaginator(Post.objects.all(), 10).count,
+                         31)
+
+    def test_counts_are_keyed_by_queryset(self):
+        CachedCountPaginator(Post.objects.all(), 10).count
+        self.assertEqual(CachedCountPaginator(
+            Post.objects.filter(text='Пост 1'), 10).count, 1)
+
+    def test_estimated_count(self):
+        paginator = CachedCountPaginator(
+            Post.objects.all(), 10, estimate=True)
+        self.assertEqual(paginator.count, Post.objects.latest('pk').pk)
+
+    def test_estimate_is_clamped_by_empty_pages(self):
+        # MAX(pk) не уменьшается, когда удаляются старые посты.
+        Post.objects.filter(
+            pk__in=Post.objects.order_by('pk').values('pk')[:15]).delete()
+        paginator = CachedCountPaginator(
+            Post.objects.order_by('pk'), 10, estimate=True)
+        self.assertEqual(paginator.num_pages, 3)
+        page = paginator.get_page(3)
+        self.assertEqual(page.number, 2)
+        self.assertEqual(len(page), 5)
+        self.assertEqual(paginator.num_pages, 2)
+        self.assertEqual(page.page_window, [1, 2])
+        self.assertEqual(CachedCountPaginator(
+            Post.objects.order_by('pk'), 10, estimate=True).count, 15)
+
+    def test_estimate_is_clamped_by_short_page(self):
+        Post.objects.filter(
+            pk__in=Post.objects.order_by('pk').values('pk')[:5]).delete()
+        paginator = CachedCountPaginator(
+            Post.objects.order_by('pk'), 10, estimate=True)
+        page = paginator.get_page(3)
+        self.assertEqual(len(page), 5)
+        self.assertFalse(page.has_next())
+        self.assertEqual(paginator.count, 25)
+
+    def test_estimate_ignores_stale_statistics(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Новый пост {i}') for i in range(70))
+        paginator = CachedCountPaginator(
+            Post.objects.order_by('pk'), 10, estimate=True)
+        page = paginator.get_page(8)
+        self.assertEqual(page.number, 8)
+        self.assertTrue(page.has_next())
+        self.assertEqual(len(paginator.get_page(10)), 10)
+
+    def test_page_window(self):
+        paginator = CachedCountPaginator(Post.objects.all(), 1)
+        self.assertEqual(
+            list(paginator.get_page_window(15)),
+            [1, ELLIPSIS, 13, 14, 15, 16, 17, ELLIPSIS, 30])
+        self.assertEqual(list(paginator.get_page_window(2)),
+                         [1, 2, 3, 4, ELLIPSIS, 30])
+        self.assertEqual(list(paginator.get_page_window(30)),
+                         [1, ELLIPSIS, 28, 29, 30])
+        self.assertEqual(
+            list(CachedCountPaginator(Post.objects.all(), 10)
+                 .get_page_window(1)), [1, 2, 3])
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=True)
+class AnonymousResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tester')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_anonymous_pages_are_cached(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.guest_client.get(url)['X-Cache'], 'MISS')
+                self.assertEqual(
+                    self.guest_client.get(url)['X-Cache'], 'HIT')
+
+    def test_cached_page_answers_conditional_get(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        etag = self.guest_client.get(url)['ETag']
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Тестовый пост')
+
+    def test_query_string_is_part_of_key(self):
+        self.guest_client.get(reverse('posts:index'))
+        response = self.guest_client.get(reverse('posts:index') + '?page=1')
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_content_change_invalidates_pages(self):
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        with capture_on_commit_callbacks(execute=True):
+            Post.objects.create(author=self.user, text='Новый пост')
+        response = self.guest_client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, 'Новый пост')
+
+    def test_authenticated_users_bypass_cache(self):
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('X-Cache'))
+
+    def test_pages_with_csrf_token_are_not_stored(self):
+        url = reverse('users:login')
+        self.guest_client.get(url)
+        self.assertEqual(self.guest_client.get(url)['X-Cache'], 'MISS')
+
+
+class ContentAddressedStorageTests(TransactionTestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        self.storage = ContentAddressedStorage(location=self.location)
+
+    def test_identical_files_are_stored_once(self):
+        first = self.storage.save('posts/a.JPG', ContentFile(b'image'))
+        second = self.storage.save('posts/b.jpg', ContentFile(b'image'))
+        other = self.storage.save('posts/c.jpg', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertRegex(first, r'^posts/(\w\w)/(\w\w)/\1\2\w{60}\.jpg$')
+        self.assertEqual(StoredFile.objects.get(name=first).references, 2)
+
+    def test_file_removed_with_last_reference(self):
+        name = self.storage.save('posts/a.jpg', ContentFile(b'image'))
+        self.storage.save('posts/b.jpg', ContentFile(b'image'))
+        self.storage.delete(name)
+        self.assertTrue(self.storage.exists(name))
+        self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_file_is_placed_after_reference(self):
+        replace = os.replace
+        references = []
+
+        def check_reference(source, target):
+            references.append(StoredFile.objects.filter(
+                name=os.path.relpath(target, self.location)).exists())
+            replace(source, target)
+
+        with mock.patch('core.storage.os.replace', check_reference):
+            self.storage.save('posts/a.jpg', ContentFile(b'image'))
+        self.assertEqual(references, [True])
+
+    def test_upload_restores_missing_file(self):
+        name = self.storage.save('posts/a.jpg', ContentFile(b'image'))
+        os.remove(self.storage.path(name))
+        self.storage.save('posts/b.jpg', ContentFile(b'image'))
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(StoredFile.objects.get(name=name).references, 2)
+
+    def test_file_kept_when_uploaded_again_before_commit(self):
+        name = self.storage.save('posts/a.jpg', ContentFile(b'image'))
+        with transaction.atomic():
+            self.storage.delete(name)
+            self.storage.save('posts/b.jpg', ContentFile(b'image'))
+        self.assertTrue(self.storage.exists(name))
+
+    def test_content_addressed_media_is_immutable(self):
+        name = self.storage.save('posts/a.jpg', ContentFile(b'image'))
+        with open(os.path.join(self.location, 'legacy.jpg'), 'wb') as file:
+            file.write(b'legacy')
+        request = RequestFactory().get('/media/')
+        response = serve_media(request, name, self.location)
+        self.assertEqual(response['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        response = serve_media(request, 'legacy.jpg', self.location)
+        self.assertFalse(response.has_header('Cache-Control'))
+
+
+@override_settings(METRICS_TOKEN='secret', METRICS_DIR=None)
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def get_metrics(self):
+        response = self.staff_client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response.content.decode()
+
+    def test_records_view_metrics(self):
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        text = self.get_metrics()
+        view = 'view="posts:index"'
+        self.assertIn(
+            f'yatube_requests_total{{{view},method="GET",status="200"}} 2',
+            text)
+        self.assertIn(
+            f'yatube_request_duration_seconds_bucket{{{view},le="+Inf"}} 2',
+            text)
+        self.assertIn(f'yatube_request_duration_seconds_count{{{view}}} 2',
+                      text)
+        self.assertIn(f'yatube_response_size_bytes_count{{{view}}} 2', text)
+        for name in ('yatube_db_queries_total',
+                     'yatube_template_render_seconds_total'):
+            with self.subTest(name=name):
+                line = next(line for line in text.splitlines()
+                            if line.startswith(f'{name}{{{view}}}'))
+                self.assertGreater(float(line.split()[-1]), 0)
+        # Фрагмент ленты в первый раз не найден, во второй — из кэша.
+        self.assertIn(
+            f'yatube_cache_requests_total{{{view},result="hit"}}', text)
+        self.assertIn(
+            f'yatube_cache_requests_total{{{view},result="miss"}}', text)
+
+    def test_staff_or_token_only(self):
+        url = reverse('metrics')
+        self.assertEqual(
+            self.client.get(url).status_code, HTTPStatus.FORBIDDEN)
+        self.assertEqual(Client().get(
+            url, HTTP_AUTHORIZATION='Bearer wrong').status_code,
+            HTTPStatus.FORBIDDEN)
+        self.assertEqual(Client().get(
+            url, HTTP_AUTHORIZATION='Bearer secret').status_code,
+            HTTPStatus.OK)
+
+    def test_processes_aggregate_through_directory(self):
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        other = {
+            'counters': [['yatube_requests_total', {
+                'view': 'posts:index', 'method': 'GET', 'status': '200'}, 3]],
+            'histograms': [],
+        }
+        with open(os.path.join(directory, '1.0.json'), 'w') as data:
+            json.dump(other, data)
+        with self.settings(METRICS_DIR=directory):
+            self.client.get(reverse('posts:index'))
+            text = self.get_metrics()
+        self.assertIn(
+            'yatube_requests_total{view="posts:index",method="GET",'
+            'status="200"} 4', text)
+        self.assertCountEqual(
+            os.listdir(directory), ['1.0.json', metrics.registry.file_name()])
+
+    def test_finished_processes_are_absorbed(self):
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        finished = {
+            'counters': [['yatube_requests_total', {
+                'view': 'posts:index', 'method': 'GET', 'status': '200'}, 3]],
+            'histograms': [['yatube_request_duration_seconds', {
+                'view': 'posts:index'}, [1] + [0] * 11 + [0.004, 1]]],
+        }
+        # Процесс с тем же pid, запущенный позже, пишет в другой файл.
+        for name in ('999999.old.json', '999999.new.json'):
+            with open(os.path.join(directory, name), 'w') as data:
+                json.dump(finished, data)
+        expected = ('yatube_requests_total{view="posts:index",method="GET",'
+                    'status="200"} 6')
+        with self.settings(METRICS_DIR=directory):
+            with mock.patch('core.metrics.os.kill',
+                            side_effect=ProcessLookupError):
+                self.assertIn(expected, self.get_metrics())
+            self.assertEqual(
+                os.listdir(directory), [metrics.registry.file_name()])
+            self.assertIn(expected, self.get_metrics())
+
+    def test_concurrent_flushes(self):
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        errors = []
+
+        def flush():
+            try:
+                for _ in range(50):
+                    metrics.registry.flush()
+            except Exception as error:
+                errors.append(error)
+
+        with self.settings(METRICS_DIR=directory):
+            threads = [threading.Thread(target=flush) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+        name = metrics.registry.file_name()
+        self.assertTrue(name.startswith(f'{os.getpid()}.'))
+        self.assertEqual(os.listdir(directory), [name])
+
+    def test_flush_errors_do_not_fail_requests(self):
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        # Папка метрик — файл: записать в неё нельзя.
+        path = os.path.join(directory, 'file')
+        open(path, 'w').close()
+        with self.settings(METRICS_DIR=path, METRICS_FLUSH_INTERVAL=0):
+            with self.assertLogs('yatube.metrics', 'ERROR'):
+                response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+class SlowQueryLogTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, 'slow.log')
+        settings_override = override_settings(
+            SLOW_QUERY_LOG_ENABLED=True, SLOW_QUERY_THRESHOLD_MS=0,
+            SLOW_QUERY_LOG_FILE=self.path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(self.close_handlers)
+
+    def close_handlers(self):
+        for handler in list(slow_queries.logger.handlers):
+            handler.close()
+            slow_queries.logger.removeHandler(handler)
+
+    def read_log(self):
+        for handler in slow_queries.logger.handlers:
+            handler.flush()
+        with open(self.path, encoding='utf-8') as log:
+            return [json.loads(line) for line in log]
+
+    def test_fingerprint_hides_values(self):
+        self.assertEqual(
+            slow_queries.fingerprint(
+                "SELECT * FROM t WHERE a = 'x' AND b IN (%s, %s,%s)\n"
+                "LIMIT 21"),
+            'SELECT * FROM t WHERE a = ? AND b IN (...) LIMIT ?')
+
+    def test_request_queries_carry_view_and_code(self):
+        user = User.objects.create_user(username='reader')
+        client = Client()
+        client.force_login(user)
+        client.get(reverse('posts:index'))
+        entries = self.read_log()
+        self.assertTrue(entries)
+        self.assertEqual(
+            {entry['view'] for entry in entries}, {'posts:index'})
+        self.assertTrue(all(entry['code'] for entry in entries))
+
+    def test_template_frame(self):
+        User.objects.create_user(username='reader')
+        template = Template(
+            '{% for user in users %}\n{{ user.username }}{% endfor %}')
+        with slow_queries.capture(lambda: 'test'):
+            template.render(Context({'users': User.objects.all()}))
+        entry, = self.read_log()
+        self.assertEqual(entry['view'], 'test')
+        self.assertEqual(entry['template'], '<unknown source>:1')
+        self.assertIn('core/tests.py', entry['code'])
+
+    def test_command_aggregates_by_fingerprint(self):
+        with slow_queries.capture():
+            for pk in range(3):
+                User.objects.filter(pk=pk).exists()
+        output = StringIO()
+        call_command('slow_queries', stdout=output)
+        self.assertIn(': 3 раз', output.getvalue())
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(TransactionTestCase):
+    """Реплика — файловая копия тестовой базы, сделанная copy_replicas:
+    записи после копирования видны только в основной базе."""
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        connections.databases['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(directory, 'replica.sqlite3'),
+        }
+        self.addCleanup(self.remove_replica)
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.author, text='Копия')
+        call_command('copy_replicas', stdout=StringIO())
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def remove_replica(self):
+        connections['replica'].close()
+        del connections.databases['replica']
+        delattr(connections._connections, 'replica')
+
+    def post_detail(self, client):
+        return client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+
+    def test_reads_go_to_replica(self):
+        Post.objects.filter(pk=self.post.pk).update(text='Только в основной')
+        cache.clear()
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, 'Копия')
+        self.assertNotContains(response, 'Только в основной')
+
+    def test_changes_pin_all_readers(self):
+        Post.objects.create(author=self.author, text='Только в основной')
+        # Версии кэша уже новые: отстающая реплика не должна их заполнить.
+        self.assertContains(
+            Client().get(reverse('posts:index')), 'Только в основной')
+        # Срок прошёл: снова читаем с реплики.
+        cache.clear()
+        self.assertNotContains(
+            Client().get(reverse('posts:index')), 'Только в основной')
+
+    def test_background_threads_read_primary(self):
+        databases = []
+        thread = threading.Thread(
+            target=lambda: databases.append(router.db_for_read(Post)))
+        thread.start()
+        thread.join()
+        self.assertEqual(databases, [PRIMARY])
+
+    def test_writer_reads_own_writes(self):
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': 'Свежий комментарий'})
+        self.assertTrue(Comment.objects.filter(
+            text='Свежий комментарий').exists())
+        self.assertContains(
+            self.post_detail(self.client), 'Свежий комментарий')
+        cache.delete(PINNED_UNTIL_KEY)
+        self.assertNotContains(
+            self.post_detail(Client()), 'Свежий комментарий')
+        # Срок прошёл: снова читаем с реплики.
+        session = self.client.session
+        session[STICKY_SESSION_KEY] = 0
+        session.save()
+        self.assertNotContains(
+            self.post_detail(self.client), 'Свежий комментарий')
+
+
+class SqliteTests(TransactionTestCase):
+    def test_pragmas_applied(self):
+        with connection.cursor() as cursor:
+            for name in ('busy_timeout', 'cache_size', 'synchronous'):
+                cursor.execute(f'PRAGMA {name}')
+                value = cursor.fetchone()[0]
+                expected = settings.SQLITE_PRAGMAS[name]
+                if name == 'synchronous':
+                    expected = ('OFF', 'NORMAL', 'FULL').index(expected)
+                self.assertEqual(value, expected)
+
+    def failing_view(self, errors):
+        calls = []
+
+        def view():
+            calls.append(connection.in_atomic_block)
+            if errors:
+                raise errors.pop(0)
+            return 'ok'
+        return retry_on_locked(view), calls
+
+    @override_settings(SQLITE_RETRY_DELAY=0)
+    def test_retries_locked_writes(self):
+        view, calls = self.failing_view(
+            [OperationalError('database is locked')] * 2)
+        self.assertEqual(view(), 'ok')
+        self.assertEqual(calls, [True] * 3)
+
+    @override_settings(SQLITE_RETRY_DELAY=0, SQLITE_WRITE_ATTEMPTS=3)
+    def test_attempts_are_bounded(self):
+        view, calls = self.failing_view(
+            [OperationalError('database is locked')] * 5)
+        with self.assertRaises(OperationalError):
+            view()
+        self.assertEqual(len(calls), 3)
+
+    def test_other_errors_are_not_retried(self):
+        view, calls = self.failing_view([OperationalError('no such table')])
+        with self.assertRaises(OperationalError):
+            view()
+        self.assertEqual(len(calls), 1)
+
+    def test_benchmark(self):
+        author = User.objects.create_user(username='author')
+        Post.objects.create(author=author, text='Пост')
+        output = StringIO()
+        call_command('benchmark_sqlite', '--duration', '0.2',
+                     '--readers', '1', '--writers', '1', stdout=output)
+        self.assertIn('SQLITE_PRAGMAS: чтений', output.getvalue())
+        self.assertEqual(Comment.objects.count(), 0)
+
+
+class ProductionSettingsTests(TestCase):
+    def production_settings(self):
+        with mock.patch.dict(os.environ, {
+                'DJANGO_SECRET_KEY': 'secret',
+                'DJANGO_ALLOWED_HOSTS': 'yatube.example, www.yatube.example',
+                'DJANGO_CACHE_DIR': tempfile.gettempdir()}):
+            module = importlib.import_module('yatube.settings_production')
+            module = importlib.reload(module)
+        # Базу тестов не подменяем.
+        return {name: getattr(module, name) for name in dir(module)
+                if name.isupper() and name != 'DATABASES'}
+
+    def test_production_settings_pass(self):
+        values = self.production_settings()
+        self.assertEqual(values['ALLOWED_HOSTS'],
+                         ['yatube.example', 'www.yatube.example'])
+        self.assertTrue(values['RESPONSE_CACHE_ENABLED'])
+        with override_settings(**values):
+            self.assertEqual(debug_settings(), [])
+
+    def test_debug_settings_refused(self):
+        with override_settings(PRODUCTION=True, DEBUG=True):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'DEBUG'):
+                check_production()
+        with override_settings(DEBUG=True):
+            problems = debug_settings()
+        for fragment in ('DEBUG', 'ALLOWED_HOSTS', 'не кэшируются',
+                         'не общий'):
+            self.assertTrue(any(fragment in text for text in problems),
+                            fragment)
+
+    def test_development_settings_allowed(self):
+        check_production()
+
+
+@override_settings(
+    STATIC_ROOT=STATIC_ROOT, STATIC_SERVE_ENABLED=True,
+    STATICFILES_STORAGE=(
+        'core.staticfiles.CompressedManifestStaticFilesStorage'))
+class StaticPipelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command('collectstatic', '--noinput', verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(STATIC_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def read(self, name):
+        with open(os.path.join(STATIC_ROOT, name), 'rb') as data:
+            return data.read()
+
+    def test_purge_css(self):
+        css = ('/* x */@charset "UTF-8";body{margin:0}.used{a:1}'
+               '.unused,.used>b{b:2}.unused{c:3}a:not(.other){d:4}'
+               '@media (min-width:1px){.unused{e:5}}'
+               '@media print{.used{f:6}}')
+        self.assertEqual(
+            purge_css(css, {'used'}),
+            '@charset "UTF-8";body{margin:0}.used{a:1}.used>b{b:2}'
+            'a:not(.other){d:4}@media print{.used{f:6}}')
+
+    def test_collectstatic_hashes_purges_and_compresses(self):
+        name = staticfiles_storage.stored_name('css/bootstrap.min.css')
+        self.assertRegex(name, r'^css/bootstrap\.min\.[0-9a-f]{12}\.css$')
+        css = self.read(name)
+        self.assertIn(b'.navbar', css)
+        self.assertNotIn(b'.carousel', css)
+        self.assertLess(len(css), os.path.getsize(os.path.join(
+            settings.BASE_DIR, 'static', 'css', 'bootstrap.min.css')))
+        self.assertEqual(gzip.decompress(self.read(name + '.gz')), css)
+
+    def test_hashed_file_served_precompressed_and_immutable(self):
+        name = staticfiles_storage.stored_name('css/bootstrap.min.css')
+        url = settings.STATIC_URL + name
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)),
+            self.read(name))
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content),
+                         self.read(name))
+
+    def test_unhashed_file_revalidated(self):
+        url = settings.STATIC_URL + 'img/logo.png'
+        response = self.client.get(url)
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        response = self.client.get(settings.STATIC_URL + 'missing.css')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_accepted_encodings(self):
+        self.assertEqual(accepted_encodings('gzip;q=0.5, br;q=0, identity'),
+                         {'gzip', 'identity'})
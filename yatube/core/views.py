@@ -1,4 +1,18 @@
+import hmac
+import re
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.views.decorators.http import require_safe
+from django.views.static import serve
+
+from . import metrics as request_metrics
+
+# Файлы хранилища core.storage названы хэшем содержимого и не меняются.
+IMMUTABLE_MEDIA = re.compile(r'(^|/)[0-9a-f]{64}\.\w+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
 
 
 def page_not_found(request, exception):
@@ -9,9 +23,34 @@ def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
 
 
-def permission_denied(request, reason=''):
-    return render(request, 'core/403.html')
+def permission_denied(request, exception):
+    return render(request, 'core/403.html', status=403)
 
 
 def server_error(request, reason=''):
     return render(request, 'core/500.html')
+
+
+def serve_media(request, path, document_root=None, show_indexes=False):
+    """Отдаёт медиафайлы при DEBUG; неизменяемые — с бессрочным кэшем."""
+    response = serve(request, path, document_root, show_indexes)
+    if IMMUTABLE_MEDIA.search(path):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+def has_metrics_token(request):
+    token = settings.METRICS_TOKEN
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(token) and hmac.compare_digest(header, f'Bearer {token}')
+
+
+@require_safe
+def metrics(request):
+    """Метрики всех процессов для Prometheus: персоналу или по токену
+    METRICS_TOKEN в заголовке ``Authorization: Bearer``."""
+    if not (request.user.is_staff or has_metrics_token(request)):
+        raise PermissionDenied
+    return HttpResponse(
+        request_metrics.render(request_metrics.registry.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,14 +1,31 @@
 from django.contrib import admin
 
+from core.paginators import CachedCountPaginator
 from .models import Post, Group, Comment
+from .search import build_match, matching_ids_sql
 
 
-class PostAdmin(admin.ModelAdmin):
+class FullTextSearchMixin:
+    """Поиск в списке объектов через индекс FTS5 вместо LIKE."""
+    fts_table = None
+
+    def get_search_results(self, request, queryset, search_term):
+        match = build_match(search_term)
+        if not match:
+            return queryset, False
+        return queryset.filter(
+            pk__in=matching_ids_sql(self.fts_table, match)), False
+
+
+class PostAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
     search_fields = ('text',)
+    fts_table = 'posts_post_fts'
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
     list_editable = ('group',)
+    paginator = CachedCountPaginator
+    show_full_result_count = False
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -17,10 +34,13 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('post', 'author', 'text', 'created')
     search_fields = ('text',)
+    fts_table = 'posts_comment_fts'
     list_filter = ('created',)
+    paginator = CachedCountPaginator
+    show_full_result_count = False
 
 
 admin.site.register(Post, PostAdmin)
@@ -0,0 +1,44 @@
+"""Области версий кэша для лент постов.
+
+Любой пост меняет общую ленту, ленту своей группы и профиль автора;
+подписка или отписка меняет ленту подписок читателя; правка группы —
+её ленту и ссылки на неё в общей ленте и ленте подписок.
+"""
+from core import cache_versions
+
+GLOBAL_SCOPE = 'posts'
+PAGE_PARAMS = ('after', 'before', 'page')
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def reader_scope(user_id):
+    return f'reader:{user_id}'
+
+
+def bump_post_scopes(post, *old_group_ids):
+    group_ids = {post.group_id, *old_group_ids} - {None}
+    cache_versions.bump(
+        GLOBAL_SCOPE, author_scope(post.author_id),
+        *(group_scope(group_id) for group_id in group_ids))
+
+
+def bump_group_scope(group_id):
+    # Общая лента и лента подписок выводят ссылки на группы по slug.
+    cache_versions.bump(GLOBAL_SCOPE, group_scope(group_id))
+
+
+def bump_reader_scope(user_id):
+    cache_versions.bump(reader_scope(user_id))
+
+
+def get_fragment_key(request, *scopes):
+    """Ключ фрагмента ленты: версии областей и позиция страницы."""
+    position = [request.GET.get(param, '') for param in PAGE_PARAMS]
+    return ':'.join([cache_versions.get_version_key(*scopes), *position])
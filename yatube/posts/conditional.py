@@ -0,0 +1,102 @@
+"""Валидаторы для условных GET-запросов к страницам поста, группы и
+профиля.
+
+Состояние страницы — одна агрегирующая выборка по индексам (последний
+``pub_date`` или ``Comment.created``) и версии областей кэша. Из него
+строится ``ETag``; декоратор ``condition`` отвечает 304 раньше, чем
+представление выполнит свои запросы и шаблон.
+
+``Last-Modified`` не отдаётся: время последнего поста или комментария
+не меняется при правках и удалениях, смене описания группы или
+подписчиков, готовности миниатюр и не зависит от читателя, так что
+запрос только с ``If-Modified-Since`` получал бы 304 на изменённую
+страницу. Всё это учитывает ``ETag`` через версии областей.
+"""
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.db.models import Max
+from django.views.decorators.http import condition
+
+from core import cache_versions
+from . import caching
+from .models import Group, Post
+
+User = get_user_model()
+
+
+class PageState:
+    def __init__(self, last_modified, scopes, *parts):
+        self.last_modified = last_modified
+        self.scopes = scopes
+        self.parts = parts
+
+    def get_etag(self, request):
+        # Страница зависит и от читателя: шапка, форма комментария,
+        # кнопка подписки; и от позиции в ленте.
+        versions = cache_versions.get_version_key(*self.scopes)
+        key = ':'.join(str(part) for part in (
+            versions, self.last_modified, *self.parts,
+            request.user.pk, request.get_full_path()))
+        return hashlib.md5(key.encode()).hexdigest()
+
+
+def first_row(queryset):
+    # Без .first(): тот добавил бы ORDER BY по id к GROUP BY, а строка
+    # и так одна.
+    return next(iter(queryset[:1]), None)
+
+
+def latest(*dates):
+    dates = [date for date in dates if date is not None]
+    return max(dates) if dates else None
+
+
+def post_state(request, post_id):
+    row = first_row(Post.objects.filter(pk=post_id).order_by().values(
+        'author_id', 'group_id', 'pub_date'
+    ).annotate(last_comment=Max('comments__created')))
+    if row is None:
+        return None
+    scopes = [caching.author_scope(row['author_id'])]
+    if row['group_id']:
+        scopes.append(caching.group_scope(row['group_id']))
+    return PageState(
+        latest(row['pub_date'], row['last_comment']), scopes)
+
+
+def group_state(request, slug):
+    row = first_row(Group.objects.filter(slug=slug).order_by().values(
+        'id').annotate(last_post=Max('posts__pub_date')))
+    if row is None:
+        return None
+    return PageState(row['last_post'], [caching.group_scope(row['id'])])
+
+
+def profile_state(request, username):
+    row = first_row(User.objects.filter(username=username).order_by().values(
+        'id', 'counters__followers_count', 'counters__following_count'
+    ).annotate(last_post=Max('posts__pub_date')))
+    if row is None:
+        return None
+    scopes = [caching.author_scope(row['id'])]
+    if request.user.is_authenticated:
+        # Версия читателя меняется при его подписках и отписках.
+        scopes.append(caching.reader_scope(request.user.pk))
+    return PageState(
+        row['last_post'], scopes,
+        row['counters__followers_count'], row['counters__following_count'])
+
+
+def conditional_page(get_state):
+    """Декоратор ``condition`` с одним вычислением состояния на запрос."""
+    def state(request, *args, **kwargs):
+        if not hasattr(request, '_page_state'):
+            request._page_state = get_state(request, *args, **kwargs)
+        return request._page_state
+
+    def etag(request, *args, **kwargs):
+        page_state = state(request, *args, **kwargs)
+        return page_state.get_etag(request) if page_state else None
+
+    return condition(etag_func=etag)
@@ -0,0 +1,47 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются одним ``UPDATE ... SET x = x + 1`` через ``F()``, так
+что параллельные запросы не теряют изменения. Расхождения (массовые
+операции в обход сигналов, ручные правки) исправляет команда
+``reconcile_counters``.
+"""
+from django.db.models import F
+
+from .models import Post, UserCounter
+
+
+def increment_user(user_id, field):
+    updated = UserCounter.objects.filter(user_id=user_id).update(
+        **{field: F(field) + 1})
+    if updated:
+        return
+    _, created = UserCounter.objects.get_or_create(
+        user_id=user_id, defaults={field: 1})
+    if not created:
+        UserCounter.objects.filter(user_id=user_id).update(
+            **{field: F(field) + 1})
+
+
+def decrement_user(user_id, field):
+    UserCounter.objects.filter(
+        user_id=user_id, **{f'{field}__gt': 0}
+    ).update(**{field: F(field) - 1})
+
+
+def increment_comments(post_id):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + 1)
+
+
+def decrement_comments(post_id):
+    Post.objects.filter(pk=post_id, comments_count__gt=0).update(
+        comments_count=F('comments_count') - 1)
+
+
+def get_user_counters(user):
+    """Счётчики пользователя; для пользователя без строки счётчиков
+    возвращает несохранённый объект с нулями."""
+    try:
+        return user.counters
+    except UserCounter.DoesNotExist:
+        return UserCounter(user=user)
@@ -0,0 +1,46 @@
+"""Подписки читателя из кэша.
+
+Множество id авторов, на которых подписан пользователь, хранится в кэше
+под версией его области ``reader:<id>``. Подписка и отписка (сигналы
+``Follow``, в том числе из ``profile_follow``/``profile_unfollow``) и
+загрузка подписок ``import_content`` увеличивают эту версию, и
+множество перечитывается одним запросом. В пределах запроса множество
+запоминается на объекте пользователя, поэтому состояние подписки на
+любое число авторов стоит не больше одного обращения к кэшу.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from core import cache_versions
+from . import caching
+from .models import Follow
+
+KEY_PREFIX = 'following'
+
+
+def get_followed_ids(user):
+    """frozenset id авторов, на которых подписан ``user``."""
+    if not user.is_authenticated:
+        return frozenset()
+    followed = getattr(user, '_followed_ids', None)
+    if followed is not None:
+        return followed
+    version = cache_versions.get_version_key(caching.reader_scope(user.pk))
+    key = f'{KEY_PREFIX}:{user.pk}:{version}'
+    followed = cache.get(key)
+    if followed is None:
+        followed = frozenset(Follow.objects.filter(
+            user_id=user.pk).values_list('author_id', flat=True))
+        cache.set(key, followed, settings.FOLLOW_CACHE_TTL)
+    user._followed_ids = followed
+    return followed
+
+
+def follow_states(user, author_ids):
+    """``{id автора: подписан ли user}`` для всех ``author_ids`` сразу."""
+    followed = get_followed_ids(user)
+    return {author_id: author_id in followed for author_id in author_ids}
+
+
+def is_following(user, author_id):
+    return author_id in get_followed_ids(user)
@@ -1,7 +1,9 @@
 from django import forms
 
 from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
 
+from . import images
 from .models import Post, Comment
 
 
@@ -16,6 +18,12 @@ class PostForm(forms.ModelForm):
             raise ValidationError('Введите текс записи')
         return data
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            return images.normalize(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,83 @@
+"""Нормализация картинок постов при загрузке.
+
+Оригинал не сохраняется: по заголовку проверяются формат и размер в
+пикселях (без декодирования, поэтому «бомбы» отсекаются сразу), затем
+картинка поворачивается по EXIF, уменьшается до POST_IMAGE_MAX_SIZE и
+записывается без метаданных прогрессивным JPEG или WebP. JPEG
+декодируется сразу в уменьшенном масштабе (``draft``), а результат
+пишется во временный файл, а не в память.
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from PIL import Image, ImageOps
+
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+
+
+class NormalizedImage(File):
+    """Обработанная картинка во временном файле."""
+
+    def __init__(self, file, name, image_format, size):
+        super().__init__(file, name)
+        self.image_format = image_format
+        self.image_size = size
+        self.content_type = f'image/{image_format.lower()}'
+
+
+def sniff(upload):
+    """Открывает картинку, прочитав только заголовок, и проверяет её."""
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError(
+            'Загрузите правильное изображение.', code='invalid_image')
+    if image.format not in settings.POST_IMAGE_UPLOAD_FORMATS:
+        raise ValidationError(
+            'Формат %(format)s не поддерживается.',
+            code='unsupported_format', params={'format': image.format})
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Изображение %(width)s×%(height)s слишком велико.',
+            code='too_many_pixels',
+            params={'width': width, 'height': height})
+    return image
+
+
+def get_output_format():
+    image_format = settings.POST_IMAGE_MASTER_FORMAT
+    Image.init()
+    return image_format if image_format in Image.SAVE else 'JPEG'
+
+
+def normalize(upload):
+    """Возвращает нормализованную копию загруженной картинки."""
+    image = sniff(upload)
+    max_size = settings.POST_IMAGE_MAX_SIZE
+    # Для JPEG декодер сразу уменьшает картинку в 2–8 раз, если это
+    # не делает её меньше нужного размера.
+    image.draft('RGB', (max_size, max_size))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_size, max_size), Image.LANCZOS)
+    image_format = get_output_format()
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        image = image.convert('RGBA')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    output = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    options = {'quality': settings.POST_IMAGE_QUALITY}
+    if image_format == 'JPEG':
+        options.update(progressive=True, optimize=True)
+    image.save(output, image_format, **options)
+    output.seek(0)
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    return NormalizedImage(
+        output, f'{stem}.{EXTENSIONS[image_format]}', image_format,
+        image.size)
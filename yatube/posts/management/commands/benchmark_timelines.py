@@ -0,0 +1,50 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from core.paginators import CursorPaginator
+from posts import timelines
+from posts.models import Post
+from posts.views import POSTS_PER_PAGE
+
+User = get_user_model()
+
+
+def first_page_time(paginator):
+    start = time.perf_counter()
+    list(paginator.cursor_page())
+    return time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время первой страницы ленты подписок: '
+            'join через Follow против материализованной ленты')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20,
+                            help='Сколько самых подписанных читателей взять')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        readers = User.objects.annotate(
+            follows=Count('follower')).filter(
+            follows__gt=0).order_by('-follows')[:options['users']]
+        join_times, timeline_times = [], []
+        for user in readers:
+            for _ in range(options['repeat']):
+                join_times.append(first_page_time(CursorPaginator(
+                    Post.objects.filter(author__following__user=user),
+                    POSTS_PER_PAGE)))
+                timeline_times.append(first_page_time(
+                    timelines.get_feed_paginator(user, POSTS_PER_PAGE)))
+        if not join_times:
+            self.stdout.write('Нет пользователей с подписками')
+            return
+        for title, times in (('join', join_times),
+                             ('timeline', timeline_times)):
+            self.stdout.write(
+                f'{title:>8}: median {statistics.median(times) * 1000:.2f} '
+                f'ms, max {max(times) * 1000:.2f} ms, n={len(times)}')
@@ -0,0 +1,131 @@
+import json
+import math
+import time
+import tracemalloc
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post, UserCounter
+from posts.urls import app_name, urlpatterns
+
+
+def percentile(times, share):
+    """Значение, не меньше которого ``share`` измерений (nearest rank)."""
+    ordered = sorted(times)
+    return ordered[max(math.ceil(share * len(ordered)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = ('Измеряет перцентили времени ответа, число SQL-запросов и '
+            'пиковую память каждой страницы приложения posts на текущих '
+            'данных (например, после seed_dataset)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом')
+        parser.add_argument(
+            '--urls', nargs='+', help='Имена URL; по умолчанию все')
+        parser.add_argument(
+            '--json', dest='json_path',
+            help='Сохранить результаты в JSON для сравнения прогонов')
+
+    def get_samples(self):
+        """Самые нагруженные объекты: на них страницы медленнее всего."""
+        reader = UserCounter.objects.filter(posts_count__gt=0).order_by(
+            '-following_count').select_related('user').first()
+        author = UserCounter.objects.exclude(pk=getattr(
+            reader, 'pk', None)).order_by('-posts_count').select_related(
+            'user').first()
+        group = Group.objects.annotate(
+            total=Count('posts')).order_by('-total').first()
+        post = Post.objects.order_by('-comments_count').first()
+        if not all((reader, author, group, post)):
+            raise CommandError(
+                'Мало данных: сначала заполните базу seed_dataset')
+        own_post = Post.objects.filter(author=reader.user).latest('pub_date')
+        return reader.user, {
+            'slug': group.slug,
+            'username': author.user.username,
+            'post_id': post.pk,
+            'own_post_id': own_post.pk,
+            'query': post.text.split()[0],
+        }
+
+    def get_url(self, pattern, samples):
+        kwargs = {}
+        for name in pattern.pattern.converters:
+            # Редактировать можно только свой пост.
+            key = 'own_post_id' if (
+                pattern.name == 'post_edit' and name == 'post_id') else name
+            kwargs[name] = samples[key]
+        url = reverse(f'{app_name}:{pattern.name}', kwargs=kwargs)
+        if pattern.name == 'search':
+            url += f'?q={samples["query"]}'
+        return url
+
+    def request(self, client, url, cold):
+        if cold:
+            cache.clear()
+        response = client.get(url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def measure(self, client, url, options):
+        for _ in range(options['warmup']):
+            self.request(client, url, options['cold'])
+        times = []
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            self.request(client, url, options['cold'])
+            times.append(time.perf_counter() - start)
+        # Запросы и память — отдельным прогоном: трассировка замедляет
+        # ответ и исказила бы время.
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.request(client, url, options['cold'])
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {
+            'status': response.status_code,
+            'p50_ms': percentile(times, 0.5) * 1000,
+            'p95_ms': percentile(times, 0.95) * 1000,
+            'p99_ms': percentile(times, 0.99) * 1000,
+            'queries': len(queries),
+            'peak_kib': peak / 1024,
+        }
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть больше нуля')
+        reader, samples = self.get_samples()
+        client = Client()
+        client.force_login(reader)
+        names = options['urls']
+        results = {}
+        self.stdout.write(
+            f'{"URL":<18}{"код":>5}{"p50 мс":>9}{"p95 мс":>9}{"p99 мс":>9}'
+            f'{"SQL":>5}{"память КиБ":>12}')
+        for pattern in urlpatterns:
+            if names and pattern.name not in names:
+                continue
+            url = self.get_url(pattern, samples)
+            result = results[pattern.name] = self.measure(
+                client, url, options)
+            self.stdout.write(
+                f'{pattern.name:<18}{result["status"]:>5}'
+                f'{result["p50_ms"]:>9.2f}{result["p95_ms"]:>9.2f}'
+                f'{result["p99_ms"]:>9.2f}{result["queries"]:>5}'
+                f'{result["peak_kib"]:>12.0f}')
+        if options['json_path']:
+            with open(options['json_path'], 'w') as output:
+                json.dump(results, output, indent=2)
@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Выгружает посты, комментарии или подписки в NDJSON или CSV '
+            'потоком, не загружая всю выборку в память')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(export.KINDS))
+        parser.add_argument(
+            '--format', choices=list(export.FORMATS), default='ndjson')
+        parser.add_argument(
+            '--user', help='Выгрузить только записи этого пользователя')
+        parser.add_argument(
+            '--output', help='Файл для выгрузки; по умолчанию stdout')
+        parser.add_argument(
+            '--chunk-size', type=int, default=export.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f'Нет пользователя {options["user"]}')
+        parts = export.export(
+            options['kind'], options['format'], user, options['chunk_size'])
+        if not options['output']:
+            for part in parts:
+                self.stdout.write(part, ending='')
+            return
+        with open(options['output'], 'w', newline='',
+                  encoding='utf-8') as output:
+            output.writelines(parts)
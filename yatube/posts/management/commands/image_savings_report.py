@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+
+from posts import thumbnails
+from posts.models import Group, Post
+from posts.views import POSTS_PER_PAGE
+
+
+def file_size(thumbnail):
+    try:
+        return default.storage.size(thumbnail.name)
+    except OSError:
+        return 0
+
+
+class Command(BaseCommand):
+    help = ('Показывает, сколько байт картинок экономят варианты srcset '
+            'на первых страницах ленты и групп по сравнению с одной '
+            'JPEG-миниатюрой полной ширины')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', default='card')
+        parser.add_argument(
+            '--viewport-width', type=int, default=412,
+            help='Ширина окна браузера в CSS-пикселях')
+        parser.add_argument('--dpr', type=float, default=2.0)
+        parser.add_argument(
+            '--formats', nargs='+',
+            help='Форматы, которые понимает браузер (по умолчанию все)')
+        parser.add_argument('--groups', type=int, default=10)
+
+    def pick(self, image, size, needed, formats):
+        """Вариант, который выбрал бы браузер: первый понятный ему
+        формат и наименьшая ширина не меньше нужной."""
+        ready = thumbnails.get_ready_variants(image, size)
+        for image_format, variants in ready.items():
+            if formats and image_format not in formats:
+                continue
+            for width, thumbnail in variants:
+                if width >= needed:
+                    return thumbnail
+            return variants[-1][1]
+        return None
+
+    def measure(self, posts, options):
+        size = options['size']
+        geometry, _ = settings.POST_THUMBNAILS[size]
+        width = int(geometry.split('x')[0])
+        needed = min(options['viewport_width'], width) * options['dpr']
+        baseline = responsive = images = 0
+        for post in posts.exclude(image='')[:POSTS_PER_PAGE]:
+            full = thumbnails.get_ready_thumbnail(post.image, size)
+            if full.url is None:
+                continue
+            chosen = self.pick(post.image, size, needed, options['formats'])
+            images += 1
+            baseline += file_size(full)
+            responsive += file_size(chosen) if chosen else file_size(full)
+        return images, baseline, responsive
+
+    def handle(self, *args, **options):
+        pages = [('index', Post.objects.all())]
+        pages += [
+            (f'group_list {group.slug}', group.posts.all())
+            for group in Group.objects.order_by('pk')[:options['groups']]]
+        total_baseline = total_responsive = 0
+        for name, posts in pages:
+            images, baseline, responsive = self.measure(
+                posts.order_by('-pub_date', '-id'), options)
+            if not images:
+                continue
+            total_baseline += baseline
+            total_responsive += responsive
+            saved = baseline - responsive
+            self.stdout.write(
+                f'{name}: картинок {images}, было {baseline} Б, '
+                f'стало {responsive} Б, сэкономлено {saved} Б '
+                f'({100 * saved / baseline if baseline else 0:.0f}%)')
+        saved = total_baseline - total_responsive
+        self.stdout.write(self.style.SUCCESS(
+            f'Всего сэкономлено: {saved} Б из {total_baseline} Б'))
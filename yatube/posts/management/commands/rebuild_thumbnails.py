@@ -0,0 +1,171 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.middleware import bump_response_generation
+from posts import caching, thumbnails
+from posts.models import Post
+
+DEFAULT_CHECKPOINT = os.path.join(
+    settings.BASE_DIR, 'logs', 'rebuild_thumbnails.checkpoint')
+
+
+def build_chunk(images):
+    """Создаёт миниатюры порции картинок, возвращает картинки с ошибками."""
+    failed = []
+    for image_name in images:
+        try:
+            thumbnails.generate(image_name)
+        except Exception:
+            thumbnails.logger.exception(
+                'Не удалось создать миниатюры %s', image_name)
+            failed.append(image_name)
+    return failed
+
+
+class Command(BaseCommand):
+    help = ('Создаёт миниатюры всех размеров из POST_THUMBNAILS для '
+            'картинок постов в нескольких процессах; прерванный запуск '
+            'продолжается с последней завершённой порции, а посты, '
+            'картинки которых не удалось обработать, повторяются')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Число процессов; 0 — всё в текущем процессе')
+        parser.add_argument('--chunk-size', type=int, default=50)
+        parser.add_argument(
+            '--checkpoint', default=DEFAULT_CHECKPOINT,
+            help='Файл с id последнего обработанного поста; id постов '
+                 'с ошибками пишутся рядом, в файл с суффиксом .failed')
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать с первого поста, не читая контрольную точку')
+
+    def read_checkpoint(self, path):
+        try:
+            with open(path) as checkpoint:
+                return int(checkpoint.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def read_failed(self, path):
+        try:
+            with open(path) as failed:
+                return {int(line) for line in failed if line.strip()}
+        except (FileNotFoundError, ValueError):
+            return set()
+
+    def write_file(self, path, content):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(f'{path}.tmp', 'w') as file:
+            file.write(content)
+        os.replace(f'{path}.tmp', path)
+
+    def chunks(self, last_id, retry_ids, chunk_size):
+        posts = Post.objects.exclude(image='').order_by('pk').values_list(
+            'pk', 'image', 'author_id', 'group_id')
+        retry_ids = sorted(retry_ids)
+        for start in range(0, len(retry_ids), chunk_size):
+            rows = list(posts.filter(
+                pk__in=retry_ids[start:start + chunk_size]))
+            if rows:
+                yield rows
+        while True:
+            rows = list(posts.filter(pk__gt=last_id)[:chunk_size])
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1][0]
+
+    def finish_chunk(self, rows, failed_images):
+        for _, _, author_id, group_id in rows:
+            caching.bump_post_scopes(
+                Post(author_id=author_id, group_id=group_id))
+        bump_response_generation()
+        # Сначала список ошибок, потом контрольная точка: после
+        # прерывания пост с ошибкой не окажется позади неё незамеченным.
+        self.retry_ids.difference_update(pk for pk, _, _, _ in rows)
+        self.failed_ids.update(
+            pk for pk, image, _, _ in rows if image in failed_images)
+        failed_ids = sorted(self.retry_ids | self.failed_ids)
+        self.write_file(self.failed_path, ''.join(
+            f'{pk}\n' for pk in failed_ids))
+        self.last_id = max(self.last_id, rows[-1][0])
+        self.write_file(self.checkpoint, str(self.last_id))
+
+    def wait_oldest(self, pending):
+        rows, future = pending.popleft()
+        failed_images = future.result()
+        self.finish_chunk(rows, set(failed_images))
+        self.done += len(rows)
+        self.failed += len(failed_images)
+
+    def remove_files(self):
+        for path in (self.checkpoint, self.failed_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def load_state(self, options):
+        self.checkpoint = options['checkpoint']
+        self.failed_path = f'{self.checkpoint}.failed'
+        if options['restart']:
+            self.remove_files()
+        self.last_id = self.read_checkpoint(self.checkpoint)
+        self.retry_ids = self.read_failed(self.failed_path)
+        self.failed_ids = set()
+        self.done = self.failed = 0
+        if self.last_id:
+            self.stdout.write(f'Продолжаем после поста {self.last_id}')
+        if self.retry_ids:
+            self.stdout.write(
+                f'Повторяем постов с ошибками: {len(self.retry_ids)}')
+
+    def handle(self, *args, **options):
+        self.load_state(options)
+        workers = options['workers']
+        started = time.monotonic()
+        pool = None
+        if workers:
+            # Дочерние процессы не должны унаследовать открытое соединение.
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=workers)
+        pending = deque()
+        try:
+            for rows in self.chunks(self.last_id, self.retry_ids,
+                                    options['chunk_size']):
+                images = [image for _, image, _, _ in rows]
+                future = Future()
+                if pool:
+                    future = pool.submit(build_chunk, images)
+                else:
+                    future.set_result(build_chunk(images))
+                pending.append((rows, future))
+                # Контрольная точка сдвигается только по порядку порций,
+                # поэтому после прерывания ни одна картинка не потеряется.
+                while len(pending) > workers * 2 or (
+                        pending and pending[0][1].done()):
+                    self.wait_oldest(pending)
+            while pending:
+                self.wait_oldest(pending)
+        finally:
+            if pool:
+                # shutdown(cancel_futures=True) есть только с Python 3.9.
+                for _, future in pending:
+                    future.cancel()
+                pool.shutdown(wait=True)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок обработано: {self.done}, с ошибками: {self.failed}, '
+            f'за {elapsed:.1f} с'))
+        if self.failed_ids:
+            self.stdout.write(self.style.WARNING(
+                f'id постов с ошибками записаны в {self.failed_path}; '
+                'следующий запуск повторит их'))
+        else:
+            self.remove_files()
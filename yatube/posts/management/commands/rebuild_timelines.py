@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts import timelines
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пересобрать ленты только этих пользователей')
+
+    def handle(self, *args, **options):
+        # Ленты пересобираются целиком, раскладывать посты вышедших из
+        # множества авторов отдельно незачем.
+        exempt_authors, _ = timelines.refresh_fanout_exempt_authors(
+            backfill=False)
+        users = User.objects.filter(follower__isnull=False).distinct()
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        rebuilt = 0
+        for user_id in users.values_list('id', flat=True).iterator():
+            timelines.rebuild(user_id, exempt_authors)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Лент пересобрано: {rebuilt}, '
+            f'авторов без раскладки: {len(exempt_authors)}'))
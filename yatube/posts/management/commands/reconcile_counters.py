@@ -0,0 +1,87 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from posts.models import Comment, Follow, Post, UserCounter
+
+User = get_user_model()
+
+
+def count_by(queryset, field, ids):
+    return dict(
+        queryset.filter(**{f'{field}__in': ids}).order_by().values(field)
+        .annotate(total=Count('pk')).values_list(field, 'total'))
+
+
+class Command(BaseCommand):
+    help = ('Сверяет счётчики постов, комментариев и подписок с данными '
+            'и исправляет расхождения небольшими порциями')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Пауза между порциями в секундах, чтобы не мешать записи')
+
+    def chunks(self, queryset, chunk_size):
+        """Порции id по возрастанию, без OFFSET и без долгих транзакций."""
+        last_id = 0
+        while True:
+            ids = list(queryset.filter(pk__gt=last_id).order_by('pk')
+                       .values_list('pk', flat=True)[:chunk_size])
+            if not ids:
+                return
+            yield ids
+            last_id = ids[-1]
+
+    def reconcile_users(self, ids):
+        fixed = 0
+        with transaction.atomic():
+            posts = count_by(Post.objects, 'author', ids)
+            followers = count_by(Follow.objects, 'author', ids)
+            following = count_by(Follow.objects, 'user', ids)
+            stored = UserCounter.objects.in_bulk(ids)
+            for user_id in ids:
+                actual = {
+                    'posts_count': posts.get(user_id, 0),
+                    'followers_count': followers.get(user_id, 0),
+                    'following_count': following.get(user_id, 0),
+                }
+                counter = stored.get(user_id)
+                if counter and all(getattr(counter, field) == value
+                                   for field, value in actual.items()):
+                    continue
+                UserCounter.objects.update_or_create(
+                    user_id=user_id, defaults=actual)
+                fixed += 1
+        return fixed
+
+    def reconcile_posts(self, ids):
+        fixed = 0
+        with transaction.atomic():
+            comments = count_by(Comment.objects, 'post', ids)
+            stored = Post.objects.filter(pk__in=ids).values_list(
+                'pk', 'comments_count')
+            for post_id, comments_count in stored:
+                actual = comments.get(post_id, 0)
+                if comments_count != actual:
+                    Post.objects.filter(pk=post_id).update(
+                        comments_count=actual)
+                    fixed += 1
+        return fixed
+
+    def handle(self, *args, **options):
+        for title, queryset, reconcile in (
+                ('пользователей', User.objects, self.reconcile_users),
+                ('постов', Post.objects, self.reconcile_posts)):
+            checked = fixed = 0
+            for ids in self.chunks(queryset, options['chunk_size']):
+                fixed += reconcile(ids)
+                checked += len(ids)
+                if options['pause']:
+                    time.sleep(options['pause'])
+            self.stdout.write(
+                f'Проверено {title}: {checked}, исправлено: {fixed}')
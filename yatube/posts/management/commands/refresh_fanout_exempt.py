@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import timelines
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает авторов, посты которых не раскладываются по '
+            'лентам подписчиков, и раскладывает посты вышедших из этого '
+            'множества. Запускается по расписанию, например раз в '
+            'несколько минут')
+
+    def handle(self, *args, **options):
+        authors, released = timelines.refresh_fanout_exempt_authors()
+        self.stdout.write(self.style.SUCCESS(
+            f'Авторов без раскладки: {len(authors)}, '
+            f'вернулись к раскладке: {len(released)}'))
@@ -0,0 +1,214 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.text import capfirst
+from faker import Faker
+from mixer.backend.django import mixer
+
+from core import cache_versions
+from core.middleware import bump_response_generation
+from core.models import bulk_insert
+from core.paginators import invalidate_counts
+from posts import caching
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Доли строк каждой таблицы в общем объёме.
+SHARES = {'users': 0.05, 'posts': 0.3, 'comments': 0.45, 'follows': 0.2}
+ROWS_PER_GROUP = 5000
+TEXT_POOL_SIZE = 1000
+# Перемешивает номера постов, чтобы популярные не были самыми старыми.
+SCATTER_PRIME = 2_147_483_647
+SUFFIXES = {'k': 1_000, 'm': 1_000_000}
+
+
+def parse_rows(value):
+    """``10000``, ``10k`` или ``10m``."""
+    multiplier = SUFFIXES.get(value[-1:].lower(), 1)
+    number = value[:-1] if multiplier > 1 else value
+    try:
+        return int(float(number) * multiplier)
+    except ValueError:
+        raise CommandError(f'Неверное число строк: {value}')
+
+
+def zipf_index(count, alpha, rnd):
+    """Номер от 0 до count - 1 с вероятностью ~ 1 / (номер + 1) ** alpha:
+    несколько первых номеров получают большую часть выборок."""
+    u = rnd.random()
+    if alpha == 1:
+        rank = (count + 1) ** u
+    else:
+        exponent = 1 - alpha
+        rank = (1 + u * ((count + 1) ** exponent - 1)) ** (1 / exponent)
+    return min(int(rank) - 1, count - 1)
+
+
+def scatter(index, count):
+    return index * SCATTER_PRIME % count
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, группами, '
+            'постами, комментариями и подписками со степенным '
+            'распределением активности (от 10k до 10m строк)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=parse_rows, default=parse_rows('10k'),
+            help='Всего строк: 10k, 100k, 1m, 10m или число')
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Показатель степенного распределения активности')
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней распределить посты')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--password', default='seed',
+            help='Пароль всех созданных пользователей')
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Строк в одном INSERT; по умолчанию — сколько допускает '
+                 'база')
+        parser.add_argument(
+            '--chunk-size', type=int, default=20000,
+            help='Строк в одной транзакции')
+        parser.add_argument(
+            '--skip-derived', action='store_true',
+            help='Не пересчитывать счётчики и ленты')
+
+    def insert(self, model, objects):
+        """Сохраняет объекты порциями и печатает скорость."""
+        started = time.monotonic()
+        created = 0
+        chunk = []
+        for obj in objects:
+            chunk.append(obj)
+            if len(chunk) >= self.chunk_size:
+                created += self.save_chunk(model, chunk)
+                chunk = []
+        if chunk:
+            created += self.save_chunk(model, chunk)
+        elapsed = time.monotonic() - started
+        title = capfirst(model._meta.verbose_name_plural)
+        self.stdout.write(
+            f'{title}: {created} за {elapsed:.1f} с '
+            f'({created / (elapsed or 1):.0f} строк/с)')
+        return created
+
+    def save_chunk(self, model, chunk):
+        with transaction.atomic():
+            return bulk_insert(model, chunk, batch_size=self.batch_size,
+                               ignore_conflicts=True)
+
+    def next_id(self, model):
+        return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+    def create_groups(self, count):
+        first = self.next_id(Group)
+        groups = mixer.cycle(count).blend(
+            Group, slug=mixer.sequence(lambda index: f'seed-{first + index}'))
+        return [group.pk for group in groups]
+
+    def users(self, first, count, password):
+        for user_id in range(first, first + count):
+            yield User(
+                id=user_id,
+                username=f'{self.fake.user_name()}_{user_id}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=password)
+
+    def posts(self, first, count, user_ids, group_ids):
+        for index in range(count):
+            group = (None if self.rnd.random() < 0.3 else group_ids[
+                zipf_index(len(group_ids), self.alpha, self.rnd)])
+            yield Post(
+                id=first + index,
+                author_id=user_ids[
+                    zipf_index(len(user_ids), self.alpha, self.rnd)],
+                group_id=group,
+                text=self.rnd.choice(self.texts),
+                pub_date=self.post_date(index, count))
+
+    def post_date(self, index, count):
+        # Посты идут по времени в порядке id, как и при обычной работе.
+        return self.start + self.span * (index / count)
+
+    def comments(self, count, first_post, post_count, user_ids):
+        for _ in range(count):
+            index = scatter(
+                zipf_index(post_count, self.alpha, self.rnd), post_count)
+            posted = self.post_date(index, post_count)
+            # Большая часть комментариев приходит вскоре после поста.
+            delay = (self.now - posted) * self.rnd.random() ** 4
+            yield Comment(
+                post_id=first_post + index,
+                author_id=self.rnd.choice(user_ids),
+                text=self.rnd.choice(self.sentences),
+                created=posted + delay)
+
+    def follows(self, count, user_ids):
+        for _ in range(count):
+            user_id = self.rnd.choice(user_ids)
+            author_id = user_ids[
+                zipf_index(len(user_ids), self.alpha, self.rnd)]
+            if user_id != author_id:
+                yield Follow(user_id=user_id, author_id=author_id)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        if rows < 100:
+            raise CommandError('Нужно хотя бы 100 строк')
+        self.rnd = random.Random(options['seed'])
+        Faker.seed(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.alpha = options['alpha']
+        self.batch_size = options['batch_size']
+        self.chunk_size = options['chunk_size']
+        self.now = timezone.now()
+        self.span = timedelta(days=options['days'])
+        self.start = self.now - self.span
+        # Faker медленный: тексты берутся из заранее созданного набора.
+        self.texts = [self.fake.paragraph(nb_sentences=self.rnd.randint(
+            1, 8)) for _ in range(TEXT_POOL_SIZE)]
+        self.sentences = [self.fake.sentence()
+                          for _ in range(TEXT_POOL_SIZE)]
+        counts = {name: max(int(rows * share), 2)
+                  for name, share in SHARES.items()}
+
+        group_ids = self.create_groups(max(rows // ROWS_PER_GROUP, 3))
+        first_user = self.next_id(User)
+        # Один хеш на всех: PBKDF2 на каждого занял бы часы.
+        self.insert(User, self.users(
+            first_user, counts['users'], make_password(options['password'])))
+        user_ids = list(range(first_user, first_user + counts['users']))
+        first_post = self.next_id(Post)
+        self.insert(Post, self.posts(
+            first_post, counts['posts'], user_ids, group_ids))
+        self.insert(Comment, self.comments(
+            counts['comments'], first_post, counts['posts'], user_ids))
+        self.insert(Follow, self.follows(counts['follows'], user_ids))
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                    no_style(), [User, Post]):
+                cursor.execute(sql)
+
+        invalidate_counts(Post)
+        invalidate_counts(Comment)
+        cache_versions.bump(caching.GLOBAL_SCOPE)
+        bump_response_generation()
+        if not options['skip_derived']:
+            call_command('reconcile_counters', stdout=self.stdout)
+            call_command('rebuild_timelines', stdout=self.stdout)
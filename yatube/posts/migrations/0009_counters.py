@@ -0,0 +1,56 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:01
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post = apps.get_model('posts', 'Post')
+    UserCounter = apps.get_model('posts', 'UserCounter')
+    users = User.objects.annotate(
+        posts_total=models.Count('posts', distinct=True),
+        followers_total=models.Count('following', distinct=True),
+        following_total=models.Count('follower', distinct=True))
+    UserCounter.objects.bulk_create(
+        (UserCounter(user_id=user.id,
+                     posts_count=user.posts_total,
+                     followers_count=user.followers_total,
+                     following_count=user.following_total)
+         for user in users.iterator()),
+        batch_size=500)
+    Post.objects.update(comments_count=models.Subquery(
+        Post.objects.filter(pk=models.OuterRef('pk')).order_by()
+        .annotate(total=models.Count('comments'))
+        .values('total')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0008_view_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+            ],
+            options={
+                'verbose_name': 'Счётчики пользователя',
+                'verbose_name_plural': 'Счётчики пользователей',
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
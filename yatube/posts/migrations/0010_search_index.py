@@ -0,0 +1,61 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:08
+
+from django.db import migrations
+
+# Индекс хранит текст с «ё», заменённой на «е»: так «елка» находит «Ёлку».
+# Регистр свёртывает сам токенизатор unicode61.
+FOLD = "replace(replace({}, 'ё', 'е'), 'Ё', 'Е')"
+
+CREATE_SQL = [
+    "CREATE VIRTUAL TABLE posts_post_fts USING fts5("
+    "body, tokenize = 'unicode61 remove_diacritics 2')",
+    "CREATE VIRTUAL TABLE posts_comment_fts USING fts5("
+    "body, post_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2')",
+
+    "CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts (rowid, body) "
+    f"VALUES (new.id, {FOLD.format('new.text')}); END",
+    "CREATE TRIGGER posts_post_fts_update AFTER UPDATE OF text "
+    "ON posts_post BEGIN "
+    f"UPDATE posts_post_fts SET body = {FOLD.format('new.text')} "
+    "WHERE rowid = old.id; END",
+    "CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post BEGIN "
+    "DELETE FROM posts_post_fts WHERE rowid = old.id; END",
+
+    "CREATE TRIGGER posts_comment_fts_insert AFTER INSERT ON posts_comment "
+    "BEGIN INSERT INTO posts_comment_fts (rowid, body, post_id) "
+    f"VALUES (new.id, {FOLD.format('new.text')}, new.post_id); END",
+    "CREATE TRIGGER posts_comment_fts_update AFTER UPDATE OF text, post_id "
+    "ON posts_comment BEGIN "
+    f"UPDATE posts_comment_fts SET body = {FOLD.format('new.text')}, "
+    "post_id = new.post_id WHERE rowid = old.id; END",
+    "CREATE TRIGGER posts_comment_fts_delete AFTER DELETE ON posts_comment "
+    "BEGIN DELETE FROM posts_comment_fts WHERE rowid = old.id; END",
+
+    "INSERT INTO posts_post_fts (rowid, body) "
+    f"SELECT id, {FOLD.format('text')} FROM posts_post",
+    "INSERT INTO posts_comment_fts (rowid, body, post_id) "
+    f"SELECT id, {FOLD.format('text')}, post_id FROM posts_comment",
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS posts_post_fts_insert',
+    'DROP TRIGGER IF EXISTS posts_post_fts_update',
+    'DROP TRIGGER IF EXISTS posts_post_fts_delete',
+    'DROP TRIGGER IF EXISTS posts_comment_fts_insert',
+    'DROP TRIGGER IF EXISTS posts_comment_fts_update',
+    'DROP TRIGGER IF EXISTS posts_comment_fts_delete',
+    'DROP TABLE IF EXISTS posts_post_fts',
+    'DROP TABLE IF EXISTS posts_comment_fts',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_counters'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SQL, reverse_sql=DROP_SQL),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0010_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FanoutExemptAuthor',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fanout_exemption', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+            ],
+            options={
+                'verbose_name': 'Автор без раскладки',
+                'verbose_name_plural': 'Авторы без раскладки',
+            },
+        ),
+    ]
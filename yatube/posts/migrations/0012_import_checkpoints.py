@@ -0,0 +1,24 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_fanout_exempt_authors'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('source', models.CharField(help_text='Вид данных и путь к файлу', max_length=1024, primary_key=True, serialize=False, verbose_name='Источник')),
+                ('done', models.PositiveIntegerField(default=0, verbose_name='Строк обработано')),
+            ],
+            options={
+                'verbose_name': 'Контрольная точка загрузки',
+                'verbose_name_plural': 'Контрольные точки загрузки',
+            },
+        ),
+    ]
@@ -44,9 +44,20 @@ class Post(models.Model):
         upload_to='posts/',
         verbose_name='Картинка',
         blank=True)
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Комментариев')
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(fields=('pub_date',), name='post_date_idx'),
+            models.Index(fields=('author', 'pub_date'),
+                         name='post_author_date_idx'),
+            models.Index(fields=('group', 'pub_date'),
+                         name='post_group_date_idx'),
+        )
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -75,6 +86,10 @@ class Comment(CreatedModel):
 
     class Meta:
         ordering = ['-created']
+        indexes = (
+            models.Index(fields=('post', 'created'),
+                         name='comment_post_created_idx'),
+        )
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -103,8 +118,110 @@ class Follow(models.Model):
             constraints.UniqueConstraint(
                 fields=('user', 'author'), name='follow_unique'),
         )
+        indexes = (
+            models.Index(fields=('author', 'user'),
+                         name='follow_author_user_idx'),
+        )
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
 
     def __str__(self):
         return self.user.username, self.author.username
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        constraints = (
+            constraints.UniqueConstraint(
+                fields=('user', 'post'), name='timeline_unique'),
+        )
+        indexes = (
+            models.Index(fields=('user', '-pub_date', '-post'),
+                         name='timeline_user_date_idx'),
+        )
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
+
+
+class FanoutExemptAuthor(models.Model):
+    """Автор, посты которого не раскладываются по лентам подписчиков.
+
+    Множество пересчитывает команда ``refresh_fanout_exempt``; прежнее
+    множество хранится здесь, чтобы знать, кто из него вышел.
+    """
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='fanout_exemption',
+        verbose_name='Автор'
+    )
+
+    class Meta:
+        verbose_name = 'Автор без раскладки'
+        verbose_name_plural = 'Авторы без раскладки'
+
+    def __str__(self):
+        return str(self.author_id)
+
+
+class ImportCheckpoint(models.Model):
+    """Сколько строк файла уже загрузила команда ``import_content``.
+
+    Пишется в одной транзакции с порцией строк: после сбоя порция либо
+    загружена и учтена, либо нет ни того ни другого.
+    """
+    source = models.CharField(
+        'Источник',
+        max_length=1024,
+        primary_key=True,
+        help_text='Вид данных и путь к файлу'
+    )
+    done = models.PositiveIntegerField('Строк обработано', default=0)
+
+    class Meta:
+        verbose_name = 'Контрольная точка загрузки'
+        verbose_name_plural = 'Контрольные точки загрузки'
+
+    def __str__(self):
+        return f'{self.source}: {self.done}'
+
+
+class UserCounter(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0, verbose_name='Постов')
+    followers_count = models.PositiveIntegerField(
+        default=0, verbose_name='Подписчиков')
+    following_count = models.PositiveIntegerField(
+        default=0, verbose_name='Подписок')
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return str(self.user_id)
@@ -0,0 +1,192 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+Индекс — таблицы FTS5 ``posts_post_fts`` и ``posts_comment_fts``
+(миграция 0010), их синхронизируют триггеры, поэтому массовые операции
+ORM индекс не ломают. Запрос разбивается на слова, «ё» заменяется на
+«е», каждое слово ищется по префиксу: «котик» найдёт «котиками».
+Результаты упорядочены по bm25, совпадение в комментарии весит меньше,
+чем в самом посте.
+"""
+import json
+import re
+
+from django.core.paginator import Page, Paginator
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .models import Post
+
+COMMENT_WEIGHT = 0.5
+MAX_TERMS = 8
+
+# Кандидаты: ключ и LIMIT стоят в запросах к самим индексам FTS, так что
+# страница не группирует и не сортирует все совпадения. Комментарии
+# одного поста могут встретиться несколько раз. Для кандидатов тем же
+# запросом считается точный ранг — лучшее совпадение в посте и его
+# комментариях.
+CANDIDATES_SQL = """
+    WITH candidates (source, post_id, score) AS (
+        SELECT * FROM (
+            SELECT 'post', rowid, bm25(posts_post_fts) AS score
+            FROM posts_post_fts WHERE posts_post_fts MATCH %s
+            AND (bm25(posts_post_fts) {operator} %s
+                 OR (bm25(posts_post_fts) = %s AND rowid {operator} %s))
+            ORDER BY score {direction}, rowid {direction} LIMIT %s)
+        UNION ALL
+        SELECT * FROM (
+            SELECT 'comment', post_id, bm25(posts_comment_fts) * %s AS score
+            FROM posts_comment_fts WHERE posts_comment_fts MATCH %s
+            AND (bm25(posts_comment_fts) * %s {operator} %s
+                 OR (bm25(posts_comment_fts) * %s = %s
+                     AND post_id {operator} %s))
+            ORDER BY score {direction}, post_id {direction} LIMIT %s)
+    ), ranks AS (
+        SELECT post_id, MIN(rank) AS rank FROM (
+            SELECT rowid AS post_id, bm25(posts_post_fts) AS rank
+            FROM posts_post_fts WHERE posts_post_fts MATCH %s
+            AND rowid IN (SELECT post_id FROM candidates)
+            UNION ALL
+            SELECT post_id, bm25(posts_comment_fts) * %s
+            FROM posts_comment_fts WHERE posts_comment_fts MATCH %s
+            AND post_id IN (SELECT post_id FROM candidates)
+        ) GROUP BY post_id
+    )
+    SELECT source, post_id, score, rank
+    FROM candidates JOIN ranks USING (post_id)
+"""
+
+# Ключ до начала выдачи в прямом и обратном порядке.
+FIRST_KEY = (float('-inf'), 0)
+LAST_KEY = (float('inf'), 0)
+
+
+def fold(text):
+    return text.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def build_match(query):
+    """Выражение MATCH или пустая строка, если искать нечего.
+
+    Слова берутся в кавычки, поэтому операторы FTS5 во вводе
+    пользователя не работают и не приводят к синтаксической ошибке.
+    """
+    terms = re.findall(r'\w+', fold(query))[:MAX_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def matching_ids_sql(table, match):
+    """Подзапрос id совпавших строк для ``filter(pk__in=...)``."""
+    return RawSQL(
+        f'SELECT rowid FROM {table} WHERE {table} MATCH %s', (match,))
+
+
+class SearchPaginator(Paginator):
+    """Постраничный вывод результатов поиска по ключу (ранг, id поста).
+
+    Интерфейс тот же, что у ``CursorPaginator``: ``cursor_page`` и
+    ``next_cursor``/``previous_cursor`` у страницы, так что подходит
+    общий шаблон пагинатора.
+    """
+    is_cursor = True
+
+    def __init__(self, query, per_page):
+        super().__init__([], per_page)
+        self.match = build_match(query)
+
+    def encode_cursor(self, post):
+        values = [post.search_rank, post.id]
+        return urlsafe_base64_encode(json.dumps(values).encode())
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            rank, post_id = json.loads(urlsafe_base64_decode(cursor).decode())
+            return float(rank), int(post_id)
+        except (ValueError, TypeError, UnicodeDecodeError):
+            return None
+
+    @staticmethod
+    def follows(hit, key, backwards):
+        """Идёт ли ``hit`` после ключа в порядке выдачи."""
+        return hit < key if backwards else hit > key
+
+    def candidates(self, size, key, backwards):
+        """Первые ``size`` совпадений после ключа в индексе постов и в
+        индексе комментариев — списки пар (ранг совпадения, id поста) —
+        и точные ранги найденных постов: {id поста: ранг}."""
+        operator, direction = ('<', 'DESC') if backwards else ('>', 'ASC')
+        rank, post_id = key
+        sql = CANDIDATES_SQL.format(operator=operator, direction=direction)
+        params = [self.match, rank, rank, post_id, size,
+                  COMMENT_WEIGHT, self.match, COMMENT_WEIGHT, rank,
+                  COMMENT_WEIGHT, rank, post_id, size,
+                  self.match, COMMENT_WEIGHT, self.match]
+        hits = {'post': [], 'comment': []}
+        ranks = {}
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            for source, post_id, score, rank in cursor.fetchall():
+                hits[source].append((score, post_id))
+                ranks[post_id] = rank
+        # Порядок строк после JOIN не задан.
+        for source_hits in hits.values():
+            source_hits.sort(reverse=backwards)
+        return hits.values(), ranks
+
+    def fetch(self, limit, after=None, before=None):
+        """Пары (id поста, ранг) после ключа ``after`` или перед ``before``.
+
+        Ранг поста — лучший из рангов самого поста и его комментариев.
+        Кандидат, у которого есть совпадение раньше ключа, уже показан на
+        прошлых страницах; если такие вытеснили нужные посты, окно
+        кандидатов расширяется.
+        """
+        backwards = before is not None
+        key = before or after or (LAST_KEY if backwards else FIRST_KEY)
+        size = limit
+        while True:
+            sources, ranks = self.candidates(size, key, backwards)
+            hits = sorted(
+                ((rank, post_id) for post_id, rank in ranks.items()
+                 if self.follows((rank, post_id), key, backwards)),
+                reverse=backwards)
+            # Посты, которых нет среди кандидатов, идут после последнего
+            # совпадения каждого полного списка.
+            ends = [found[-1] for found in sources if len(found) == size]
+            if ends:
+                end = max(ends) if backwards else min(ends)
+                hits = [hit for hit in hits
+                        if not self.follows(hit, end, backwards)]
+            if len(hits) >= limit or not ends:
+                return [(post_id, rank) for rank, post_id in hits[:limit]]
+            size *= 2
+
+    def cursor_page(self, after=None, before=None):
+        after_key = self.decode_cursor(after)
+        before_key = None if after_key else self.decode_cursor(before)
+        hits = []
+        if self.match:
+            hits = self.fetch(self.per_page + 1, after_key, before_key)
+        has_more = len(hits) > self.per_page
+        hits = hits[:self.per_page]
+        if before_key:
+            hits.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, after_key is not None
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [post_id for post_id, _ in hits])
+        items = []
+        for post_id, rank in hits:
+            post = posts.get(post_id)
+            if post is not None:
+                post.search_rank = rank
+                items.append(post)
+        page = Page(items, 1, self)
+        page.next_cursor = (
+            self.encode_cursor(items[-1]) if has_next and items else None)
+        page.previous_cursor = (
+            self.encode_cursor(items[0]) if has_previous and items else None)
+        return page
@@ -0,0 +1,116 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from core.middleware import bump_response_generation
+from core.paginators import invalidate_counts
+from . import caching, counters, thumbnails, timelines
+from .models import Comment, Follow, Group, Post
+
+
+def release_image(storage, name):
+    # Общие файлы хранилища с подсчётом ссылок; прочие хранилища
+    # картинки постов не удаляют.
+    release = getattr(storage, 'release', None)
+    if release:
+        release(name)
+
+
+def after_commit(func, *args):
+    """Вызывает ``func(*args)`` после коммита текущей транзакции, вне
+    транзакции — сразу. Версии кэша увеличиваются только тогда, когда
+    новые строки уже видны читателям: иначе параллельный запрос успел бы
+    сохранить старые данные под новой версией."""
+    transaction.on_commit(lambda: func(*args))
+
+
+def invalidate_post(post, *old_group_ids):
+    invalidate_counts(Post)
+    caching.bump_post_scopes(post, *old_group_ids)
+    bump_response_generation()
+
+
+def invalidate_comments(post):
+    invalidate_counts(Comment)
+    if post:
+        caching.bump_post_scopes(post)
+    bump_response_generation()
+
+
+def invalidate_reader(user_id):
+    caching.bump_reader_scope(user_id)
+    bump_response_generation()
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    instance._loaded_group_id = instance.__dict__.get('group_id')
+    image = instance.__dict__.get('image')
+    instance._loaded_image = getattr(image, 'name', image)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    after_commit(invalidate_post, instance, instance._loaded_group_id)
+    instance._loaded_group_id = instance.group_id
+    if kwargs.get('raw'):
+        return
+    if created:
+        counters.increment_user(instance.author_id, 'posts_count')
+        # Раскладка по лентам держала бы блокировку записи SQLite на
+        # время вставки в ленты всех подписчиков.
+        after_commit(timelines.fan_out, instance)
+    if instance.image.name != instance._loaded_image:
+        if instance._loaded_image and not created:
+            release_image(instance.image.storage, instance._loaded_image)
+        if instance.image:
+            thumbnails.schedule(instance)
+    instance._loaded_image = instance.image.name
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    after_commit(invalidate_post, instance, instance._loaded_group_id)
+    counters.decrement_user(instance.author_id, 'posts_count')
+    if instance.image:
+        release_image(instance.image.storage, instance.image.name)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    after_commit(invalidate_comments, instance.post)
+    if created and not kwargs.get('raw'):
+        counters.increment_comments(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    post = Post.objects.filter(pk=instance.post_id).only(
+        'author_id', 'group_id').first()
+    after_commit(invalidate_comments, post)
+    counters.decrement_comments(instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created and not kwargs.get('raw'):
+        counters.increment_user(instance.user_id, 'following_count')
+        counters.increment_user(instance.author_id, 'followers_count')
+        after_commit(invalidate_reader, instance.user_id)
+        after_commit(
+            timelines.backfill, instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.decrement_user(instance.user_id, 'following_count')
+    counters.decrement_user(instance.author_id, 'followers_count')
+    after_commit(invalidate_reader, instance.user_id)
+    timelines.remove_author(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    after_commit(caching.bump_group_scope, instance.id)
+    after_commit(bump_response_generation)
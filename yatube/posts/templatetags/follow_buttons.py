@@ -0,0 +1,22 @@
+from django import template
+
+from .. import follows
+
+register = template.Library()
+
+
+@register.inclusion_tag('posts/includes/follow_button.html',
+                        takes_context=True)
+def follow_button(context, author, size=''):
+    """Кнопка подписки на автора или отписки от него.
+
+    Состояние берётся из множества подписок читателя (``posts.follows``),
+    так что кнопки у всех авторов страницы стоят одного обращения к кэшу.
+    """
+    user = context['user']
+    return {
+        'author': author,
+        'size': size,
+        'own': user.pk == author.pk,
+        'following': follows.is_following(user, author.pk),
+    }
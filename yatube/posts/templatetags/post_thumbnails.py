@@ -0,0 +1,15 @@
+from django import template
+
+from ..thumbnails import get_picture
+
+register = template.Library()
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(image, size):
+    """Разметка ``<picture>`` с готовыми вариантами картинки.
+
+    В отличие от ``{% thumbnail %}`` никогда не создаёт миниатюры во
+    время отрисовки страницы: пока их нет, выводится заглушка.
+    """
+    return {'picture': get_picture(image, size) if image else None}
@@ -0,0 +1,93 @@
+import time
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils.http import http_date
+
+from core.testing import capture_on_commit_callbacks
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.urls = {
+            'post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.id}),
+            'group_list': reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': self.author.username}),
+        }
+
+    def revalidate(self, url, response):
+        return self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_not_modified_before_main_queries(self):
+        for name, url in self.urls.items():
+            with self.subTest(name=name):
+                response = self.client.get(url)
+                self.assertFalse(response.has_header('Last-Modified'))
+                # Валидаторы, сессия и пользователь — и ничего больше.
+                with self.assertNumQueries(3):
+                    response = self.revalidate(url, response)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_if_modified_since_alone_is_not_trusted(self):
+        # Правка не меняет дату последнего поста, поэтому одного
+        # If-Modified-Since для ответа 304 недостаточно.
+        url = self.urls['post_detail']
+        since = http_date(time.time() + 60)
+        self.client.get(url)
+        Post.objects.filter(pk=self.post.pk).first().save()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        response = Client().get(url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_changes_invalidate_etag(self):
+        changes = {
+            'post_detail': lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'),
+            'group_list': lambda: Group.objects.filter(
+                pk=self.group.pk).first().save(),
+            'profile': lambda: Follow.objects.create(
+                user=self.reader, author=self.author),
+        }
+        for name, change in changes.items():
+            with self.subTest(name=name):
+                url = self.urls[name]
+                response = self.client.get(url)
+                with capture_on_commit_callbacks(execute=True):
+                    change()
+                response = self.revalidate(url, response)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_etag_depends_on_reader_and_page(self):
+        url = self.urls['profile']
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(Client().get(url)['ETag'], etag)
+        self.assertNotEqual(self.client.get(url + '?page=2')['ETag'], etag)
+
+    def test_missing_object_is_not_found(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
@@ -0,0 +1,70 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, UserCounter
+
+User = get_user_model()
+
+
+class CounterTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def counters(self, user):
+        return UserCounter.objects.get(user=user)
+
+    def test_post_and_comment_counters(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        post.refresh_from_db()
+        self.assertEqual(self.counters(self.author).posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        post.comments.all().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        post.delete()
+        self.assertEqual(self.counters(self.author).posts_count, 0)
+
+    def test_follow_counters(self):
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}))
+        self.assertEqual(self.counters(self.author).followers_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}))
+        self.assertEqual(self.counters(self.author).followers_count, 0)
+        self.assertEqual(self.counters(self.reader).following_count, 0)
+
+    def test_profile_uses_counter(self):
+        Post.objects.create(author=self.author, text='Пост')
+        response = self.reader_client.get(
+            reverse('posts:profile', kwargs={'username': self.author}))
+        self.assertEqual(response.context['number_posts'], 1)
+
+    def test_reconcile_counters_fixes_drift(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Comment.objects.bulk_create(
+            Comment(post=post, author=self.reader, text='Текст')
+            for _ in range(3))
+        UserCounter.objects.filter(user=self.author).update(
+            posts_count=5, followers_count=0)
+        UserCounter.objects.filter(user=self.reader).delete()
+        call_command('reconcile_counters', chunk_size=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 3)
+        author_counters = self.counters(self.author)
+        self.assertEqual(author_counters.posts_count, 1)
+        self.assertEqual(author_counters.followers_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
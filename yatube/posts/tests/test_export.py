@@ -0,0 +1,75 @@
+import csv
+import json
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from .. import export
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост, "с" кавычками')
+        Post.objects.create(author=cls.reader, text='Чужой пост')
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def run_export(self, *args, **options):
+        output = StringIO()
+        call_command('export_content', *args, stdout=output, **options)
+        return output.getvalue()
+
+    def test_ndjson_matches_import_format(self):
+        rows = [json.loads(line) for line in self.run_export(
+            'posts', user='author').splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['id'], self.post.id)
+        self.assertEqual(rows[0]['author'], 'author')
+        self.assertEqual(rows[0]['group'], 'group')
+        self.assertEqual(rows[0]['text'], self.post.text)
+
+    def test_csv(self):
+        rows = list(csv.DictReader(StringIO(
+            self.run_export('comments', format='csv'))))
+        self.assertEqual(
+            [(row['post'], row['author']) for row in rows],
+            [(str(self.post.id), 'reader')])
+        follows = self.run_export('follows', format='csv')
+        self.assertEqual(
+            follows.splitlines(), ['user,author', 'reader,author'])
+
+    def test_export_is_lazy(self):
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {number}')
+            for number in range(5))
+        read = []
+        get_rows = export.get_rows
+
+        def tracked_rows(*args, **kwargs):
+            for row in get_rows(*args, **kwargs):
+                read.append(row)
+                yield row
+
+        with mock.patch.object(export, 'get_rows', tracked_rows):
+            parts = export.export('posts', 'ndjson', chunk_size=2)
+            # Выборка начинается только при чтении первой части, а первая
+            # строка уходит до того, как прочитаны остальные.
+            with self.assertNumQueries(1):
+                first = next(parts)
+            self.assertEqual(json.loads(first)['id'], self.post.id)
+            self.assertEqual(len(read), 1)
+            self.assertEqual(''.join(parts).count('\n'), 6)
+        self.assertEqual(len(read), 7)
@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.testing import capture_on_commit_callbacks
+from ..models import Follow, Post
+from .. import follows
+
+User = get_user_model()
+
+
+class FollowCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)]
+        for author in cls.authors:
+            Post.objects.create(author=author, text=f'Пост {author}')
+        Follow.objects.create(user=cls.reader, author=cls.authors[0])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def fresh_reader(self):
+        # Новый объект: множество, запомненное на прежнем, не мешает.
+        return User.objects.get(pk=self.reader.pk)
+
+    def test_follow_states_in_one_query_then_cached(self):
+        author_ids = [author.id for author in self.authors]
+        reader = self.fresh_reader()
+        with self.assertNumQueries(1):
+            states = follows.follow_states(reader, author_ids)
+        self.assertEqual(states, {
+            self.authors[0].id: True,
+            self.authors[1].id: False,
+            self.authors[2].id: False})
+        reader = self.fresh_reader()
+        with self.assertNumQueries(0):
+            follows.follow_states(reader, author_ids)
+            self.assertTrue(follows.is_following(reader, author_ids[0]))
+
+    def test_follow_and_unfollow_invalidate(self):
+        author = self.authors[1]
+        self.assertFalse(follows.is_following(self.fresh_reader(), author.id))
+        with capture_on_commit_callbacks(execute=True):
+            self.client.get(reverse(
+                'posts:profile_follow', kwargs={'username': author}))
+        self.assertTrue(follows.is_following(self.fresh_reader(), author.id))
+        with capture_on_commit_callbacks(execute=True):
+            self.client.get(reverse(
+                'posts:profile_unfollow', kwargs={'username': author}))
+        self.assertFalse(follows.is_following(self.fresh_reader(), author.id))
+
+    def test_anonymous_follows_nobody(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                follows.follow_states(AnonymousUser(), [self.authors[0].id]),
+                {self.authors[0].id: False})
+
+    def test_buttons_show_follow_state(self):
+        response = self.client.get(reverse(
+            'posts:profile', kwargs={'username': self.authors[0]}))
+        self.assertContains(response, 'Отписаться')
+        response = self.client.get(reverse('posts:search'), {'q': 'Пост'})
+        self.assertContains(response, 'Отписаться', count=1)
+        self.assertContains(response, 'Подписаться', count=2)
+        response = self.client.get(reverse(
+            'posts:profile', kwargs={'username': self.reader}))
+        self.assertNotContains(response, 'Подписаться')
@@ -197,8 +197,5 @@ class PostFormImageTests(TestCase):
         self.assertRedirects(response, reverse(
             'posts:profile', kwargs={'username': self.authorized_username}))
         self.assertEqual(Post.objects.count(), post_count + 1)
-        self.assertTrue(
-            Post.objects.filter(
-                group__slug=self.slug,
-                text=post_text,
-                image='posts/small.gif').exists())
+        post = Post.objects.get(group__slug=self.slug, text=post_text)
+        self.assertRegex(post.image.name, r'^posts/(\w\w/){2}\w{64}\.jpg$')
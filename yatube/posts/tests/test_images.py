@@ -0,0 +1,57 @@
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from ..forms import PostForm
+from ..images import normalize
+
+ORIENTATION = 0x0112
+
+
+def make_upload(name='photo.jpg', size=(300, 100), image_format='JPEG',
+                orientation=None):
+    image = Image.new('RGB', size, 'red')
+    options = {}
+    if orientation:
+        exif = Image.Exif()
+        exif[ORIENTATION] = orientation
+        options['exif'] = exif.tobytes()
+    data = BytesIO()
+    image.save(data, image_format, **options)
+    return SimpleUploadedFile(name, data.getvalue(), 'image/jpeg')
+
+
+@override_settings(POST_IMAGE_MAX_SIZE=120)
+class ImageNormalizationTests(TestCase):
+    def test_downscaled_rotated_and_stripped(self):
+        result = normalize(make_upload(orientation=6))
+        image = Image.open(result)
+        self.assertEqual(result.name, 'photo.jpg')
+        self.assertEqual(image.size, (40, 120))
+        self.assertNotIn('exif', image.info)
+        self.assertTrue(image.info.get('progressive'))
+
+    def test_png_with_alpha_becomes_jpeg(self):
+        data = BytesIO()
+        Image.new('RGBA', (10, 10), (0, 0, 0, 0)).save(data, 'PNG')
+        result = normalize(SimpleUploadedFile('logo.png', data.getvalue()))
+        self.assertEqual(result.name, 'logo.jpg')
+        self.assertEqual(Image.open(result).getpixel((5, 5)),
+                         (255, 255, 255))
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1000)
+    def test_form_rejects_decompression_bomb(self):
+        form = PostForm(data={'text': 'Текст'},
+                        files={'image': make_upload()})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'too_many_pixels')
+
+    def test_form_rejects_unsupported_format(self):
+        form = PostForm(data={'text': 'Текст'}, files={
+            'image': make_upload('image.bmp', image_format='BMP')})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'unsupported_format')
@@ -0,0 +1,130 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase
+
+from ..models import (
+    Comment, Follow, Group, ImportCheckpoint, Post, TimelineEntry)
+
+User = get_user_model()
+
+
+class ImportContentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def write_jsonl(self, name, records):
+        return self.write(name, ''.join(
+            json.dumps(record, ensure_ascii=False) + '\n'
+            for record in records))
+
+    def run_import(self, kind, path, **options):
+        output = StringIO()
+        call_command('import_content', kind, path, stdout=output,
+                     stderr=StringIO(), **options)
+        return output.getvalue()
+
+    def test_posts_keep_timestamps_and_map_lookups(self):
+        path = self.write_jsonl('posts.jsonl', [
+            {'id': 100, 'author': 'author', 'group': 'group',
+             'text': 'Старый пост', 'pub_date': '2015-03-01T10:00:00Z'},
+            {'id': 101, 'author': 'newcomer', 'text': 'Без группы',
+             'pub_date': '2016-01-01T00:00:00'},
+            {'id': 102, 'author': 'author', 'group': 'missing',
+             'text': 'Неизвестная группа'},
+        ])
+        output = self.run_import('posts', path, chunk_size=2)
+        self.assertIn('строк/с', output)
+        post = Post.objects.get(pk=100)
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(
+            post.pub_date, datetime(2015, 3, 1, 10, tzinfo=timezone.utc))
+        newcomer = Post.objects.get(pk=101).author
+        self.assertEqual(newcomer.username, 'newcomer')
+        self.assertFalse(newcomer.has_usable_password())
+        self.assertFalse(Post.objects.filter(pk=102).exists())
+        self.assertEqual(self.author.counters.posts_count, 1)
+
+    def test_csv_comments_and_follows(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        comments = self.write(
+            'comments.csv',
+            'post,author,text,created\n'
+            f'{post.pk},reader,Первый,2019-05-05T12:00:00Z\n'
+            '999,reader,К несуществующему посту,\n')
+        self.run_import('comments', comments)
+        comment = Comment.objects.get()
+        self.assertEqual(comment.created.year, 2019)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        follows = self.write(
+            'follows.csv', 'user,author\nreader,author\nreader,author\n')
+        self.run_import('follows', follows)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user__username='reader', post=post).exists())
+
+    def test_resumes_from_checkpoint(self):
+        records = [{'author': 'author', 'text': f'Пост {number}'}
+                   for number in range(4)]
+        path = self.write_jsonl('posts.jsonl', records)
+        self.run_import('posts', path, chunk_size=3, skip_derived=True)
+        self.assertEqual(Post.objects.count(), 4)
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps({'author': 'author', 'text': 'Ещё'}) + '\n')
+        self.run_import('posts', path, skip_derived=True)
+        self.assertEqual(Post.objects.count(), 5)
+        self.run_import('posts', path, restart=True, skip_derived=True)
+        self.assertEqual(Post.objects.count(), 10)
+
+    def test_checkpoint_commits_with_chunk(self):
+        path = self.write_jsonl('posts.jsonl', [
+            {'author': 'author', 'text': f'Пост {number}'}
+            for number in range(4)])
+        with mock.patch.object(
+                ImportCheckpoint.objects, 'update_or_create',
+                side_effect=DatabaseError('Сбой')), \
+                self.assertRaises(DatabaseError):
+            self.run_import('posts', path, skip_derived=True)
+        # Порция откатилась вместе с контрольной точкой.
+        self.assertFalse(Post.objects.exists())
+        self.run_import('posts', path, chunk_size=3, skip_derived=True)
+        self.assertEqual(Post.objects.count(), 4)
+        self.assertEqual(ImportCheckpoint.objects.get().done, 4)
+
+    def test_reports_inserted_rows(self):
+        path = self.write_jsonl('posts.jsonl', [
+            {'id': 200, 'author': 'author', 'text': 'Новый пост',
+             'pub_date': '2015-03-01T10:00:00Z'},
+            {'id': 200, 'author': 'author', 'text': 'Тот же id'},
+        ])
+        output = self.run_import('posts', path, skip_derived=True)
+        self.assertIn('Загружено: 1, пропущено: 0, уже были в базе: 1',
+                      output)
+        self.assertEqual(Post.objects.get(pk=200).pub_date.year, 2015)
+        # Поля модели не меняются: обычные посты получают текущую дату.
+        self.assertTrue(Post._meta.get_field('pub_date').auto_now_add)
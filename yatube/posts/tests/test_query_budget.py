@@ -0,0 +1,117 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import timelines
+from ..models import Comment, Follow, Group, Post
+from ..urls import app_name, urlpatterns
+
+User = get_user_model()
+
+# Сколько SQL-запросов может выполнить каждая страница приложения posts
+# для авторизованного пользователя; от числа постов бюджет не зависит.
+QUERY_BUDGETS = {
+    'index': 3,
+    'group_list': 5,
+    'profile': 6,
+    'post_detail': 5,
+    'post_create': 3,
+    'post_edit': 4,
+    'add_comment': 3,
+    'follow_index': 5,
+    'search': 5,
+    'profile_follow': 15,
+    'profile_unfollow': 8,
+}
+# Страницы, которые выводят картинки постов.
+PICTURE_PAGES = ('index', 'group_list', 'post_detail', 'follow_index')
+
+
+class QueryBudgetMixin:
+    """Проверяет, что страницы укладываются в объявленный бюджет
+    запросов. Наследник задаёт ``posts_count`` и объявляет бюджет
+    для каждого имени URL приложения."""
+    posts_count = 10
+    with_images = False
+    query_budgets = QUERY_BUDGETS
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug',
+            description='Тестовое описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Post.objects.bulk_create(
+            Post(author=cls.author, group=cls.group,
+                 text=f'Тестовый пост {i}',
+                 image=f'posts/{i}.jpg' if cls.with_images else '')
+            for i in range(cls.posts_count))
+        cls.post = Post.objects.latest('pub_date', 'id')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=user, text='Комментарий')
+            for user in (cls.reader, cls.other) * 10)
+        timelines.rebuild(cls.reader.id)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def get_url_kwargs(self):
+        return {
+            'group_list': {'slug': self.group.slug},
+            'profile': {'username': self.author.username},
+            'post_detail': {'post_id': self.post.id},
+            'post_edit': {'post_id': self.post.id},
+            'add_comment': {'post_id': self.post.id},
+            'profile_follow': {'username': self.other.username},
+            'profile_unfollow': {'username': self.other.username},
+        }
+
+    def get_url_query(self):
+        return {'search': '?q=тестовый'}
+
+    def test_every_url_has_budget(self):
+        names = {pattern.name for pattern in urlpatterns}
+        self.assertEqual(names, set(self.query_budgets))
+
+    def test_views_fit_query_budget(self):
+        url_kwargs = self.get_url_kwargs()
+        url_query = self.get_url_query()
+        for name, budget in self.query_budgets.items():
+            url = reverse(f'{app_name}:{name}', kwargs=url_kwargs.get(name))
+            url += url_query.get(name, '')
+            with self.subTest(url_name=name, posts=self.posts_count):
+                cache.clear()
+                with CaptureQueriesContext(connection) as context:
+                    self.client.get(url)
+                queries = '\n'.join(
+                    query['sql'] for query in context.captured_queries)
+                self.assertLessEqual(
+                    len(context), budget,
+                    f'{name}: {len(context)} запросов\n{queries}')
+
+
+class SmallDatasetQueryBudgetTests(QueryBudgetMixin, TestCase):
+    posts_count = 10
+
+
+class LargeDatasetQueryBudgetTests(QueryBudgetMixin, TestCase):
+    posts_count = 1000
+
+
+class ImageDatasetQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Манифесты миниатюр всех картинок страницы читаются одним
+    запросом."""
+    posts_count = 10
+    with_images = True
+    query_budgets = {
+        name: budget + (name in PICTURE_PAGES)
+        for name, budget in QUERY_BUDGETS.items()}
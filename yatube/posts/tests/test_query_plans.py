@@ -0,0 +1,77 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\w+( AS \w+)?$')
+TEMP_SORT = 'USE TEMP B-TREE'
+# Небольшие таблицы, которые читаются целиком и кэшируются.
+WHOLE_TABLES = ('posts_fanoutexemptauthor',)
+
+
+class QueryPlanTests(TestCase):
+    """Каждый запрос страниц должен идти по индексу, без полного
+    просмотра таблицы и без сортировки во временном B-дереве."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug',
+            description='Тестовое описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.posts = [
+            Post.objects.create(author=cls.author, group=cls.group,
+                                text=f'Тестовый пост {i}')
+            for i in range(15)]
+        cls.post = cls.posts[-1]
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def get_plan_problems(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            details = [row[-1] for row in cursor.fetchall()]
+        return [detail for detail in details
+                if (FULL_SCAN.match(detail)
+                    and not detail.endswith(WHOLE_TABLES))
+                or TEMP_SORT in detail]
+
+    def assert_queries_use_indexes(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        for query in context.captured_queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            with self.subTest(url=url, sql=query['sql']):
+                self.assertEqual(self.get_plan_problems(query['sql']), [])
+
+    def test_view_queries_use_indexes(self):
+        first_page = self.client.get(reverse('posts:index')).context[
+            'page_obj']
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:index') + f'?after={first_page.next_cursor}',
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            self.assert_queries_use_indexes(url)
@@ -0,0 +1,101 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Post
+from ..search import SearchPaginator, build_match
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.tree = Post.objects.create(
+            author=cls.author, text='Наряжаем Ёлку всей семьёй')
+        cls.cats = Post.objects.create(
+            author=cls.author, text='Котики котики котики')
+        cls.dogs = Post.objects.create(
+            author=cls.author, text='Про собак')
+        Comment.objects.create(
+            post=cls.dogs, author=cls.author, text='А где котики?')
+
+    def setUp(self):
+        self.client = Client()
+
+    def search(self, query, **cursor):
+        return list(SearchPaginator(query, 10).cursor_page(**cursor))
+
+    def test_build_match_quotes_terms(self):
+        self.assertEqual(build_match('Ёж AND "кот"'), '"Еж"* "AND"* "кот"*')
+        self.assertEqual(build_match('  !!  '), '')
+
+    def test_yo_folding_and_prefix(self):
+        self.assertEqual(self.search('елк'), [self.tree])
+        self.assertEqual(self.search('СЕМЬЕЙ'), [self.tree])
+
+    def test_comments_rank_below_posts(self):
+        self.assertEqual(self.search('котик'), [self.cats, self.dogs])
+
+    def test_index_follows_edits_and_deletes(self):
+        self.cats.text = 'Попугаи'
+        self.cats.save()
+        self.assertEqual(self.search('котик'), [self.dogs])
+        self.assertEqual(self.search('попуга'), [self.cats])
+        self.dogs.comments.all().delete()
+        self.assertEqual(self.search('котик'), [])
+
+    def test_keyset_pages(self):
+        Post.objects.bulk_create(
+            Post(author=self.author, text='Поиск по страницам')
+            for _ in range(5))
+        posts = Post.objects.filter(text='Поиск по страницам')
+        paginator = SearchPaginator('страниц', 2)
+        first = paginator.cursor_page()
+        second = paginator.cursor_page(after=first.next_cursor)
+        third = paginator.cursor_page(after=second.next_cursor)
+        found = [*first, *second, *third]
+        self.assertCountEqual(
+            [post.id for post in found], [post.id for post in posts])
+        self.assertIsNone(third.next_cursor)
+        back = paginator.cursor_page(before=third.previous_cursor)
+        self.assertEqual(list(back), list(second))
+
+    def test_pages_match_full_ranking(self):
+        # У постов есть совпадения и в тексте, и в комментариях, поэтому
+        # лучшие и худшие совпадения поста попадают на разные страницы.
+        for number in range(6):
+            post = Post.objects.create(
+                author=self.author, text='Котики ' * (number % 3 + 1))
+            Comment.objects.bulk_create(
+                Comment(post=post, author=self.author,
+                        text='котики ' * count + 'и другое ' * number)
+                for count in range(1, 4))
+        ranking = [post.id for post in
+                   SearchPaginator('котик', 100).cursor_page()]
+        paginator = SearchPaginator('котик', 2)
+        pages = [paginator.cursor_page()]
+        while pages[-1].next_cursor:
+            pages.append(paginator.cursor_page(after=pages[-1].next_cursor))
+        self.assertEqual(
+            [post.id for page in pages for post in page], ranking)
+        for page, previous in zip(pages[1:], pages):
+            self.assertEqual(
+                list(paginator.cursor_page(before=page.previous_cursor)),
+                list(previous))
+
+    def test_search_view(self):
+        response = self.client.get(reverse('posts:search'), {'q': 'ёлк'})
+        self.assertEqual(list(response.context['page_obj']), [self.tree])
+        response = self.client.get(reverse('posts:search'))
+        self.assertEqual(list(response.context['page_obj']), [])
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'елк'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.tree])
@@ -0,0 +1,51 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+
+from ..models import Comment, Follow, Post, UserCounter
+from ..urls import urlpatterns
+
+
+class SeedDatasetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command('seed_dataset', '--rows', '2k', stdout=StringIO())
+
+    def test_rows_follow_shares(self):
+        self.assertEqual(Post.objects.count(), 600)
+        self.assertEqual(Comment.objects.count(), 900)
+        self.assertLessEqual(Follow.objects.count(), 400)
+
+    def test_activity_is_skewed(self):
+        posts = list(UserCounter.objects.order_by(
+            '-posts_count').values_list('posts_count', flat=True))
+        # Самый активный автор пишет больше, чем половина всех авторов.
+        self.assertGreater(posts[0], sum(posts[len(posts) // 2:]))
+
+    def test_comments_are_after_posts(self):
+        self.assertFalse(Comment.objects.filter(
+            created__lt=F('post__pub_date')).exists())
+
+    def test_benchmark_covers_every_url(self):
+        output = StringIO()
+        descriptor, path = tempfile.mkstemp(
+            suffix='.json', dir=settings.BASE_DIR)
+        os.close(descriptor)
+        self.addCleanup(os.remove, path)
+        call_command('benchmark_views', repeat=2, warmup=0, json_path=path,
+                     stdout=output)
+        with open(path) as results:
+            results = json.load(results)
+        self.assertEqual(
+            set(results), {pattern.name for pattern in urlpatterns})
+        for name, result in results.items():
+            with self.subTest(name=name):
+                self.assertIn(name, output.getvalue())
+                self.assertLess(result['status'], 400)
+                self.assertGreater(result['queries'], 0)
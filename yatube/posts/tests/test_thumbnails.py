@@ -0,0 +1,169 @@
+import itertools
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from .. import thumbnails
+from ..models import Post
+from ..thumbnails import (
+    Placeholder, get_picture, get_ready_thumbnail, get_variants)
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+# Одинаковые картинки хранятся одним файлом с общими миниатюрами,
+# поэтому каждому посту нужна своя.
+SIZES = itertools.count()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create_post(self, name='small.png'):
+        data = BytesIO()
+        Image.new('RGB', (2 + next(SIZES), 1)).save(data, 'PNG')
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(name, data.getvalue(), 'image/png')})
+        return Post.objects.latest('pk')
+
+    @override_settings(THUMBNAIL_WORKERS=2)
+    def test_placeholder_until_worker_finishes(self):
+        # В TestCase коллбэки on_commit не вызываются: задача в очереди.
+        post = self.create_post()
+        self.assertIsInstance(
+            get_ready_thumbnail(post.image, 'card'), Placeholder)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'aspect-ratio: 960 / 339')
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_thumbnail_ready_after_save(self):
+        post = self.create_post()
+        thumbnail = get_ready_thumbnail(post.image, 'card')
+        self.assertEqual((thumbnail.width, thumbnail.height), (960, 339))
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id}))
+        self.assertContains(response, f'src="{thumbnail.url}"')
+
+    @override_settings(THUMBNAIL_WORKERS=2)
+    def test_rebuild_resumes_from_checkpoint(self):
+        first = self.create_post('first.png')
+        second = self.create_post('second.png')
+        checkpoint = os.path.join(TEMP_MEDIA_ROOT, 'checkpoint')
+        with open(checkpoint, 'w') as file:
+            file.write(str(first.id))
+        out = StringIO()
+        call_command('rebuild_thumbnails', workers=0,
+                     checkpoint=checkpoint, stdout=out)
+        self.assertIn('Картинок обработано: 1', out.getvalue())
+        self.assertIsInstance(
+            get_ready_thumbnail(first.image, 'card'), Placeholder)
+        self.assertNotIsInstance(
+            get_ready_thumbnail(second.image, 'card'), Placeholder)
+        self.assertFalse(os.path.exists(checkpoint))
+
+    def test_rebuild_retries_failed_posts(self):
+        first = self.create_post('first.png')
+        second = self.create_post('second.png')
+        checkpoint = os.path.join(TEMP_MEDIA_ROOT, 'failures')
+        generate = thumbnails.generate
+
+        def fail_first(image_name):
+            if image_name == first.image.name:
+                raise OSError('Диск недоступен')
+            generate(image_name)
+
+        with mock.patch.object(thumbnails, 'generate', fail_first), \
+                mock.patch.object(thumbnails.logger, 'exception'):
+            call_command('rebuild_thumbnails', workers=0, chunk_size=1,
+                         checkpoint=checkpoint, stdout=StringIO())
+        with open(f'{checkpoint}.failed') as failed:
+            self.assertEqual(failed.read(), f'{first.id}\n')
+        with open(checkpoint) as last_id:
+            self.assertEqual(last_id.read(), str(second.id))
+        out = StringIO()
+        call_command('rebuild_thumbnails', workers=0,
+                     checkpoint=checkpoint, stdout=out)
+        self.assertIn('Картинок обработано: 1, с ошибками: 0',
+                      out.getvalue())
+        self.assertNotIsInstance(
+            get_ready_thumbnail(first.image, 'card'), Placeholder)
+        self.assertFalse(os.path.exists(checkpoint))
+        self.assertFalse(os.path.exists(f'{checkpoint}.failed'))
+
+    def test_rebuild_in_worker_processes(self):
+        # Процессы пишут в свою копию тестовой базы в памяти, поэтому
+        # проверяем отчёт команды и файл контрольной точки.
+        for number in range(3):
+            self.create_post(f'{number}.png')
+        checkpoint = os.path.join(TEMP_MEDIA_ROOT, 'workers')
+        out = StringIO()
+        call_command('rebuild_thumbnails', workers=1, chunk_size=1,
+                     checkpoint=checkpoint, stdout=out)
+        self.assertIn('Картинок обработано: 3, с ошибками: 0',
+                      out.getvalue())
+        self.assertFalse(os.path.exists(checkpoint))
+
+    @override_settings(THUMBNAIL_WORKERS=0, POST_IMAGE_FORMATS=(
+        'NOPE', 'JPEG'), POST_IMAGE_WIDTHS=(320, 640, 2000))
+    def test_picture_variants(self):
+        self.assertEqual(
+            [variant[:3] for variant in get_variants('card')],
+            [('JPEG', 320, '320x113'), ('JPEG', 640, '640x226'),
+             ('JPEG', 960, '960x339')])
+        post = self.create_post()
+        picture = get_picture(post.image, 'card')
+        self.assertEqual(
+            [variant.width for variant in picture.fallback_variants],
+            [320, 640, 960])
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '<picture>')
+        smallest = picture.fallback_variants[0]
+        self.assertContains(response, f'{smallest.url} 320w')
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_page_reads_manifests_at_once(self):
+        for _ in range(3):
+            self.create_post()
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.content.count(b'<picture>'), 3)
+        self.assertEqual(len([
+            query for query in context.captured_queries
+            if 'thumbnail_kvstore' in query['sql']]), 1)
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_savings_report(self):
+        self.create_post()
+        out = StringIO()
+        call_command('image_savings_report', viewport_width=320, dpr=1,
+                     stdout=out)
+        self.assertIn('index: картинок 1', out.getvalue())
+        self.assertIn('Всего сэкономлено', out.getvalue())
@@ -0,0 +1,139 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.testing import capture_on_commit_callbacks
+from ..models import FanoutExemptAuthor, Follow, Post, TimelineEntry
+from .. import timelines
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='Старый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def feed(self):
+        return list(self.reader_client.get(
+            reverse('posts:follow_index')).context['page_obj'])
+
+    def test_follow_backfills_and_unfollow_trims_timeline(self):
+        with capture_on_commit_callbacks(execute=True):
+            self.reader_client.get(reverse(
+                'posts:profile_follow', kwargs={'username': self.author}))
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=self.old_post).exists())
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed(), [])
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        with capture_on_commit_callbacks(execute=True):
+            Follow.objects.create(user=self.reader, author=self.author)
+            post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    def refresh_exempt(self):
+        call_command('refresh_fanout_exempt', stdout=StringIO())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_high_fanout_author_is_merged_at_read_time(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.refresh_exempt()
+        with capture_on_commit_callbacks(execute=True):
+            post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    @override_settings(TIMELINE_LENGTH=2)
+    def test_rebuild_command_keeps_latest_posts(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [Post.objects.create(author=self.author, text=str(i))
+                 for i in range(3)]
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(
+            set(TimelineEntry.objects.values_list('post_id', flat=True)),
+            {posts[1].id, posts[2].id})
+
+    def test_trim_keeps_timeline_length(self):
+        with capture_on_commit_callbacks(execute=True):
+            Follow.objects.create(user=self.reader, author=self.author)
+            for i in range(3):
+                Post.objects.create(author=self.author, text=str(i))
+        with self.settings(TIMELINE_LENGTH=2):
+            timelines.trim(self.reader.id)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2)
+
+    @override_settings(TIMELINE_LENGTH=2)
+    def test_fan_out_trims_follower_timelines(self):
+        with capture_on_commit_callbacks(execute=True):
+            Follow.objects.create(user=self.reader, author=self.author)
+            posts = [Post.objects.create(author=self.author, text=str(i))
+                     for i in range(3)]
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(
+                user=self.reader).values_list('post_id', flat=True)),
+            {posts[1].id, posts[2].id})
+
+    def test_author_leaving_exempt_set_is_backfilled(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        with override_settings(TIMELINE_FANOUT_LIMIT=1):
+            self.refresh_exempt()
+            with capture_on_commit_callbacks(execute=True):
+                post = Post.objects.create(
+                    author=self.author, text='Новый пост')
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        # Прежнее множество берётся из базы, а не из кэша.
+        cache.clear()
+        self.refresh_exempt()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_exempt_set_is_not_computed_in_requests(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.feed(), [])
+        self.assertFalse(FanoutExemptAuthor.objects.exists())
+
+    @override_settings(TIMELINE_LENGTH=2)
+    def test_feed_continues_past_trimmed_timeline(self):
+        with capture_on_commit_callbacks(execute=True):
+            Follow.objects.create(user=self.reader, author=self.author)
+            posts = [Post.objects.create(author=self.author, text=str(i))
+                     for i in range(3)]
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2)
+        expected = [*reversed(posts), self.old_post]
+        self.assertEqual(self.feed(), expected)
+        paginator = timelines.get_feed_paginator(self.reader, 1)
+        page = paginator.cursor_page()
+        seen = list(page)
+        while page.next_cursor:
+            page = paginator.cursor_page(after=page.next_cursor)
+            seen.extend(page)
+        self.assertEqual(seen, expected)
+        while page.previous_cursor:
+            page = paginator.cursor_page(before=page.previous_cursor)
+            seen.extend(page)
+        self.assertEqual(seen[len(expected):], expected[-2::-1])
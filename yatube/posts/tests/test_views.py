@@ -2,9 +2,15 @@ from http import HTTPStatus
 
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
+
+from core import cache_versions
+from core.testing import capture_on_commit_callbacks
+from .. import caching
 from ..models import Group, Post, Follow
 
 User = get_user_model()
@@ -131,8 +137,43 @@ class PaginatorViewsTest(TestCase):
         self.assertEqual(len(response.context['page_obj']), 10)
 
     def test_second_page_contains_three_records(self):
+        first_page = self.client.get(reverse('posts:index')).context[
+            'page_obj']
+        response = self.client.get(
+            reverse('posts:index') + f'?after={first_page.next_cursor}')
+        self.assertEqual(len(response.context['page_obj']), 3)
+        self.assertIsNone(response.context['page_obj'].next_cursor)
+
+    def test_previous_cursor_returns_first_page(self):
+        first_page = self.client.get(reverse('posts:index')).context[
+            'page_obj']
+        second_page = self.client.get(
+            reverse('posts:index') + f'?after={first_page.next_cursor}'
+        ).context['page_obj']
+        response = self.client.get(
+            reverse('posts:index') + f'?before={second_page.previous_cursor}')
+        self.assertEqual(
+            list(response.context['page_obj']), list(first_page))
+        self.assertIsNone(response.context['page_obj'].previous_cursor)
+
+    def test_profile_pages_in_ascending_order(self):
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        first_page = self.client.get(url).context['page_obj']
+        second_page = self.client.get(
+            url + f'?after={first_page.next_cursor}').context['page_obj']
+        posts = list(first_page) + list(second_page)
+        self.assertEqual(
+            posts, list(Post.objects.filter(author=self.user).order_by(
+                'pub_date', 'id')))
+
+    def test_numbered_page_links_still_work(self):
         response = self.client.get(reverse('posts:index') + '?page=2')
         self.assertEqual(len(response.context['page_obj']), 3)
+        self.assertEqual(response.context['page_obj'].page_window, [1, 2])
+
+    def test_broken_cursor_shows_first_page(self):
+        response = self.client.get(reverse('posts:index') + '?after=broken')
+        self.assertEqual(len(response.context['page_obj']), 10)
 
 
 class FollowTests(TestCase):
@@ -183,22 +224,23 @@ class FollowTests(TestCase):
         self.assertEqual(follow_count, 0)
 
     def test_new_post_follow(self):
-        self.authorized_client.post(
-            reverse('posts:profile_follow', kwargs={
-                'username': self.username}))
-        self.authorized_client2.post(
-            reverse('posts:profile_follow', kwargs={
-                'username': self.username_one}))
-        text_old = 'Старый пост'
-        Post.objects.create(
-            author=self.user1,
-            text=text_old,
-            group=self.group)
-        text_new = 'Новый пост'
-        post_new = Post.objects.create(
-            author=self.user,
-            text=text_new,
-            group=self.group)
+        with capture_on_commit_callbacks(execute=True):
+            self.authorized_client.post(
+                reverse('posts:profile_follow', kwargs={
+                    'username': self.username}))
+            self.authorized_client2.post(
+                reverse('posts:profile_follow', kwargs={
+                    'username': self.username_one}))
+            text_old = 'Старый пост'
+            Post.objects.create(
+                author=self.user1,
+                text=text_old,
+                group=self.group)
+            text_new = 'Новый пост'
+            post_new = Post.objects.create(
+                author=self.user,
+                text=text_new,
+                group=self.group)
         post_from_context = self.authorized_client.get(
             reverse('posts:follow_index')).context['page_obj'][0]
         self.assertEqual(post_new, post_from_context)
@@ -226,7 +268,10 @@ class PageNotFound(TestCase):
 class CacheTests(TestCase):
 
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create(username='tester')
+        self.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug')
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -236,11 +281,81 @@ class CacheTests(TestCase):
             author=self.user)
         content_new = self.authorized_client.get(
             reverse('posts:index')).content
-        post.delete()
-        content_delete = self.authorized_client.get(
+        Post.objects.filter(pk=post.pk).update(text='Без сигналов')
+        content_cached = self.authorized_client.get(
             reverse('posts:index')).content
-        self.assertEqual(content_new, content_delete)
-        cache.clear()
+        self.assertEqual(content_new, content_cached)
+        with capture_on_commit_callbacks(execute=True):
+            post.delete()
         content_delete = self.authorized_client.get(
             reverse('posts:index')).content
         self.assertNotEqual(content_new, content_delete)
+
+    def test_versions_are_bumped_after_commit(self):
+        version = cache_versions.get_version_key(caching.GLOBAL_SCOPE)
+        with capture_on_commit_callbacks() as callbacks:
+            Post.objects.create(text='Тестовый пост', author=self.user)
+        # Пока транзакция не закоммичена, читатели видят старые строки.
+        self.assertEqual(
+            cache_versions.get_version_key(caching.GLOBAL_SCOPE), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(
+            cache_versions.get_version_key(caching.GLOBAL_SCOPE), version)
+
+    def test_cache_varies_on_page(self):
+        for i in range(11):
+            Post.objects.create(text=f'Тестовый пост {i}', author=self.user)
+        first_page = self.client.get(reverse('posts:index'))
+        second_page = self.client.get(
+            reverse('posts:index')
+            + f'?after={first_page.context["page_obj"].next_cursor}')
+        self.assertNotContains(second_page, 'Тестовый пост 10')
+        self.assertContains(second_page, 'Тестовый пост 0')
+
+    def test_follow_page_is_not_shared_with_index(self):
+        Post.objects.create(text='Чужой пост', author=self.user)
+        self.authorized_client.get(reverse('posts:index'))
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertNotContains(response, 'Чужой пост')
+
+    def test_group_page_changes_when_post_moves(self):
+        post = Post.objects.create(
+            text='Пост группы', author=self.user, group=self.group)
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.assertContains(self.client.get(url), 'Пост группы')
+        post.group = None
+        with capture_on_commit_callbacks(execute=True):
+            post.save()
+        self.assertNotContains(self.client.get(url), 'Пост группы')
+
+    def test_index_changes_when_group_is_renamed(self):
+        Post.objects.create(
+            text='Пост группы', author=self.user, group=self.group)
+        self.assertContains(self.client.get(reverse('posts:index')),
+                            '/group/test-slug/')
+        self.group.slug = 'new-slug'
+        with capture_on_commit_callbacks(execute=True):
+            self.group.save()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '/group/new-slug/')
+        self.assertNotContains(response, '/group/test-slug/')
+
+    def test_cached_fragment_skips_pagination(self):
+        for i in range(11):
+            Post.objects.create(text=f'Тестовый пост {i}', author=self.user)
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:follow_index'))
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.authorized_client.get(url)
+                with CaptureQueriesContext(connection) as context:
+                    second = self.authorized_client.get(url)
+                self.assertEqual(first.content, second.content)
+                self.assertFalse([
+                    query for query in context.captured_queries
+                    if 'FROM "posts_post"' in query['sql']
+                    or 'FROM "posts_timelineentry"' in query['sql']])
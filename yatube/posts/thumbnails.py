@@ -0,0 +1,272 @@
+"""Миниатюры картинок постов вне цикла отрисовки страницы.
+
+Все размеры из ``settings.POST_THUMBNAILS`` готовит пул фоновых потоков
+после сохранения картинки поста и записывает список готовых миниатюр
+(манифест) в хранилище ключей sorl-thumbnail. Шаблоны только читают
+манифест и, пока его нет, показывают заглушку; Pillow внутри запроса не
+вызывается. Манифесты всех постов страницы читаются разом
+(``prefetch_manifests``). Когда миниатюры готовы, версии кэша ленты
+увеличиваются, и страницы перестают отдавать заглушку. Картинкам,
+миниатюры которых созданы до появления манифестов, его записывает
+``rebuild_thumbnails``.
+
+Каждый размер создаётся в нескольких ширинах (``POST_IMAGE_WIDTHS``)
+и форматах (``POST_IMAGE_FORMATS``) для ``<picture>``/``srcset``.
+Форматы, которые установленный Pillow не умеет сохранять, пропускаются;
+AVIF появляется после установки пакета ``pillow-avif-plugin``.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.helpers import deserialize, serialize, tokey
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore
+
+from core.db_routers import PRIMARY
+from core.middleware import bump_response_generation
+from . import caching
+from .models import Post
+
+try:
+    import pillow_avif  # noqa: F401 (регистрирует AVIF в Pillow)
+except ImportError:
+    pillow_avif = None
+
+logger = logging.getLogger(__name__)
+
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+}
+
+MANIFEST_IDENTITY = 'manifest'
+
+_executor = None
+
+
+class Placeholder:
+    """Заглушка на месте ещё не готовой миниатюры."""
+    url = None
+
+    def __init__(self, geometry):
+        width, _, height = geometry.partition('x')
+        self.width = int(width) if width else None
+        self.height = int(height) if height else None
+
+
+class PostImageBackend(ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, который умеет AVIF."""
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        key = tokey(source.key, geometry_string, serialize(options))
+        image_format = options['format']
+        extension = EXTENSIONS.get(image_format, image_format.lower())
+        return (f'{thumbnail_settings.THUMBNAIL_PREFIX}'
+                f'{key[:2]}/{key[2:4]}/{key}.{extension}')
+
+
+backend = PostImageBackend()
+
+
+class Picture:
+    """Готовые варианты картинки для разметки ``<picture>``.
+
+    ``fallback`` — миниатюра полной ширины в последнем (самом
+    совместимом) формате или заглушка; ``sources`` — пары
+    (MIME-тип, список миниатюр по возрастанию ширины) для остальных
+    форматов.
+    """
+
+    def __init__(self, fallback, fallback_variants=(), sources=(),
+                 sizes=''):
+        self.fallback = fallback
+        self.fallback_variants = list(fallback_variants)
+        self.sources = list(sources)
+        self.sizes = sizes
+
+
+def get_formats():
+    """Форматы из POST_IMAGE_FORMATS, которые умеет сохранять Pillow."""
+    Image.init()
+    return [image_format for image_format in settings.POST_IMAGE_FORMATS
+            if image_format in Image.SAVE]
+
+
+def get_variants(size):
+    """Кортежи (формат, ширина, геометрия, параметры) вариантов размера:
+    форматы по убыванию предпочтения, ширины по возрастанию."""
+    geometry, options = settings.POST_THUMBNAILS[size]
+    width, height = (int(value) for value in geometry.split('x'))
+    widths = sorted(
+        {value for value in settings.POST_IMAGE_WIDTHS if value < width}
+        | {width})
+    for image_format in get_formats():
+        for variant_width in widths:
+            variant_height = round(height * variant_width / width)
+            yield (image_format, variant_width,
+                   f'{variant_width}x{variant_height}',
+                   {**options, 'format': image_format})
+
+
+def _manifest_key(image_name):
+    # Ключ исходника как у ``generate``: имя и хранилище картинок.
+    source = ImageFile(image_name, default_storage)
+    return add_prefix(source.key, MANIFEST_IDENTITY)
+
+
+def load_manifests(image_names):
+    """Манифесты картинок: один ``get_many`` к кэшу хранилища ключей и
+    один запрос к его таблице для промахов. Картинок без манифеста в
+    результате нет."""
+    keys = {_manifest_key(name): name for name in image_names}
+    if not keys:
+        return {}
+    kv_cache = default.kvstore.cache
+    stored = kv_cache.get_many(keys)
+    missing = [key for key in keys if key not in stored]
+    if missing:
+        found = dict(KVStore.objects.filter(
+            key__in=missing).values_list('key', 'value'))
+        # Отсутствие манифеста тоже кэшируется, как в cached_db_kvstore.
+        loaded = {key: found.get(key, EMPTY_VALUE) for key in missing}
+        kv_cache.set_many(loaded, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+        stored.update(loaded)
+    return {
+        name: deserialize(stored[key]) for key, name in keys.items()
+        if stored[key] != EMPTY_VALUE}
+
+
+def prefetch_manifests(posts):
+    """Читает манифесты картинок ``posts`` разом и запоминает их на
+    картинках: шаблоны страницы не обращаются к хранилищу ключей."""
+    images = [post.image for post in posts if post.image]
+    manifests = load_manifests({image.name for image in images})
+    for image in images:
+        image._thumbnail_manifest = manifests.get(image.name, {})
+
+
+def get_manifest(image, size):
+    manifest = getattr(image, '_thumbnail_manifest', None)
+    if manifest is None:
+        manifest = load_manifests([image.name]).get(image.name, {})
+    return manifest.get(size, {})
+
+
+def _image_file(name, width, height):
+    image_file = ImageFile(name, default.storage)
+    image_file.set_size((width, height))
+    return image_file
+
+
+def get_ready_variants(image, size):
+    """Готовые варианты: словарь формат → [(ширина, миниатюра)]."""
+    ready = {}
+    for image_format, width, *thumbnail in get_manifest(
+            image, size).get('variants', ()):
+        ready.setdefault(image_format, []).append(
+            (width, _image_file(*thumbnail)))
+    return ready
+
+
+def get_ready_thumbnail(image, size):
+    """Готовая миниатюра размера ``size`` в формате по умолчанию или
+    заглушка."""
+    thumbnail = get_manifest(image, size).get('thumbnail')
+    if thumbnail:
+        return _image_file(*thumbnail)
+    return Placeholder(settings.POST_THUMBNAILS[size][0])
+
+
+def get_picture(image, size):
+    geometry, _ = settings.POST_THUMBNAILS[size]
+    ready = get_ready_variants(image, size)
+    fallback_format = settings.POST_IMAGE_FORMATS[-1]
+    fallback_variants = ready.pop(fallback_format, [])
+    width = int(geometry.split('x')[0])
+    if not fallback_variants or fallback_variants[-1][0] != width:
+        return Picture(Placeholder(geometry))
+    sources = [
+        (MIME_TYPES.get(image_format, ''), [
+            thumbnail for _, thumbnail in variants])
+        for image_format, variants in ready.items()]
+    return Picture(
+        fallback_variants[-1][1],
+        [thumbnail for _, thumbnail in fallback_variants],
+        sources,
+        f'(max-width: {width}px) 100vw, {width}px')
+
+
+def _describe(thumbnail):
+    return [thumbnail.name, thumbnail.width, thumbnail.height]
+
+
+def generate(image_name):
+    # Без явного хранилища sorl-thumbnail открыл бы исходник через
+    # THUMBNAIL_STORAGE, и ключи миниатюр не совпали бы с прежними.
+    source = ImageFile(image_name, default_storage)
+    manifest = {}
+    for size, (geometry, options) in settings.POST_THUMBNAILS.items():
+        thumbnail = backend.get_thumbnail(source, geometry, **options)
+        variants = []
+        for image_format, width, variant_geometry, variant_options in (
+                get_variants(size)):
+            variant = backend.get_thumbnail(
+                source, variant_geometry, **variant_options)
+            variants.append([image_format, width, *_describe(variant)])
+        manifest[size] = {
+            'thumbnail': _describe(thumbnail), 'variants': variants}
+    default.kvstore._set_raw(_manifest_key(image_name), serialize(manifest))
+
+
+def generate_for_post(post_id):
+    # Реплика может ещё не знать о только что сохранённом посте.
+    post = Post.objects.using(PRIMARY).filter(pk=post_id).only(
+        'image', 'author_id', 'group_id').first()
+    if post is None or not post.image:
+        logger.info('Пост %s удалён или без картинки: миниатюры не нужны',
+                    post_id)
+        return
+    generate(post.image.name)
+    caching.bump_post_scopes(post)
+    bump_response_generation()
+
+
+def _run_in_worker(post_id):
+    try:
+        generate_for_post(post_id)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры поста %s', post_id)
+    finally:
+        close_old_connections()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails')
+    return _executor
+
+
+def schedule(post):
+    """Ставит создание миниатюр поста в очередь после коммита.
+
+    При ``THUMBNAIL_WORKERS = 0`` миниатюры создаются сразу, в текущем
+    потоке (удобно для тестов и одноразовых скриптов).
+    """
+    if not settings.THUMBNAIL_WORKERS:
+        generate_for_post(post.id)
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(_run_in_worker, post.id))
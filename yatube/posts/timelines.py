@@ -0,0 +1,254 @@
+"""Материализованные ленты подписок (fan-out-on-write).
+
+При публикации поста его id раскладывается по лентам подписчиков автора,
+поэтому ``follow_index`` читает ленту по индексу ``(user, pub_date)``
+вместо join через ``Follow``. В ленте хранятся TIMELINE_LENGTH последних
+записей; страницы старше них читаются прежним join.
+
+Посты авторов с очень большим числом подписчиков не раскладываются, а
+подмешиваются при чтении. Множество таких авторов хранится в
+``FanoutExemptAuthor`` и пересчитывается командой
+``refresh_fanout_exempt`` (по расписанию, вне запросов): авторам,
+которые вышли из множества, она раскладывает последние посты задним
+числом.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+
+from core.paginators import CursorPaginator
+from core.sqlite import retry_on_locked
+from . import follows
+from .models import FanoutExemptAuthor, Follow, Post, TimelineEntry
+
+FANOUT_EXEMPT_KEY = 'timelines:fanout-exempt'
+FANOUT_EXEMPT_TTL = 60 * 5
+BATCH_SIZE = 500
+
+
+def refresh_fanout_exempt_authors(backfill=True):
+    """Пересчитывает множество авторов без раскладки и сохраняет его.
+    Возвращает новое множество и авторов, которые из него вышли."""
+    authors = frozenset(
+        Follow.objects.values('author')
+        .annotate(followers=Count('id'))
+        .filter(followers__gte=settings.TIMELINE_FANOUT_LIMIT)
+        .values_list('author', flat=True))
+    previous = set(
+        FanoutExemptAuthor.objects.values_list('author_id', flat=True))
+    released = previous - authors
+    with transaction.atomic():
+        FanoutExemptAuthor.objects.filter(author_id__in=released).delete()
+        FanoutExemptAuthor.objects.bulk_create(
+            (FanoutExemptAuthor(author_id=author_id)
+             for author_id in authors - previous),
+            batch_size=BATCH_SIZE, ignore_conflicts=True)
+    cache.set(FANOUT_EXEMPT_KEY, authors, FANOUT_EXEMPT_TTL)
+    if backfill:
+        # Посты, опубликованные, пока автор был в множестве, не
+        # разложены: без этого они пропали бы из лент, как только их
+        # перестали подмешивать при чтении.
+        for author_id in released:
+            backfill_followers(author_id)
+    return authors, released
+
+
+def get_fanout_exempt_authors():
+    """Множество для чтения лент; в других процессах оно обновляется с
+    задержкой до FANOUT_EXEMPT_TTL."""
+    authors = cache.get(FANOUT_EXEMPT_KEY)
+    if authors is None:
+        authors = frozenset(
+            FanoutExemptAuthor.objects.values_list('author_id', flat=True))
+        cache.set(FANOUT_EXEMPT_KEY, authors, FANOUT_EXEMPT_TTL)
+    return authors
+
+
+def is_fanout_exempt(author_id):
+    # Запись читает множество из базы, а не из кэша: иначе посты автора,
+    # который только что вышел из множества, не попали бы в ленты.
+    return FanoutExemptAuthor.objects.filter(author_id=author_id).exists()
+
+
+def _create_entries(entries):
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def _trim_overflowing(followers):
+    """Обрезает ленты тех ``followers``, где записей больше
+    TIMELINE_LENGTH; считаются они одним запросом по индексу ленты."""
+    overflowing = (
+        TimelineEntry.objects.filter(user_id__in=followers)
+        .values('user_id').annotate(entries=Count('id'))
+        .filter(entries__gt=settings.TIMELINE_LENGTH)
+        .values_list('user_id', flat=True))
+    for user_id in overflowing:
+        trim(user_id)
+
+
+@retry_on_locked
+def fan_out(post):
+    if is_fanout_exempt(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    _create_entries([
+        TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers.iterator()])
+    _trim_overflowing(followers)
+
+
+def trim(user_id):
+    """Оставляет в ленте только TIMELINE_LENGTH последних записей."""
+    entries = TimelineEntry.objects.filter(user_id=user_id)
+    boundary = entries.order_by('-pub_date').values_list(
+        'pub_date', flat=True)[
+        settings.TIMELINE_LENGTH - 1:settings.TIMELINE_LENGTH]
+    if boundary:
+        entries.filter(pub_date__lt=boundary[0]).delete()
+
+
+def _latest_posts(posts):
+    return posts.order_by('-pub_date', '-id').values_list(
+        'id', 'pub_date')[:settings.TIMELINE_LENGTH]
+
+
+@retry_on_locked
+def backfill(user_id, author_id):
+    if is_fanout_exempt(author_id):
+        return
+    posts = _latest_posts(Post.objects.filter(author_id=author_id))
+    entries = [
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts]
+    if entries:
+        _create_entries(entries)
+        trim(user_id)
+
+
+def backfill_followers(author_id):
+    """Раскладывает последние посты автора по лентам всех его
+    подписчиков."""
+    posts = list(_latest_posts(Post.objects.filter(author_id=author_id)))
+    if not posts:
+        return
+    followers = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    for user_id in followers.iterator():
+        _create_entries([
+            TimelineEntry(user_id=user_id, post_id=post_id,
+                          pub_date=pub_date)
+            for post_id, pub_date in posts])
+    _trim_overflowing(followers)
+
+
+def remove_author(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+def rebuild(user_id, exempt_authors=None):
+    if exempt_authors is None:
+        exempt_authors = get_fanout_exempt_authors()
+    posts = _latest_posts(
+        Post.objects.filter(author__following__user_id=user_id)
+        .exclude(author_id__in=exempt_authors))
+    with transaction.atomic():
+        TimelineEntry.objects.filter(user_id=user_id).delete()
+        _create_entries([
+            TimelineEntry(user_id=user_id, post_id=post_id,
+                          pub_date=pub_date)
+            for post_id, pub_date in posts])
+
+
+class TimelinePaginator(CursorPaginator):
+    """Листает записи ленты по индексу ``(user, pub_date, post)`` и отдаёт
+    их посты. Курсоры совместимы с курсорами ``CursorPaginator`` по постам.
+
+    ``related`` — связи поста для ``select_related``, ``fields`` — если
+    задан, только эти поля поста попадут в запрос.
+    """
+
+    def __init__(self, entries, per_page, related=('author', 'group'),
+                 fields=None):
+        entries = entries.select_related(
+            'post', *(f'post__{name}' for name in related))
+        if fields is not None:
+            entries = entries.only(
+                'pub_date', 'post', *(f'post__{name}' for name in fields))
+        super().__init__(entries, per_page, ('-pub_date', '-post_id'))
+
+    def cursor_page(self, after=None, before=None):
+        page = super().cursor_page(after, before)
+        page.object_list = [entry.post for entry in page.object_list]
+        return page
+
+
+class FeedPaginator:
+    """Лента подписок: свежие страницы из материализованной части
+    (``recent``), страницы старше последней записи обрезанной ленты —
+    из ``full``, join через ``Follow``. Курсоры у обоих общие."""
+    is_cursor = True
+
+    def __init__(self, user_id, recent, full):
+        self.user_id = user_id
+        self.recent = recent
+        self.full = full
+
+    def boundary(self):
+        """Ключ последней записи ленты, если лента обрезана; ``None``,
+        если в ней меньше TIMELINE_LENGTH записей и она полная."""
+        boundary = TimelineEntry.objects.filter(
+            user_id=self.user_id).order_by(
+            '-pub_date', '-post_id').values_list('pub_date', 'post_id')[
+            settings.TIMELINE_LENGTH - 1:settings.TIMELINE_LENGTH]
+        return tuple(boundary[0]) if boundary else None
+
+    def cursor_page(self, after=None, before=None):
+        page = self.recent.cursor_page(after, before)
+        after_key = self.recent.decode_cursor(after)
+        before_key = None if after_key else self.recent.decode_cursor(
+            before)
+        cursor = after_key or before_key
+        if cursor is None and settings.TIMELINE_LENGTH > self.recent.per_page:
+            # Первая страница целиком лежит в материализованной части.
+            return page
+        boundary = self.boundary()
+        if boundary is None:
+            return page
+        keys = [(post.pub_date, post.pk) for post in page.object_list[-1:]]
+        if cursor:
+            keys.append(tuple(cursor))
+        if (any(key < boundary for key in keys)
+                or (before_key is None and page.next_cursor is None)):
+            return self.full.cursor_page(after, before)
+        return page
+
+
+def _merged_authors(user):
+    exempt_authors = get_fanout_exempt_authors()
+    if not exempt_authors:
+        return []
+    return sorted(follows.get_followed_ids(user) & exempt_authors)
+
+
+def get_feed_paginator(user, per_page, related=('author', 'group'),
+                       fields=None):
+    """Пагинатор ленты подписок. Если читатель подписан на авторов,
+    исключённых из раскладки, их посты подмешиваются к материализованной
+    части ленты. ``related`` и ``fields`` — как у ``TimelinePaginator``."""
+    entries = TimelineEntry.objects.filter(user=user)
+    merged = _merged_authors(user)
+    posts = Post.objects.select_related(*related)
+    if fields is not None:
+        posts = posts.only('pub_date', *fields)
+    if merged:
+        recent = CursorPaginator(posts.filter(
+            Q(id__in=entries.values('post_id'))
+            | Q(author_id__in=merged)), per_page)
+    else:
+        recent = TimelinePaginator(entries, per_page, related, fields)
+    return FeedPaginator(user.id, recent, CursorPaginator(
+        posts.filter(author__following__user_id=user.id), per_page))
@@ -1,70 +1,126 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import urlencode
+
+from . import caching, thumbnails, timelines
+from .conditional import (
+    conditional_page, group_state, post_state, profile_state)
+from .counters import get_user_counters
 from .forms import PostForm, CommentForm
 from .models import Post, Group, User, Follow
+from .search import SearchPaginator
 from django.shortcuts import render, get_object_or_404, redirect
-from django.core.paginator import Paginator
+from core.paginators import (
+    CachedCountPaginator, CursorPaginator, FEED_ORDERING)
+from core.sqlite import retry_on_locked
 
 POSTS_PER_PAGE = 10
+PROFILE_ORDERING = ('pub_date', 'id')
+
+
+def get_cursor_page(request, paginator):
+    return paginator.cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'))
+
+
+def get_page(request, posts, ordering=FEED_ORDERING, estimate=False):
+    page_number = request.GET.get('page')
+    if page_number:
+        paginator = CachedCountPaginator(
+            posts.order_by(*ordering), POSTS_PER_PAGE, estimate=estimate)
+        return paginator.get_page(page_number)
+    return get_cursor_page(
+        request, CursorPaginator(posts, POSTS_PER_PAGE, ordering))
+
+
+def with_manifests(page_obj):
+    thumbnails.prefetch_manifests(page_obj)
+    return page_obj
+
+
+def get_feed_page(get_page_obj, fragment_name, *vary_on):
+    """Страница ленты для фрагмента ``{% cache %}`` шаблона. Если фрагмент
+    уже в кэше, шаблон не читает ``page_obj``, и страница выбирается
+    только при первом обращении."""
+    # Тег ``{% cache %}`` берёт имя фрагмента вместе с кавычками.
+    key = make_template_fragment_key(f"'{fragment_name}'", vary_on)
+    if key in cache:
+        return SimpleLazyObject(get_page_obj)
+    return get_page_obj()
 
 
 def index(request):
     template = 'posts/index.html'
-    post_list = Post.objects.all().order_by('-pub_date')
-    paginator = Paginator(post_list, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.select_related('author', 'group')
+    fragment_key = caching.get_fragment_key(request, caching.GLOBAL_SCOPE)
+    page_obj = get_feed_page(lambda: with_manifests(
+        get_page(request, post_list, estimate=True)),
+        'index_page', fragment_key)
     context = {
         'posts': post_list,
         'title': 'Последние обновления на сайте',
-        'page_obj': page_obj}
+        'page_obj': page_obj,
+        'index': True,
+        'cache_ttl': settings.FEED_CACHE_TTL,
+        'fragment_key': fragment_key}
     return render(request, template, context)
 
 
+@conditional_page(group_state)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
-    group = get_object_or_404(
-        Group.objects.prefetch_related("posts"), slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    group = get_object_or_404(Group, slug=slug)
+    posts = group.posts.select_related('author')
+    fragment_key = caching.get_fragment_key(
+        request, caching.group_scope(group.id))
+    page_obj = get_feed_page(lambda: with_manifests(
+        get_page(request, posts)), 'group_page', group.id, fragment_key)
     context = {
         'group': group,
         'posts': posts,
         'title': f'Записи сообщества {str(group)}',
-        'page_obj': page_obj}
+        'page_obj': page_obj,
+        'cache_ttl': settings.FEED_CACHE_TTL,
+        'fragment_key': fragment_key}
     return render(request, template, context)
 
 
+@conditional_page(profile_state)
 def profile(request, username):
     template = 'posts/profile.html'
-    profile_obj = get_object_or_404(User, username=username)
-    number_posts = profile_obj.posts.count()
-    posts = profile_obj.posts.order_by('pub_date')
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    following = False
-    if request.user.is_authenticated:
-        follow_list = Follow.objects.filter(user=request.user,
-                                            author=profile_obj)
-        following = follow_list.exists()
+    profile_obj = get_object_or_404(
+        User.objects.select_related('counters'), username=username)
+    counters = get_user_counters(profile_obj)
+    posts = profile_obj.posts.all()
+    fragment_key = caching.get_fragment_key(
+        request, caching.author_scope(profile_obj.id))
+    page_obj = get_feed_page(
+        lambda: get_page(request, posts, PROFILE_ORDERING),
+        'profile_page', profile_obj.id, fragment_key)
     context = {
         'profile_obj': profile_obj,
-        'number_posts': number_posts,
+        'number_posts': counters.posts_count,
+        'counters': counters,
         'posts': posts,
         'page_obj': page_obj,
         'title': f'Профайл пользователя {profile_obj.username}',
-        'following': following, }
+        'cache_ttl': settings.FEED_CACHE_TTL,
+        'fragment_key': fragment_key}
     return render(request, template, context)
 
 
+@conditional_page(post_state)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, id=post_id)
-    post_count = post.author.posts.count()
-    comments = post.comments.order_by('-created')
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'),
+        id=post_id)
+    post_count = get_user_counters(post.author).posts_count
+    comments = post.comments.select_related('author').order_by('-created')
     form = CommentForm()
     context = {
         'post': post,
@@ -76,6 +132,7 @@ def post_detail(request, post_id):
 
 
 @login_required
+@retry_on_locked
 def post_create(request):
     template = 'posts/post_create.html'
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -92,6 +149,7 @@ def post_create(request):
 
 
 @login_required
+@retry_on_locked
 def post_edit(request, post_id):
     template = 'posts/post_create.html'
     is_edit = True
@@ -104,13 +162,13 @@ def post_edit(request, post_id):
         return redirect('posts:post_detail', post_id)
     if form.is_valid():
         post = form.save(commit=False)
-        post.author = request.user
-        post.save()
+        post.save(update_fields=PostForm.Meta.fields)
         return redirect('posts:post_detail', post_id)
     return render(request, template, context)
 
 
 @login_required
+@retry_on_locked
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -124,19 +182,35 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    fragment_key = caching.get_fragment_key(
+        request, caching.GLOBAL_SCOPE, caching.reader_scope(request.user.id))
+    page_obj = get_feed_page(lambda: with_manifests(get_cursor_page(
+        request, timelines.get_feed_paginator(request.user, POSTS_PER_PAGE))),
+        'follow_page', request.user.id, fragment_key)
     context = {
         'page_obj': page_obj,
         'index': False,
         'follow': True,
+        'cache_ttl': settings.FEED_CACHE_TTL,
+        'fragment_key': fragment_key,
     }
     return render(request, 'posts/follow.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = get_cursor_page(
+        request, SearchPaginator(query, POSTS_PER_PAGE))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}),
+        'title': f'Поиск: {query}' if query else 'Поиск'}
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
+@retry_on_locked
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user.id != author.id:
@@ -147,6 +221,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@retry_on_locked
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(user=request.user,
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import sys
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -24,6 +25,10 @@ SECRET_KEY = '-syun6z#)i_359kvohpxv7(7c36$5=m*e_@ag%*0z@*1d8-7u@'
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
+# Боевой профиль — модуль yatube.settings_production. С PRODUCTION = True
+# процессы не запускаются с отладочными настройками (см. core.checks).
+PRODUCTION = False
+
 ALLOWED_HOSTS = ['*']
 
 # Application definition
@@ -39,12 +44,18 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.slow_queries.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.staticfiles.PrecompressedStaticMiddleware',
+    'core.middleware.AnonymousResponseCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.db_routers.ReplicaStickinessMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -58,7 +69,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.metrics.TimedDjangoTemplates',
         # Добавлено: Искать шаблоны на уровне проекта
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
@@ -86,6 +97,37 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения: файлы через запятую в DATABASE_REPLICA_FILES
+# (локально их создаёт команда copy_replicas). После записи пользователь
+# REPLICA_STICKY_SECONDS секунд читает из основной базы.
+DATABASE_REPLICAS = []
+for number, name in enumerate(filter(None, os.environ.get(
+        'DATABASE_REPLICA_FILES', '').split(',')), start=1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['core.db_routers.ReplicaRouter']
+PRIMARY_ONLY_APPS = ('sessions', 'thumbnail')
+REPLICA_STICKY_SECONDS = 10
+
+# PRAGMA для каждого нового соединения с SQLite (см. core.sqlite):
+# busy_timeout в мс, mmap_size в байтах, отрицательный cache_size — в КиБ.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+}
+# Повтор пишущих представлений при «database is locked»: число попыток
+# и пауза в секундах, удваивается до SQLITE_RETRY_MAX_DELAY.
+SQLITE_WRITE_ATTEMPTS = 5
+SQLITE_RETRY_DELAY = 0.05
+SQLITE_RETRY_MAX_DELAY = 1
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -123,6 +165,18 @@ USE_TZ = True
 STATIC_URL = '/static/'
 
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
+
+# collectstatic с core.staticfiles.CompressedManifestStaticFilesStorage
+# (боевой профиль) чистит CSS из STATIC_PURGE_CSS от классов, которых нет
+# в шаблонах (классы, добавляемые не шаблонами, — в STATIC_PURGE_SAFELIST),
+# и сжимает файлы с расширениями из STATIC_COMPRESS_EXTENSIONS.
+# При STATIC_SERVE_ENABLED статику из STATIC_ROOT отдаёт middleware;
+# при отладке её отдаёт runserver.
+STATIC_PURGE_CSS = ('css/bootstrap.min.css',)
+STATIC_PURGE_SAFELIST = ()
+STATIC_COMPRESS_EXTENSIONS = (
+    '.css', '.js', '.map', '.svg', '.ico', '.txt', '.json')
+STATIC_SERVE_ENABLED = False
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
@@ -131,3 +185,89 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Загруженные файлы называются хэшем содержимого и раскладываются по
+# подкаталогам (core.storage): URL неизменяемы, дубликаты не хранятся.
+# Миниатюры sorl-thumbnail уже названы по ключу и лежат отдельно.
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+THUMBNAIL_STORAGE = 'django.core.files.storage.FileSystemStorage'
+
+# Загрузки пишутся на диск частями, а не собираются в памяти.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Картинки постов при загрузке поворачиваются по EXIF, очищаются от
+# метаданных и уменьшаются до POST_IMAGE_MAX_SIZE по большей стороне.
+# Картинки больше POST_IMAGE_MAX_PIXELS отклоняются без декодирования.
+POST_IMAGE_UPLOAD_FORMATS = ('JPEG', 'MPO', 'PNG', 'GIF', 'WEBP')
+POST_IMAGE_MAX_PIXELS = 50_000_000
+POST_IMAGE_MAX_SIZE = 2048
+POST_IMAGE_MASTER_FORMAT = 'JPEG'
+POST_IMAGE_QUALITY = 85
+
+# Лента подписок: сколько последних постов хранится у каждого читателя
+# (страницы старше читаются join через Follow) и с какого числа
+# подписчиков посты автора не раскладываются по лентам, а подмешиваются
+# при чтении. Множество таких авторов пересчитывает команда
+# refresh_fanout_exempt, её нужно запускать по расписанию.
+TIMELINE_LENGTH = 500
+TIMELINE_FANOUT_LIMIT = 1000
+
+# Время жизни фрагментов лент в кэше. Фрагменты сбрасываются версиями
+# областей при изменении постов, поэтому срок может быть долгим.
+FEED_CACHE_TTL = 60 * 60
+
+# Время жизни множества подписок читателя в кэше (posts.follows); оно
+# тоже сбрасывается версией области читателя.
+FOLLOW_CACHE_TTL = 60 * 60
+
+# Миниатюры картинок постов: имя размера → (геометрия, параметры
+# sorl-thumbnail). Их создаёт пул из THUMBNAIL_WORKERS фоновых потоков;
+# при 0 миниатюры создаются сразу при сохранении поста. Так и под
+# тестами (manage.py test, pytest): фоновые потоки писали бы во временный
+# MEDIA_ROOT уже после того, как тест его удалил.
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+THUMBNAIL_WORKERS = 0 if TESTING else 2
+
+# Варианты миниатюр для srcset: ширины (не больше ширины размера) и
+# форматы по убыванию предпочтения; последний формат — запасной для
+# <img>. Недоступные в Pillow форматы пропускаются, для AVIF нужен
+# пакет pillow-avif-plugin.
+POST_IMAGE_WIDTHS = (320, 640, 960)
+POST_IMAGE_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+
+# Кэш целых страниц для анонимных посетителей. При отладке выключен,
+# чтобы правки шаблонов были видны сразу.
+RESPONSE_CACHE_ENABLED = not DEBUG
+RESPONSE_CACHE_TTL = 60 * 10
+RESPONSE_CACHE_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+)
+
+# Метрики запросов для Prometheus на /metrics (персоналу или по токену).
+# Процессы складывают свои счётчики в METRICS_DIR раз в
+# METRICS_FLUSH_INTERVAL секунд; без папки видны метрики одного процесса.
+METRICS_ENABLED = True
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_FLUSH_INTERVAL = 5
+
+# Журнал медленных SQL-запросов (команда slow_queries печатает сводку).
+SLOW_QUERY_LOG_ENABLED = os.environ.get('SLOW_QUERY_LOG') == '1'
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_LOG_FILE = os.path.join(BASE_DIR, 'logs', 'slow_queries.log')
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5
+
+CACHES = {
+    'default': {
+        'BACKEND': 'core.metrics.MeteredLocMemCache',
+    },
+}
@@ -0,0 +1,75 @@
+"""Настройки для боевых процессов.
+
+Включаются переменной DJANGO_SETTINGS_MODULE=yatube.settings_production.
+Всё, что зависит от окружения, берётся из переменных окружения; без
+DJANGO_SECRET_KEY и DJANGO_ALLOWED_HOSTS процессы не запустятся (см.
+core.checks).
+"""
+import copy
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, TEMPLATES
+
+PRODUCTION = True
+DEBUG = False
+
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', '')
+ALLOWED_HOSTS = [
+    host.strip() for host in os.environ.get(
+        'DJANGO_ALLOWED_HOSTS', '').split(',') if host.strip()]
+
+# Шаблоны читаются и разбираются один раз на процесс. Отладочная
+# информация шаблонов не собирается.
+TEMPLATES = copy.deepcopy(TEMPLATES)
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['debug'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+# Соединения с базой живут CONN_MAX_AGE секунд, а не один запрос: PRAGMA
+# из SQLITE_PRAGMAS не выполняются заново на каждый запрос.
+CONN_MAX_AGE = int(os.environ.get('DJANGO_CONN_MAX_AGE', 60))
+DATABASES = copy.deepcopy(DATABASES)
+DATABASES['default']['NAME'] = os.environ.get(
+    'DJANGO_DATABASE_PATH', DATABASES['default']['NAME'])
+for database in DATABASES.values():
+    database['CONN_MAX_AGE'] = CONN_MAX_AGE
+
+# Кэш общий для всех процессов, иначе версии областей кэша расходятся
+# и процессы отдают устаревшие страницы. Memcached — если задан
+# MEMCACHED_LOCATION (нужен пакет python-memcached), иначе файлы в
+# DJANGO_CACHE_DIR — для небольших установок: при каждой записи Django
+# пересчитывает файлы кэша.
+if os.environ.get('MEMCACHED_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.metrics.MeteredMemcachedCache',
+            'LOCATION': os.environ['MEMCACHED_LOCATION'].split(','),
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.metrics.MeteredFileBasedCache',
+            'LOCATION': os.environ.get(
+                'DJANGO_CACHE_DIR', os.path.join(BASE_DIR, 'cache')),
+            'OPTIONS': {'MAX_ENTRIES': 20_000},
+        },
+    }
+RESPONSE_CACHE_ENABLED = True
+
+STATIC_ROOT = os.environ.get(
+    'DJANGO_STATIC_ROOT', os.path.join(BASE_DIR, 'static_root'))
+STATICFILES_STORAGE = 'core.staticfiles.CompressedManifestStaticFilesStorage'
+STATIC_SERVE_ENABLED = (
+    os.environ.get('DJANGO_STATIC_SERVE', '1') == '1')
+MEDIA_ROOT = os.environ.get(
+    'DJANGO_MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
+
+SESSION_COOKIE_SECURE = os.environ.get('DJANGO_SECURE_COOKIES', '1') == '1'
+CSRF_COOKIE_SECURE = SESSION_COOKIE_SECURE